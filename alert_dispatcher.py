@@ -0,0 +1,220 @@
+"""
+Alert Dispatcher - Delivers alert emails from a background worker
+
+Bursts are coalesced: after an email goes out, further alerts to the same
+recipients within ALERT_DIGEST_SECONDS are held and then sent together as
+one digest. Each recipient also has an ALERT_RATE_LIMIT budget of emails
+per minute; digests wait for it. Critical alerts (exits) skip both and go
+out immediately.
+"""
+import os
+import queue
+import smtplib
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from email_service import SMTPConnection, build_digest, build_message
+from metrics import ALERT_EMAILS, SMTP_RETRIES
+from rate_limit import RateBudget
+
+
+# Maximum alerts waiting for delivery; submit() rejects alerts beyond this
+ALERT_QUEUE_SIZE = int(os.getenv('ALERT_QUEUE_SIZE', '100'))
+# NOOP the idle SMTP session this often so it is warm when an alert fires
+SMTP_KEEPALIVE_SECONDS = float(os.getenv('SMTP_KEEPALIVE_SECONDS', '60'))
+# Alerts within this many seconds of the last email are merged into one digest; 0 disables digests
+ALERT_DIGEST_SECONDS = float(os.getenv('ALERT_DIGEST_SECONDS', '30'))
+# Emails per minute each recipient may receive (critical alerts are exempt); 0 disables the limit
+ALERT_RATE_LIMIT = float(os.getenv('ALERT_RATE_LIMIT', '6'))
+
+
+class AlertDispatcher:
+    """
+    Background alert delivery over a persistent SMTP session.
+
+    submit() only enqueues, so the price loop never waits on the mail
+    server. A single worker thread owns the SMTP connection, coalesces
+    bursts into digests, retries failed deliveries with exponential backoff,
+    and reports each alert's outcome as a {'context', 'sent'} dict that the
+    caller collects with poll_results().
+    """
+
+    def __init__(
+        self,
+        gmail_user: str,
+        gmail_password: str,
+        max_queue: int = ALERT_QUEUE_SIZE,
+        keepalive_seconds: float = SMTP_KEEPALIVE_SECONDS,
+        max_retries: int = 3,
+        digest_seconds: float = ALERT_DIGEST_SECONDS,
+        rate_limit: float = ALERT_RATE_LIMIT
+    ):
+        self.gmail_user = gmail_user
+        self.connection = SMTPConnection(gmail_user, gmail_password)
+        self.keepalive_seconds = keepalive_seconds
+        self.max_retries = max_retries
+        self.digest_seconds = digest_seconds
+        self.rate_limit = rate_limit
+        self._pending: "queue.Queue[Optional[Dict]]" = queue.Queue(maxsize=max_queue)
+        self._results: "queue.Queue[Dict]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        # Worker-thread state: held alerts and when they are due, per
+        # recipient list, plus each recipient's email budget
+        self._held: Dict[Tuple[str, ...], List[Dict]] = {}
+        self._due: Dict[Tuple[str, ...], float] = {}
+        self._last_sent: Dict[Tuple[str, ...], float] = {}
+        self._budgets: Dict[str, RateBudget] = {}
+
+    def start(self) -> None:
+        """Start the delivery worker"""
+        self._thread = threading.Thread(target=self._run, name="alert-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 30) -> None:
+        """Deliver what is already queued, then stop the worker"""
+        if self._thread is None:
+            return
+        self._pending.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def submit(
+        self,
+        recipients: List[str],
+        subject: str,
+        body: str,
+        context: Optional[Dict] = None,
+        critical: bool = False,
+        text: Optional[str] = None
+    ) -> bool:
+        """
+        Queue an alert for delivery
+
+        Args:
+            body: HTML body
+            critical: Send at once, bypassing digests and rate limits
+            text: Plain-text alternative of the body
+
+        Returns:
+            True if queued, False if the queue is full
+        """
+        alert = {
+            'recipients': recipients, 'subject': subject, 'body': body, 'text': text,
+            'context': context, 'critical': critical
+        }
+        try:
+            self._pending.put_nowait(alert)
+            return True
+        except queue.Full:
+            print(f"Alert queue full, dropping alert: {subject}")
+            return False
+
+    def poll_results(self) -> List[Dict]:
+        """Delivery reports ({'context', 'sent'}) collected since the last call"""
+        results = []
+        while True:
+            try:
+                results.append(self._results.get_nowait())
+            except queue.Empty:
+                return results
+
+    def _budget(self, recipient: str) -> RateBudget:
+        budget = self._budgets.get(recipient)
+        if budget is None:
+            budget = self._budgets[recipient] = RateBudget(self.rate_limit)
+        return budget
+
+    def _deliver(self, recipients: List[str], subject: str, body: str, text: Optional[str]) -> bool:
+        msg = build_message(self.gmail_user, recipients, subject, body, text)
+        for attempt in range(self.max_retries):
+            try:
+                self.connection.send(recipients, msg)
+                print(f"Email sent successfully to {recipients}")
+                return True
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+                # Refused, not lost: retrying would not help and could deliver it twice
+                print(f"SMTP server refused the email: {e}")
+                return False
+            except Exception as e:
+                print(f"SMTP attempt {attempt + 1} failed: {e}")
+                self.connection.close()
+
+            # Wait before retry (exponential backoff)
+            if attempt < self.max_retries - 1:
+                SMTP_RETRIES.inc()
+                time.sleep(2 ** attempt)
+
+        print(f"Failed to send email after {self.max_retries} attempts")
+        return False
+
+    def _send(self, key: Tuple[str, ...], alerts: List[Dict], kind: str) -> None:
+        """Send alerts as one email (a digest if there are several) and report each"""
+        if len(alerts) == 1:
+            subject, body, text = alerts[0]['subject'], alerts[0]['body'], alerts[0]['text']
+        else:
+            subject, body, text = build_digest([(alert['subject'], alert['body'], alert['text']) for alert in alerts])
+        if self.rate_limit > 0:
+            for recipient in key:
+                self._budget(recipient).take()
+        sent = self._deliver(list(key), subject, body, text)
+        self._last_sent[key] = time.monotonic()
+        ALERT_EMAILS.labels(kind).inc()
+        for alert in alerts:
+            self._results.put({'context': alert['context'], 'sent': sent})
+
+    def _hold(self, alert: Dict) -> None:
+        """Hold a non-critical alert until its digest window closes"""
+        key = tuple(alert['recipients'])
+        self._held.setdefault(key, []).append(alert)
+        if key not in self._due:
+            # The first alert after a quiet spell goes out at once
+            last = self._last_sent.get(key)
+            self._due[key] = time.monotonic() if last is None else last + self.digest_seconds
+
+    def _flush(self, force: bool = False) -> float:
+        """
+        Send held alerts whose window has closed and whose recipients have budget
+
+        Returns:
+            Seconds until the next held alert is due (inf if none)
+        """
+        now = time.monotonic()
+        next_due = float('inf')
+        for key in list(self._due):
+            due = self._due[key]
+            if not force:
+                if self.rate_limit > 0:
+                    # Wait for every recipient's budget as well as the window
+                    due = max([due] + [now + self._budget(recipient).wait_time() for recipient in key])
+                if due > now:
+                    self._due[key] = due
+                    next_due = min(next_due, due - now)
+                    continue
+            alerts = self._held.pop(key)
+            del self._due[key]
+            self._send(key, alerts, 'digest' if len(alerts) > 1 else 'single')
+        return next_due
+
+    def _run(self) -> None:
+        timeout = float('inf')
+        while True:
+            try:
+                alert = self._pending.get(timeout=min(self.keepalive_seconds, timeout))
+            except queue.Empty:
+                if not self._due:
+                    self.connection.keepalive()
+                timeout = self._flush()
+                continue
+
+            if alert is None:
+                # Shutting down: send whatever is held regardless of limits
+                self._flush(force=True)
+                self.connection.close()
+                return
+
+            if alert['critical']:
+                self._send(tuple(alert['recipients']), [alert], 'critical')
+            else:
+                self._hold(alert)
+            timeout = self._flush()
@@ -0,0 +1,152 @@
+"""
+Alert Templates - Alert subjects and bodies compiled once at import
+
+Each alert has a subject, an HTML body and a plain-text alternative. The
+templates use str.format fields. They are parsed when this module is
+imported, and every value that is fixed for the process is substituted
+then: the exit colours and the TP/SL percentages from detection_engine.
+Rendering an alert then costs one format_map per part, on a string that
+holds only the per-alert fields.
+"""
+import html
+from string import Formatter
+from typing import Dict, Optional, Set, Tuple
+
+from detection_engine import STOP_LOSS_PCT, TAKE_PROFIT_PCT
+
+
+def _literal(text: str) -> str:
+    """Text as it must appear in a format string"""
+    return text.replace('{', '{{').replace('}', '}}')
+
+
+class Template:
+    """
+    A str.format template, parsed once.
+
+    Fields given in static are substituted at compile time; render() fills
+    the rest. With escape=True, string values are HTML-escaped.
+    """
+
+    __slots__ = ('fields', '_escape', '_format')
+
+    def __init__(self, source: str, static: Optional[Dict] = None, escape: bool = False):
+        static = static or {}
+        pieces = []
+        self.fields: Set[str] = set()
+        for literal, field, spec, conversion in Formatter().parse(source):
+            pieces.append(_literal(literal))
+            if field is None:
+                continue
+            if conversion or '{' in spec:
+                raise ValueError(f"Unsupported template field: {field}")
+            if field in static:
+                value = format(static[field], spec)
+                pieces.append(_literal(html.escape(value) if escape else value))
+            else:
+                self.fields.add(field)
+                pieces.append('{' + field + (':' + spec if spec else '') + '}')
+        self._escape = escape
+        self._format = ''.join(pieces).format_map
+
+    def render(self, values: Dict) -> str:
+        """
+        Fill in the per-alert fields
+
+        Raises:
+            KeyError: If a field has no value
+        """
+        if self._escape:
+            values = {name: html.escape(value) if isinstance(value, str) else value
+                      for name, value in values.items()}
+        return self._format(values)
+
+
+class AlertTemplate:
+    """Subject, HTML body and plain text of one kind of alert"""
+
+    __slots__ = ('subject', 'html', 'text')
+
+    def __init__(self, subject: str, html_body: str, text: str, **static):
+        self.subject = Template(subject, static)
+        self.html = Template(html_body, static, escape=True)
+        self.text = Template(text, static)
+
+    def render(self, **values) -> Tuple[str, str, str]:
+        """(subject, html, text) of one alert"""
+        return self.subject.render(values), self.html.render(values), self.text.render(values)
+
+
+_FOOTER = """
+        <p style="color: #666; font-size: 12px; margin-top: 30px;">
+          This is an automated alert from the BTC Short Alert System.
+        </p>"""
+
+ENTRY_TEMPLATE = AlertTemplate(
+    "🚨 {symbol} SHORT SIGNAL - {spike_pct:.2f}% Spike",
+    """
+    <html>
+      <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+        <h2 style="color: #d32f2f;">🚨 {asset} Short Entry Signal</h2>
+
+        <div style="background-color: #fff3cd; padding: 15px; border-left: 4px solid #ffc107; margin: 20px 0;">
+          <h3 style="margin-top: 0;">Signal Details</h3>
+          <p><strong>Spike Detected:</strong> {spike_pct:.2f}%</p>
+          <p><strong>6-Hour Low:</strong> ${six_hr_low:,.2f}</p>
+          <p><strong>Current Price:</strong> ${current_price:,.2f}</p>
+        </div>
+
+        <div style="background-color: #e7f3ff; padding: 15px; border-left: 4px solid #2196F3; margin: 20px 0;">
+          <h3 style="margin-top: 0;">Position Details</h3>
+          <p><strong>Suggested Entry Price:</strong> ${entry_price:,.2f}</p>
+          <p><strong>Take Profit Target:</strong> ${tp_price:,.2f} (-{tp_pct:g}%)</p>
+          <p><strong>Stop Loss Target:</strong> ${sl_price:,.2f} (+{sl_pct:g}%)</p>
+        </div>
+        """ + _FOOTER + """
+      </body>
+    </html>
+    """,
+    "🚨 {symbol} SHORT SIGNAL - {spike_pct:.2f}% Spike\n"
+    "Current: ${current_price:,.2f}  6h low: ${six_hr_low:,.2f}\n"
+    "Entry: ${entry_price:,.2f}  TP: ${tp_price:,.2f} (-{tp_pct:g}%)  SL: ${sl_price:,.2f} (+{sl_pct:g}%)",
+    tp_pct=TAKE_PROFIT_PCT,
+    sl_pct=STOP_LOSS_PCT,
+)
+
+_EXIT_SUBJECT = "{emoji} {symbol} {title}"
+_EXIT_HTML = """
+    <html>
+      <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+        <h2 style="color: {color};">{emoji} {symbol} {exit_type} Triggered</h2>
+
+        <div style="background-color: {bg_color}; padding: 15px; border-left: 4px solid {color}; margin: 20px 0;">
+          <h3 style="margin-top: 0;">Position Closed</h3>
+          <p><strong>Entry Price:</strong> ${entry_price:,.2f}</p>
+          <p><strong>Exit Price:</strong> ${current_price:,.2f}</p>
+          <p><strong>P/L Percentage:</strong> <span style="color: {color}; font-weight: bold;">{pnl_pct:+.2f}%</span></p>
+        </div>
+        """ + _FOOTER + """
+      </body>
+    </html>
+    """
+_EXIT_TEXT = (
+    "{emoji} {symbol} {title}\n"
+    "Entry: ${entry_price:,.2f}  Exit: ${current_price:,.2f}  P/L: {pnl_pct:+.2f}%"
+)
+
+EXIT_TEMPLATES = {
+    'TP': AlertTemplate(_EXIT_SUBJECT, _EXIT_HTML, _EXIT_TEXT, exit_type='TP', title='TAKE PROFIT',
+                        emoji='✅', color='#4caf50', bg_color='#e8f5e9'),
+    'SL': AlertTemplate(_EXIT_SUBJECT, _EXIT_HTML, _EXIT_TEXT, exit_type='SL', title='STOP LOSS',
+                        emoji='🛑', color='#f44336', bg_color='#ffebee'),
+}
+
+DIGEST_HTML = Template("""
+    <html>
+      <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+        <p style="color: #666;">{count} alerts fired in quick succession and were merged into this digest.</p>
+        {sections}
+      </body>
+    </html>
+    """)
+DIGEST_SEPARATOR = '<hr style="border: none; border-top: 1px solid #ddd; margin: 30px 0;">'
@@ -0,0 +1,182 @@
+"""
+Async Price Monitor - Hedged, concurrent price fetching over pooled connections
+"""
+import asyncio
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+import aiohttp
+
+from metrics import FETCH_FALLBACKS, FETCH_SECONDS
+from rate_limit import acquire
+from price_monitor import (
+    BINANCE_API_URL, COINGECKO_API_URL, KNOWN_SYMBOLS,
+    coingecko_params, parse_binance_prices, parse_coingecko_prices
+)
+
+
+# Start the fallback provider if the primary has not answered after this long
+HEDGE_DELAY = float(os.getenv('PRICE_HEDGE_DELAY', '0.3'))
+# Per-request timeout, in seconds
+REQUEST_TIMEOUT = float(os.getenv('PRICE_REQUEST_TIMEOUT', '3'))
+
+
+async def fetch_prices_coingecko_async(
+    session: aiohttp.ClientSession,
+    symbols: Dict[str, Tuple[str, str]]
+) -> Dict[str, Dict]:
+    """Fetch prices for all symbols with one CoinGecko request"""
+    url = f"{COINGECKO_API_URL}/simple/price"
+    if not acquire('coingecko'):
+        return {}
+    start = time.perf_counter()
+    try:
+        async with session.get(url, params=coingecko_params(symbols)) as response:
+            response.raise_for_status()
+            quotes = parse_coingecko_prices(await response.json(), symbols)
+    except asyncio.CancelledError:
+        # A hedge that lost the race; its latency says nothing about the provider
+        raise
+    except Exception as e:
+        print(f"CoinGecko API error: {e!r}")
+        quotes = {}
+    FETCH_SECONDS.labels('coingecko').observe(time.perf_counter() - start)
+    return quotes
+
+
+async def fetch_prices_binance_async(
+    session: aiohttp.ClientSession,
+    symbols: Dict[str, Tuple[str, str]]
+) -> Dict[str, Dict]:
+    """Fetch prices for all symbols with one Binance request"""
+    url = f"{BINANCE_API_URL}/ticker/price"
+    if not acquire('binance'):
+        return {}
+    # A single pair is cheaper to ask for directly than the all-tickers list
+    params = {'symbol': next(iter(symbols.values()))[1]} if len(symbols) == 1 else None
+    start = time.perf_counter()
+    try:
+        async with session.get(url, params=params) as response:
+            response.raise_for_status()
+            quotes = parse_binance_prices(await response.json(), symbols)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        print(f"Binance API error: {e!r}")
+        quotes = {}
+    FETCH_SECONDS.labels('binance').observe(time.perf_counter() - start)
+    return quotes
+
+
+PROVIDERS = (fetch_prices_coingecko_async, fetch_prices_binance_async)
+
+
+async def fetch_prices_hedged(
+    session: aiohttp.ClientSession,
+    symbols: Dict[str, Tuple[str, str]],
+    hedge_delay: float = HEDGE_DELAY
+) -> Dict[str, Dict]:
+    """
+    Race providers, starting each next one after hedge_delay
+
+    The first provider to quote every symbol wins and the others are
+    cancelled. If none does, the partial quotes are merged, earlier
+    providers taking precedence.
+
+    Args:
+        session: Shared client session
+        symbols: Dict of symbol -> (coingecko_id, binance_pair)
+        hedge_delay: Seconds to wait before launching the next provider;
+            0 fires all providers at once
+
+    Returns:
+        Dict of symbol -> {'price', 'timestamp'}
+    """
+    tasks = []
+    results = {}
+    try:
+        for provider in PROVIDERS:
+            if tasks:
+                FETCH_FALLBACKS.inc()
+            tasks.append(asyncio.ensure_future(provider(session, symbols)))
+            pending = {task for task in tasks if not task.done()}
+            # Wait up to hedge_delay for a complete answer before hedging
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=hedge_delay, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    results[task] = task.result()
+                    if len(results[task]) == len(symbols):
+                        return results[task]
+                if not done:
+                    break
+
+        # Every provider is running; take the first complete answer
+        pending = {task for task in tasks if not task.done()}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                results[task] = task.result()
+                if len(results[task]) == len(symbols):
+                    return results[task]
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+    merged = {}
+    for task in reversed(tasks):
+        merged.update(results.get(task, {}))
+    return merged
+
+
+class AsyncPriceFetcher:
+    """
+    Synchronous front end to the hedged async fetch pipeline.
+
+    Owns a private event loop and one aiohttp session, so connections (and
+    their TLS sessions) are pooled across ticks instead of being rebuilt on
+    every fetch.
+    """
+
+    def __init__(
+        self,
+        symbols: Optional[Dict[str, Tuple[str, str]]] = None,
+        hedge_delay: float = HEDGE_DELAY,
+        timeout: float = REQUEST_TIMEOUT
+    ):
+        self.symbols = symbols or {'BTC': KNOWN_SYMBOLS['BTC']}
+        self.hedge_delay = hedge_delay
+        self.timeout = timeout
+        self._loop = asyncio.new_event_loop()
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def _fetch(self, symbols: Dict[str, Tuple[str, str]]) -> Dict[str, Dict]:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                connector=aiohttp.TCPConnector(limit_per_host=4, keepalive_timeout=120)
+            )
+        return await fetch_prices_hedged(self._session, symbols, self.hedge_delay)
+
+    def fetch(self, symbols: Optional[Dict[str, Tuple[str, str]]] = None) -> Dict[str, Dict]:
+        """
+        Fetch the latest quotes
+
+        Args:
+            symbols: Dict of symbol -> (coingecko_id, binance_pair); defaults
+                to the symbols given at construction
+
+        Returns:
+            Dict of symbol -> {'price', 'timestamp'}; symbols no provider
+            could quote are missing
+        """
+        return self._loop.run_until_complete(self._fetch(symbols or self.symbols))
+
+    def close(self) -> None:
+        """Close the session and the event loop"""
+        if self._session is not None and not self._session.closed:
+            self._loop.run_until_complete(self._session.close())
+        self._loop.close()
@@ -0,0 +1,67 @@
+"""
+Backfill - Warms a symbol's price window from exchange klines after a restart
+
+Whatever gap lies between the last saved tick (or the start of the 6-hour
+window) and now is filled with bulk Binance klines requests, so the
+detector compares against a complete 6-hour low within seconds of boot
+instead of rebuilding it one poll at a time.
+"""
+import os
+import time
+from datetime import datetime
+from typing import Optional
+
+from indicators import parse_duration
+from price_monitor import fetch_klines
+from state_manager import HISTORY_WINDOW_SECONDS, add_price_to_history
+from symbol_state import SymbolState
+
+
+BACKFILL_ON_START = os.getenv('BACKFILL_ON_START', 'true').lower() == 'true'
+# Candle size; each candle's close becomes one tick, as if it had been polled
+BACKFILL_INTERVAL = os.getenv('BACKFILL_INTERVAL', '1m')
+
+# Binance returns at most this many klines per request
+_MAX_KLINES = 1000
+
+
+def backfill_state(state: SymbolState, pair: str, now: Optional[float] = None) -> int:
+    """
+    Fill the gap since the state's newest tick with kline closes
+
+    Args:
+        state: State to warm; its window, indicators and archive get the ticks
+        pair: Binance pair, e.g. "BTCUSDT"
+        now: Epoch seconds to backfill up to (default: now)
+
+    Returns:
+        Number of ticks added
+    """
+    now = time.time() if now is None else now
+    step = parse_duration(BACKFILL_INTERVAL)
+    start = now - HISTORY_WINDOW_SECONDS
+    latest = state.window.latest()
+    if latest is not None:
+        start = max(start, latest[0])
+    if now - start < 2 * step:
+        return 0   # At most one candle missing; the next poll covers it
+
+    # Start one candle early so the candle closing just after the newest
+    # tick is included, and page forward until now: a gap longer than one
+    # request must not leave out its newest (most relevant) part
+    page_start = start - step
+    added = 0
+    while True:
+        count = min(_MAX_KLINES, int((now - page_start) / step) + 1)
+        ticks = fetch_klines(pair, page_start, now, BACKFILL_INTERVAL, count)
+        for timestamp, price in ticks:
+            latest = state.window.latest()
+            if latest is not None and timestamp <= latest[0]:
+                continue
+            add_price_to_history(price, datetime.fromtimestamp(timestamp), state)
+            added += 1
+        # A short page reached now (or the request failed)
+        if len(ticks) < count or ticks[-1][0] <= page_start:
+            return added
+        # A candle closes where the next one opens
+        page_start = ticks[-1][0]
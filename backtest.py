@@ -0,0 +1,371 @@
+"""
+Backtest Runner - Replays historical ticks through the live detection logic
+
+Usage:
+    python backtest.py ticks.csv [--entry-spike 3.0] [--take-profit 2.5] [--stop-loss 2.5]
+    python backtest.py state.journal --format binary --trades trades.csv
+    python backtest.py archive --format archive --symbol BTC --start 2024-01-01 --end 2024-03-01
+
+CSV input needs a header row with a timestamp column (timestamp/time/
+open_time/date; epoch seconds, epoch milliseconds or ISO-8601) and either a
+price column or OHLC columns. Binary input uses the tick journal record
+format (little-endian float64 timestamp, float64 price). Archive input reads
+a tick archive directory, optionally limited to a time range.
+
+Ticks are processed in array chunks. The window low at every tick comes
+from a vectorized range-minimum over the chunk; the entry and exit
+conditions are the live ones in their NumPy form. Python only runs at
+the ticks where a position opens or closes.
+"""
+import argparse
+import csv
+import itertools
+import time
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+
+from detection_engine import (
+    ENTRY_SPIKE_PCT, TAKE_PROFIT_PCT, STOP_LOSS_PCT,
+    check_entry_signals_batch, check_exit_signal, check_exit_signals_batch
+)
+from rolling_window import NS_PER_SECOND
+from state_manager import HISTORY_WINDOW_SECONDS, close_position, default_state, open_position
+from tick_archive import TickArchive
+from tick_journal import RECORD
+
+
+TIMESTAMP_COLUMNS = ('timestamp', 'time', 'open_time', 'date')
+# Records read per chunk from binary files
+CHUNK_RECORDS = 1 << 16
+# Ticks checked for an exit before the search span grows (see _first_exit)
+EXIT_SPAN = 256
+
+Chunk = Tuple[np.ndarray, np.ndarray]
+
+
+def _parse_timestamp(value: str) -> float:
+    """Epoch seconds from epoch seconds, epoch milliseconds or ISO-8601"""
+    try:
+        number = float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+    # Anything past year ~5000 in seconds is really milliseconds
+    return number / 1000 if number > 1e11 else number
+
+
+def iter_csv_ticks(path: str) -> Iterator[Tuple[float, float]]:
+    """
+    Stream (timestamp, price) ticks from a tick or OHLC CSV file
+
+    OHLC rows expand to four ticks at the bar timestamp. The intra-bar path
+    is assumed to be open, low, high, close for up bars and open, high, low,
+    close for down bars.
+    """
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        header = [column.strip().lower() for column in next(reader)]
+        ts_col = next((header.index(name) for name in TIMESTAMP_COLUMNS if name in header), None)
+        if ts_col is None:
+            raise ValueError(f"No timestamp column in {path} (expected one of {TIMESTAMP_COLUMNS})")
+
+        if 'price' in header:
+            price_col = header.index('price')
+            for row in reader:
+                yield _parse_timestamp(row[ts_col]), float(row[price_col])
+        elif all(name in header for name in ('open', 'high', 'low', 'close')):
+            o, h, l, c = (header.index(name) for name in ('open', 'high', 'low', 'close'))
+            for row in reader:
+                ts = _parse_timestamp(row[ts_col])
+                open_, high, low, close = float(row[o]), float(row[h]), float(row[l]), float(row[c])
+                yield ts, open_
+                if close >= open_:
+                    yield ts, low
+                    yield ts, high
+                else:
+                    yield ts, high
+                    yield ts, low
+                yield ts, close
+        else:
+            raise ValueError(f"No price or open/high/low/close columns in {path}")
+
+
+def iter_binary_ticks(path: str) -> Iterator[Tuple[float, float]]:
+    """Stream (timestamp, price) ticks from a binary tick journal file"""
+    chunk_bytes = CHUNK_RECORDS * RECORD.size
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(chunk_bytes)
+            if not data:
+                return
+            usable = len(data) - len(data) % RECORD.size
+            yield from RECORD.iter_unpack(data[:usable])
+
+
+def iter_binary_chunks(path: str) -> Iterator[Chunk]:
+    """Stream (timestamps, prices) arrays from a binary tick journal file"""
+    with open(path, 'rb') as f:
+        while True:
+            data = np.fromfile(f, dtype='<f8', count=CHUNK_RECORDS * 2)
+            # A torn last record leaves an odd float (or none) behind
+            usable = len(data) - len(data) % 2
+            if not usable:
+                return
+            records = data[:usable].reshape(-1, 2)
+            yield records[:, 0], records[:, 1]
+
+
+def tick_chunks(ticks: Iterable[Tuple[float, float]], size: int = CHUNK_RECORDS) -> Iterator[Chunk]:
+    """Group (timestamp, price) pairs into (timestamps, prices) arrays"""
+    ticks = iter(ticks)
+    while True:
+        flat = np.fromiter(itertools.chain.from_iterable(itertools.islice(ticks, size)), dtype=np.float64)
+        if not flat.size:
+            return
+        records = flat.reshape(-1, 2)
+        yield records[:, 0], records[:, 1]
+
+
+def _range_min(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """min(values[start:end + 1]) for every (start, end) pair, from a sparse table"""
+    lengths = ends - starts + 1
+    # levels[k][i] is the minimum of values[i:i + 2**k]
+    levels = [values]
+    for k in range(1, int(lengths.max()).bit_length()):
+        half = 1 << (k - 1)
+        previous = levels[-1]
+        levels.append(np.minimum(previous[:-half], previous[half:]))
+    # Two overlapping power-of-two blocks cover each range
+    orders = np.floor(np.log2(lengths)).astype(np.intp)
+    lows = np.empty(len(starts))
+    for k in np.unique(orders):
+        selected = orders == k
+        table = levels[k]
+        lows[selected] = np.minimum(table[starts[selected]], table[ends[selected] - (1 << int(k)) + 1])
+    return lows
+
+
+class WindowLows:
+    """
+    Window low at each tick of a chunked series.
+
+    The vectorized counterpart of appending every tick to a RollingWindow
+    and reading min(): a tick's window holds the ticks at most
+    window_seconds older than it (on the same epoch-ns timestamps), itself
+    included. Ticks must arrive in time order. The ticks still inside the
+    window are carried over to the next chunk.
+    """
+
+    def __init__(self, window_seconds: float):
+        self._window_ns = int(window_seconds * NS_PER_SECOND)
+        self._ns = np.empty(0, dtype=np.int64)
+        self._prices = np.empty(0, dtype=np.float64)
+
+    def lows(self, timestamps: np.ndarray, prices: np.ndarray) -> np.ndarray:
+        """Window low at each of the chunk's ticks"""
+        ns = np.concatenate((self._ns, (timestamps * NS_PER_SECOND).astype(np.int64)))
+        prices = np.concatenate((self._prices, prices))
+        ends = np.arange(len(self._ns), len(ns))
+        starts = np.searchsorted(ns, ns[ends] - self._window_ns, 'left')
+        lows = _range_min(prices, starts, ends)
+        keep = int(np.searchsorted(ns, ns[-1] - self._window_ns, 'left'))
+        self._ns, self._prices = ns[keep:], prices[keep:]
+        return lows
+
+
+def _first_exit(
+    prices: np.ndarray,
+    start: int,
+    entry_price: float,
+    take_profit_pct: float,
+    stop_loss_pct: float
+) -> Optional[int]:
+    """Index of the first tick from start that hits TP or SL, or None"""
+    span = EXIT_SPAN
+    while start < len(prices):
+        # Growing spans: a quick exit costs little, a long hold few passes
+        take_profit, stop_loss, _ = check_exit_signals_batch(
+            prices[start:start + span], entry_price, take_profit_pct, stop_loss_pct
+        )
+        hits = np.flatnonzero(take_profit | stop_loss)
+        if hits.size:
+            return start + int(hits[0])
+        start += span
+        span *= 4
+    return None
+
+
+def run_backtest_chunks(
+    chunks: Iterable[Chunk],
+    entry_spike_pct: float = ENTRY_SPIKE_PCT,
+    take_profit_pct: float = TAKE_PROFIT_PCT,
+    stop_loss_pct: float = STOP_LOSS_PCT,
+    window_seconds: float = HISTORY_WINDOW_SECONDS,
+    keep_trades: bool = True
+) -> Dict:
+    """
+    Simulate the live entry/exit loop over (timestamps, prices) array chunks
+
+    Every entry alert is assumed to be delivered, so positions open on the
+    signal tick. Trade returns are for a short: positive when price falls.
+    As live, a tick that closes a position cannot also open the next one.
+
+    Args:
+        chunks: (epoch seconds, prices) float64 arrays, in time order
+        entry_spike_pct: Entry spike threshold, in percent
+        take_profit_pct: Take profit distance, in percent
+        stop_loss_pct: Stop loss distance, in percent
+        window_seconds: Rolling window length for the entry low
+        keep_trades: Keep the list of individual trades in the report
+
+    Returns:
+        Report dict with trade statistics (see summarize)
+    """
+    state = default_state()
+    window = WindowLows(window_seconds)
+    trades = []
+    stats = {'ticks': 0, 'trades': 0, 'wins': 0, 'pnl_pct': 0.0}
+    entry_ts = None
+
+    count = 0
+    for timestamps, prices in chunks:
+        if not len(prices):
+            continue
+        count += len(prices)
+        entry_mask, _ = check_entry_signals_batch(
+            prices, window.lows(timestamps, prices), entry_spike_pct=entry_spike_pct
+        )
+        entries = np.flatnonzero(entry_mask)
+
+        i = 0
+        while i < len(prices):
+            if state.position.is_open:
+                entry_price = state.position.entry_price
+                exit_at = _first_exit(prices, i, entry_price, take_profit_pct, stop_loss_pct)
+                if exit_at is None:
+                    break
+                price = float(prices[exit_at])
+                exit_signal = check_exit_signal(price, entry_price, take_profit_pct, stop_loss_pct)
+                pnl_pct = (entry_price - price) / entry_price * 100
+                stats['trades'] += 1
+                stats['wins'] += exit_signal == "TP"
+                stats['pnl_pct'] += pnl_pct
+                if keep_trades:
+                    trades.append({
+                        'entry_time': entry_ts, 'entry_price': entry_price,
+                        'exit_time': float(timestamps[exit_at]), 'exit_price': price,
+                        'exit_type': exit_signal, 'pnl_pct': pnl_pct,
+                    })
+                close_position(state)
+                i = exit_at + 1
+            else:
+                next_entry = int(np.searchsorted(entries, i))
+                if next_entry == len(entries):
+                    break
+                i = int(entries[next_entry])
+                open_position(float(prices[i]), state)
+                entry_ts = float(timestamps[i])
+                i += 1
+
+    stats['ticks'] = count
+    stats['open_entry_price'] = state.position.entry_price
+    stats['trade_list'] = trades
+    return stats
+
+
+def run_backtest(
+    ticks: Iterable[Tuple[float, float]],
+    entry_spike_pct: float = ENTRY_SPIKE_PCT,
+    take_profit_pct: float = TAKE_PROFIT_PCT,
+    stop_loss_pct: float = STOP_LOSS_PCT,
+    window_seconds: float = HISTORY_WINDOW_SECONDS,
+    keep_trades: bool = True
+) -> Dict:
+    """
+    Simulate the live entry/exit loop over a stream of (timestamp, price) pairs
+
+    See run_backtest_chunks, which array sources should call directly.
+    """
+    return run_backtest_chunks(
+        tick_chunks(ticks), entry_spike_pct, take_profit_pct, stop_loss_pct, window_seconds, keep_trades
+    )
+
+
+def summarize(report: Dict, elapsed: Optional[float] = None) -> str:
+    """Human-readable summary of a run_backtest report"""
+    trades = report['trades']
+    lines = [
+        f"Ticks processed: {report['ticks']:,}",
+        f"Trades: {trades}",
+        f"Hit rate: {report['wins'] / trades * 100:.1f}%" if trades else "Hit rate: n/a",
+        f"Total P/L: {report['pnl_pct']:+.2f}% (sum of short returns)",
+    ]
+    if report['open_entry_price'] is not None:
+        lines.append(f"Position still open from ${report['open_entry_price']:,.2f}")
+    if elapsed:
+        lines.append(f"Elapsed: {elapsed:.2f}s ({report['ticks'] / elapsed:,.0f} ticks/s)")
+    return '\n'.join(lines)
+
+
+def write_trades(trades, path: str) -> None:
+    """Write trades to a CSV file"""
+    fields = ['entry_time', 'entry_price', 'exit_time', 'exit_price', 'exit_type', 'pnl_pct']
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for trade in trades:
+            writer.writerow({
+                **trade,
+                'entry_time': datetime.fromtimestamp(trade['entry_time']).isoformat(),
+                'exit_time': datetime.fromtimestamp(trade['exit_time']).isoformat(),
+            })
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Replay historical ticks through the detection engine")
+    parser.add_argument('path', help="Tick/OHLC CSV file or binary tick journal")
+    parser.add_argument('--format', choices=('csv', 'binary', 'archive'),
+                        help="Input format (default: by file extension)")
+    parser.add_argument('--symbol', default='BTC', help="Archive symbol")
+    parser.add_argument('--start', help="Archive range start (ISO-8601 or epoch seconds)")
+    parser.add_argument('--end', help="Archive range end, exclusive (ISO-8601 or epoch seconds)")
+    parser.add_argument('--entry-spike', type=float, default=ENTRY_SPIKE_PCT, help="Entry spike %%")
+    parser.add_argument('--take-profit', type=float, default=TAKE_PROFIT_PCT, help="Take profit %%")
+    parser.add_argument('--stop-loss', type=float, default=STOP_LOSS_PCT, help="Stop loss %%")
+    parser.add_argument('--window-hours', type=float, default=HISTORY_WINDOW_SECONDS / 3600,
+                        help="Rolling window for the entry low, in hours")
+    parser.add_argument('--trades', help="Write individual trades to this CSV file")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ('csv' if args.path.lower().endswith('.csv') else 'binary')
+    if fmt == 'archive':
+        archive = TickArchive(args.symbol, root=args.path)
+        chunks = archive.iter_chunks(
+            _parse_timestamp(args.start) if args.start else None,
+            _parse_timestamp(args.end) if args.end else None
+        )
+    elif fmt == 'csv':
+        chunks = tick_chunks(iter_csv_ticks(args.path))
+    else:
+        chunks = iter_binary_chunks(args.path)
+
+    start = time.perf_counter()
+    report = run_backtest_chunks(
+        chunks,
+        entry_spike_pct=args.entry_spike,
+        take_profit_pct=args.take_profit,
+        stop_loss_pct=args.stop_loss,
+        window_seconds=args.window_hours * 3600,
+        keep_trades=bool(args.trades)
+    )
+    elapsed = time.perf_counter() - start
+
+    print(summarize(report, elapsed))
+    if args.trades:
+        write_trades(report['trade_list'], args.trades)
+        print(f"Trades written to {args.trades}")
+
+
+if __name__ == "__main__":
+    main()
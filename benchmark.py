@@ -0,0 +1,458 @@
+"""
+Benchmarks - Micro-benchmarks for the monitoring hot path
+
+Usage:
+    python benchmark.py [window] [batch] [metrics] [indicators] [buckets] [state] [persist] [status] [ledger] [alerts] [backtest]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from backtest import iter_binary_chunks, iter_binary_ticks, run_backtest_chunks
+from detection_engine import (
+    check_entry_signal, check_exit_signal, calculate_target_prices,
+    check_entry_signals_batch, check_exit_signals_batch, calculate_target_prices_batch
+)
+import state_manager
+from email_service import build_message, entry_alert_content
+from indicators import IndicatorEngine
+from metrics import Counter, Histogram, REGISTRY, render_metrics
+from rolling_window import BucketedWindow, RollingWindow
+from state_header import STATE_FILE, read_position
+from symbol_state import Position
+from trade_ledger import TradeLedger
+
+
+def _legacy_tick(history, price, timestamp, window_seconds):
+    """Per-tick work of the old list-based price_history"""
+    history.append({"timestamp": timestamp.isoformat(), "price": price})
+    cutoff_time = timestamp - timedelta(seconds=window_seconds)
+    history = [
+        entry for entry in history
+        if datetime.fromisoformat(entry['timestamp']) >= cutoff_time
+    ]
+    low = min(entry['price'] for entry in history)
+    high = max(entry['price'] for entry in history)
+    return history, low, high
+
+
+def bench_window(sizes=(1_000, 10_000, 100_000), ticks: int = 20_000) -> None:
+    """Per-tick append + expiry + min/max cost as the window grows"""
+    print(f"{'window':>10} {'rolling ns/tick':>16} {'legacy ns/tick':>16}")
+    for size in sizes:
+        window = RollingWindow(window_seconds=size)
+        base = 1_700_000_000.0
+        for i in range(size):
+            window.append(base + i, 60_000.0 + (i * 7919) % 1000)
+
+        start = time.perf_counter()
+        for i in range(size, size + ticks):
+            window.append(base + i, 60_000.0 + (i * 7919) % 1000)
+            window.min()
+            window.max()
+        rolling_ns = (time.perf_counter() - start) / ticks * 1e9
+
+        legacy_ticks = max(1, ticks * 1_000 // (size * 100))
+        now = datetime.fromtimestamp(base)
+        history = [
+            {"timestamp": (now + timedelta(seconds=i)).isoformat(), "price": 60_000.0}
+            for i in range(size)
+        ]
+        start = time.perf_counter()
+        for i in range(size, size + legacy_ticks):
+            history, _, _ = _legacy_tick(
+                history, 60_000.0, now + timedelta(seconds=i), size
+            )
+        legacy_ns = (time.perf_counter() - start) / legacy_ticks * 1e9
+
+        print(f"{size:>10,} {rolling_ns:>16,.0f} {legacy_ns:>16,.0f}")
+
+
+def bench_batch(sizes=(10, 1_000, 100_000)) -> None:
+    """Vectorized entry/exit/target evaluation vs a per-symbol Python loop"""
+    print(f"{'symbols':>10} {'loop us/cycle':>16} {'batch us/cycle':>16} {'speedup':>9}")
+    rng = np.random.default_rng(42)
+    for size in sizes:
+        lows = rng.uniform(1.0, 70_000.0, size)
+        prices = lows * rng.uniform(1.0, 1.05, size)
+        entry_prices = np.where(rng.random(size) < 0.5, prices * rng.uniform(0.95, 1.05, size), np.nan)
+
+        # The loop gets one single-tick window per symbol, as the live
+        # engine would hold, so only detection cost is measured
+        windows = []
+        for low in lows:
+            window = RollingWindow(window_seconds=60)
+            window.append(0.0, float(low))
+            windows.append(window)
+        price_list = prices.tolist()
+        entry_list = [None if np.isnan(p) else p for p in entry_prices.tolist()]
+
+        repeats = max(1, 200_000 // size)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for price, window, entry_price in zip(price_list, windows, entry_list):
+                if entry_price is None:
+                    check_entry_signal(price, window)
+                else:
+                    check_exit_signal(price, entry_price)
+                    calculate_target_prices(entry_price)
+        loop_us = (time.perf_counter() - start) / repeats * 1e6
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            check_entry_signals_batch(prices, lows)
+            check_exit_signals_batch(prices, entry_prices)
+            calculate_target_prices_batch(entry_prices)
+        batch_us = (time.perf_counter() - start) / repeats * 1e6
+
+        print(f"{size:>10,} {loop_us:>16,.1f} {batch_us:>16,.1f} {loop_us / batch_us:>8.1f}x")
+
+
+def bench_metrics(updates: int = 1_000_000) -> None:
+    """Cost of recording a value, and of rendering one scrape"""
+    histogram = Histogram('bench_seconds', "benchmark", ('provider',))
+    counter = Counter('bench_total', "benchmark")
+    child = histogram.labels('coingecko')
+
+    start = time.perf_counter()
+    for _ in range(updates):
+        counter.inc()
+    print(f"counter.inc():              {(time.perf_counter() - start) / updates * 1e9:>8.1f} ns")
+
+    start = time.perf_counter()
+    for i in range(updates):
+        child.observe(i * 1e-7)
+    print(f"histogram.observe():        {(time.perf_counter() - start) / updates * 1e9:>8.1f} ns")
+
+    start = time.perf_counter()
+    for _ in range(updates // 10):
+        with child.time():
+            pass
+    print(f"with histogram.time():      {(time.perf_counter() - start) / (updates // 10) * 1e9:>8.1f} ns")
+
+    start = time.perf_counter()
+    render_metrics()
+    print(f"render_metrics() (scrape):  {(time.perf_counter() - start) * 1e6:>8.1f} us")
+    REGISTRY.remove(histogram)
+    REGISTRY.remove(counter)
+
+
+def bench_indicators(ticks: int = 200_000) -> None:
+    """Per-tick cost of the indicator engine as horizons are added"""
+    print(f"{'horizons':>10} {'ns/tick':>10} {'ns/tick/horizon':>16}")
+    all_horizons = {'15m': 900, '1h': 3600, '6h': 21600, '24h': 86400, '3d': 259200, '7d': 604800}
+    for count in (1, 2, 4, 6):
+        engine = IndicatorEngine(dict(list(all_horizons.items())[:count]))
+        base = 1_700_000_000.0
+        start = time.perf_counter()
+        for i in range(ticks):
+            engine.append(base + i * 5, 60_000.0 + (i * 7919) % 1000)
+        ns = (time.perf_counter() - start) / ticks * 1e9
+        print(f"{count:>10} {ns:>10,.0f} {ns / count:>16,.0f}")
+
+
+def bench_buckets(window_seconds: int = 6 * 3600, tick_seconds: float = 1.0) -> None:
+    """Memory, snapshot size and append cost of a raw vs bucketed 6-hour window"""
+    ticks = int(window_seconds / tick_seconds)
+    base = 1_700_000_000.0
+    print(f"{ticks:,} ticks ({tick_seconds:g}s apart)")
+    print(f"{'window':>12} {'entries':>9} {'memory KiB':>11} {'snapshot KiB':>13} {'ns/tick':>9}")
+    for label, make in (
+        ('raw', lambda: RollingWindow(window_seconds)),
+        ('1s buckets', lambda: BucketedWindow(window_seconds, 1)),
+        ('10s buckets', lambda: BucketedWindow(window_seconds, 10)),
+        ('60s buckets', lambda: BucketedWindow(window_seconds, 60)),
+    ):
+        window = make()
+        start = time.perf_counter()
+        for i in range(ticks):
+            window.append(base + i * tick_seconds, 60_000.0 + (i * 7919) % 1000)
+        ns = (time.perf_counter() - start) / ticks * 1e9
+
+        # Rebuild under tracemalloc, which would distort the timing above
+        tracemalloc.start()
+        window = make()
+        for i in range(ticks):
+            window.append(base + i * tick_seconds, 60_000.0 + (i * 7919) % 1000)
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        if isinstance(window, BucketedWindow):
+            snapshot = json.dumps(window.to_buckets())
+        else:
+            snapshot = json.dumps(window.to_history(), indent=2)
+        print(f"{label:>12} {len(window):>9,} {memory / 1024:>11,.0f} {len(snapshot) / 1024:>13,.0f} {ns:>9,.0f}")
+
+
+def _traced(build):
+    """(result, bytes allocated while building it)"""
+    tracemalloc.start()
+    result = build()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, memory
+
+
+def bench_state(ticks: int = 21_600, positions: int = 10_000) -> None:
+    """Dict-based state vs the columnar window and slotted Position"""
+    base = 1_700_000_000.0
+    raw = [(base + i, 60_000.0 + (i * 7919) % 1000) for i in range(ticks)]
+
+    # Tick storage, as held in memory
+    legacy, legacy_mem = _traced(lambda: [
+        {"timestamp": datetime.fromtimestamp(ts).isoformat(), "price": price} for ts, price in raw
+    ])
+    window, window_mem = _traced(lambda: RollingWindow.from_history(legacy, ticks))
+    print(f"{ticks:,} ticks in memory:")
+    print(f"   list of dicts (ISO strings): {legacy_mem / 1024:>8,.0f} KiB ({legacy_mem / ticks:.0f} B/tick)")
+    print(f"   columnar RollingWindow:      {window_mem / 1024:>8,.0f} KiB ({window_mem / ticks:.0f} B/tick)")
+
+    # Per-tick work: low of the window
+    repeats = 20
+    cutoff = datetime.fromtimestamp(base)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        min(entry['price'] for entry in legacy if datetime.fromisoformat(entry['timestamp']) >= cutoff)
+    legacy_low = (time.perf_counter() - start) / repeats * 1e6
+    start = time.perf_counter()
+    for _ in range(repeats):
+        window.min()
+    window_low = (time.perf_counter() - start) / repeats * 1e6
+    print(f"   6h low: list scan {legacy_low:,.0f} us, RollingWindow.min() {window_low:,.2f} us")
+
+    # state.json round trip: legacy ISO price_history vs columnar price_ticks
+    data = json.dumps({'price_history': legacy}, indent=2)
+    start = time.perf_counter()
+    RollingWindow.from_history(json.loads(data)['price_history'], ticks).to_history()
+    print(f"   state.json load + serialize, price_history: {(time.perf_counter() - start) * 1000:,.1f} ms "
+          f"({len(data) / 1024:,.0f} KiB)")
+    data = json.dumps({'price_ticks': window.to_ticks()})
+    start = time.perf_counter()
+    RollingWindow.from_ticks(json.loads(data)['price_ticks'], ticks).to_ticks()
+    print(f"   state.json load + serialize, price_ticks:   {(time.perf_counter() - start) * 1000:,.1f} ms "
+          f"({len(data) / 1024:,.0f} KiB)")
+
+    # Position records
+    dicts, dict_mem = _traced(lambda: [
+        {'position_open': True, 'entry_price': float(i), 'entry_timestamp': None} for i in range(positions)
+    ])
+    slotted, slot_mem = _traced(lambda: [Position(True, float(i)) for i in range(positions)])
+    print(f"{positions:,} positions:")
+    print(f"   dict: {dict_mem / positions:.0f} B each, slotted Position: {slot_mem / positions:.0f} B each")
+
+    start = time.perf_counter()
+    for _ in range(20):
+        for state in dicts:
+            if state['position_open']:
+                state['entry_price']
+    dict_ns = (time.perf_counter() - start) / (20 * positions) * 1e9
+    start = time.perf_counter()
+    for _ in range(20):
+        for position in slotted:
+            if position.is_open:
+                position.entry_price
+    slot_ns = (time.perf_counter() - start) / (20 * positions) * 1e9
+    print(f"   field reads: dict {dict_ns:.0f} ns, slotted {slot_ns:.0f} ns")
+
+
+def bench_persist(ticks: int = 500) -> None:
+    """Per-tick save_state cost for each fsync policy, saving once vs twice per tick"""
+    print(f"{'policy':>10} {'saves/tick':>11} {'us/tick':>10}")
+    cwd = os.getcwd()
+    policy = state_manager.STATE_FSYNC
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            for fsync in ('never', 'interval', 'always'):
+                state_manager.STATE_FSYNC = fsync
+                for saves in (2, 1):
+                    for name in os.listdir(tmp):
+                        os.remove(name)
+                    state = state_manager.load_state()
+                    base = time.time()
+                    start = time.perf_counter()
+                    for i in range(ticks):
+                        state.window.append(base + i, 60_000.0 + (i * 7919) % 1000)
+                        for _ in range(saves):
+                            state_manager.save_state(state)
+                    us = (time.perf_counter() - start) / ticks * 1e6
+                    state_manager.close_state(state)
+                    print(f"{fsync:>10} {saves:>11} {us:>10,.1f}")
+        finally:
+            state_manager.STATE_FSYNC = policy
+            os.chdir(cwd)
+
+
+def bench_status(ticks: int = 21_600) -> None:
+    """Reading the position: full load_state vs the header-only read used by cli.py status"""
+    cli = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cli.py')
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            state = state_manager.default_state()
+            base = time.time() - ticks
+            for i in range(ticks):
+                state.window.append(base + i, 60_000.0 + (i * 7919) % 1000)
+            state.position.open(60_500.0, datetime.now().isoformat())
+            state_manager.close_state(state)
+            print(f"{ticks:,}-tick snapshot ({os.path.getsize(STATE_FILE) / 1024:,.0f} KiB):")
+
+            repeats = 20
+            start = time.perf_counter()
+            for _ in range(repeats):
+                state_manager.close_state(state_manager.load_state())
+            print(f"   load_state:    {(time.perf_counter() - start) / repeats * 1000:>8,.2f} ms")
+            start = time.perf_counter()
+            for _ in range(repeats):
+                read_position()
+            print(f"   read_position: {(time.perf_counter() - start) / repeats * 1000:>8,.2f} ms")
+
+            # Whole command, interpreter start-up and imports included
+            for name, argv in (('python -c pass', ['-c', 'pass']), ('cli.py status', [cli, 'status'])):
+                start = time.perf_counter()
+                subprocess.run([sys.executable] + argv, check=True, stdout=subprocess.DEVNULL)
+                print(f"   {name + ':':<15}{(time.perf_counter() - start) * 1000:>8,.1f} ms (new process)")
+        finally:
+            os.chdir(cwd)
+
+
+def bench_ledger(trades: int = 10_000) -> None:
+    """Opening the trade ledger from its checkpoint vs replaying the whole log"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'trades.jsonl')
+        ledger = TradeLedger(path)
+        start = time.perf_counter()
+        for i in range(trades):
+            trade = ledger.open('BTC', 60_000.0, datetime.now().isoformat())
+            ledger.close(trade, 60_000.0 * (1 + ((i * 7919) % 100 - 50) / 2000), datetime.now().isoformat(), 'TP')
+        record_us = (time.perf_counter() - start) / trades * 1e6
+        print(f"{trades:,} trades ({os.path.getsize(path) / 1024:,.0f} KiB log):")
+        print(f"   record open + close: {record_us:,.0f} us per trade (fsynced)")
+
+        start = time.perf_counter()
+        TradeLedger(path)
+        print(f"   open from checkpoint: {(time.perf_counter() - start) * 1000:>8,.2f} ms")
+        os.remove(ledger.index_path)
+        start = time.perf_counter()
+        replayed = TradeLedger(path)
+        print(f"   open by full replay:  {(time.perf_counter() - start) * 1000:>8,.2f} ms")
+        assert replayed.stats.to_dict() == ledger.stats.to_dict()
+
+
+def _legacy_alert(i: int) -> bytes:
+    """Entry email as it was built before: f-string body, MIMEMultipart, flattened per send"""
+    price = 60_000.0 + i
+    body = f"""
+    <html>
+      <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+        <h2 style="color: #d32f2f;">🚨 Bitcoin Short Entry Signal</h2>
+        <div style="background-color: #fff3cd; padding: 15px; border-left: 4px solid #ffc107; margin: 20px 0;">
+          <p><strong>Spike Detected:</strong> {1.5:.2f}%</p>
+          <p><strong>6-Hour Low:</strong> ${price * 0.985:,.2f}</p>
+          <p><strong>Current Price:</strong> ${price:,.2f}</p>
+        </div>
+        <div style="background-color: #e7f3ff; padding: 15px; border-left: 4px solid #2196F3; margin: 20px 0;">
+          <p><strong>Suggested Entry Price:</strong> ${price:,.2f}</p>
+          <p><strong>Take Profit Target:</strong> ${price * 0.975:,.2f} (-2.5%)</p>
+          <p><strong>Stop Loss Target:</strong> ${price * 1.025:,.2f} (+1.5%)</p>
+        </div>
+      </body>
+    </html>
+    """
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = f"🚨 BTC SHORT SIGNAL - {1.5:.2f}% Spike"
+    msg['From'] = 'alerts@example.com'
+    msg['To'] = 'a@example.com, b@example.com'
+    msg.attach(MIMEText(body, 'html'))
+    return msg.as_bytes()
+
+
+def bench_alerts(alerts: int = 5_000) -> None:
+    """Rendering an entry alert email: per-call f-string + MIME tree vs compiled templates + cached frame"""
+    recipients = ['a@example.com', 'b@example.com']
+
+    def compiled(i: int) -> bytes:
+        price = 60_000.0 + i
+        subject, body, text = entry_alert_content(
+            price, price * 0.985, 1.5, price, price * 0.975, price * 1.025
+        )
+        return build_message('alerts@example.com', recipients, subject, body, text)
+
+    print(f"{alerts:,} entry alerts, rendered and serialized:")
+    for name, render in (('f-string + MIMEMultipart', _legacy_alert), ('templates + frame', compiled)):
+        start = time.perf_counter()
+        for i in range(alerts):
+            render(i)
+        print(f"   {name + ':':<26}{(time.perf_counter() - start) / alerts * 1e6:>8,.1f} us per alert")
+
+
+def _legacy_backtest(ticks, entry_spike_pct: float = 0.1, take_profit_pct: float = 2.5,
+                     stop_loss_pct: float = 2.5, window_seconds: float = 6 * 3600) -> int:
+    """Backtest loop as it was: every tick through RollingWindow and the scalar signal checks"""
+    window = RollingWindow(window_seconds)
+    entry_price = None
+    trades = 0
+    for ts, price in ticks:
+        window.append(ts, price)
+        if entry_price is not None:
+            if check_exit_signal(price, entry_price, take_profit_pct, stop_loss_pct):
+                trades += 1
+                entry_price = None
+        elif check_entry_signal(price, window, entry_spike_pct)[0]:
+            entry_price = price
+    return trades
+
+
+def bench_backtest(ticks: int = 2_000_000) -> None:
+    """Backtest throughput over a binary tick file: per-tick loop vs array chunks"""
+    rng = np.random.default_rng(0)
+    records = np.empty((ticks, 2))
+    records[:, 0] = 1.7e9 + np.arange(ticks)
+    records[:, 1] = 60_000.0 * np.exp(np.cumsum(rng.normal(0, 2e-4, ticks)))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'ticks.bin')
+        records.astype('<f8').tofile(path)
+        print(f"{ticks:,} one-second ticks, 6-hour window:")
+        start = time.perf_counter()
+        trades = _legacy_backtest(iter_binary_ticks(path))
+        elapsed = time.perf_counter() - start
+        print(f"   per-tick loop:  {ticks / elapsed / 1e6:>6.2f}M ticks/s ({trades} trades)")
+        start = time.perf_counter()
+        report = run_backtest_chunks(iter_binary_chunks(path), keep_trades=False)
+        elapsed = time.perf_counter() - start
+        print(f"   array chunks:   {ticks / elapsed / 1e6:>6.2f}M ticks/s ({report['trades']} trades)")
+
+
+BENCHMARKS = {
+    'window': bench_window,
+    'batch': bench_batch,
+    'metrics': bench_metrics,
+    'indicators': bench_indicators,
+    'buckets': bench_buckets,
+    'state': bench_state,
+    'persist': bench_persist,
+    'status': bench_status,
+    'ledger': bench_ledger,
+    'alerts': bench_alerts,
+    'backtest': bench_backtest,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark: {name}. Available: {', '.join(BENCHMARKS)}")
+            sys.exit(1)
+        print(f"\n== {name} ==")
+        BENCHMARKS[name]()
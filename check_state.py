@@ -1,37 +1,92 @@
 """
 State Check Utility - View current application state
+
+Read-only and offline: the journal is replayed without truncating a torn
+record, and the latest quote comes from the shared quote cache file
+(QUOTE_CACHE_FILE) when the monitor writes one. Pass --quote to fetch a
+live quote from the providers instead.
 """
+import argparse
+from typing import List, Optional
+
 from state_manager import load_state
 
 
-def main():
-    state = load_state()
+def main(fetch_quote: bool = False):
+    """
+    Print the saved state
+
+    Args:
+        fetch_quote: Fetch a live BTC quote rather than reading the cache file
+    """
+    state = load_state(read_only=True)
     
     print("\n" + "="*60)
     print("BITCOIN SHORT ALERT SYSTEM - CURRENT STATE")
     print("="*60)
     
     print(f"\n📊 Position Status:")
-    if state['position_open']:
+    if state.position.is_open:
         print(f"   ✅ Position OPEN")
-        print(f"   Entry Price: ${state['entry_price']:,.2f}")
-        print(f"   Entry Time: {state['entry_timestamp']}")
+        print(f"   Entry Price: ${state.position.entry_price:,.2f}")
+        print(f"   Entry Time: {state.position.entry_timestamp}")
     else:
         print(f"   ❌ Position CLOSED (No active position)")
     
     print(f"\n📈 Price History:")
-    print(f"   Entries: {len(state['price_history'])}")
-    if state['price_history']:
+    window = state.window
+    print(f"   Entries: {len(window)}")
+    if len(window):
         from datetime import datetime
-        oldest = datetime.fromisoformat(state['price_history'][0]['timestamp'])
-        newest = datetime.fromisoformat(state['price_history'][-1]['timestamp'])
+        oldest = datetime.fromtimestamp(window.oldest()[0])
+        newest = datetime.fromtimestamp(window.latest()[0])
         print(f"   Oldest: {oldest.strftime('%Y-%m-%d %H:%M:%S')}")
         print(f"   Newest: {newest.strftime('%Y-%m-%d %H:%M:%S')}")
         print(f"   Range: {(newest - oldest).total_seconds() / 3600:.1f} hours")
+        print(f"   Low: ${window.min():,.2f}  High: ${window.max():,.2f}")
+    
+    archive = state.archive
+    if archive is not None:
+        from datetime import datetime
+        stats = archive.stats()
+        print(f"\n🗄️  Tick Archive ({archive.path}):")
+        print(f"   Partitions: {stats['partitions']}  Ticks: {stats['ticks']:,}")
+        if stats['ticks']:
+            print(f"   First: {datetime.fromtimestamp(stats['first']).strftime('%Y-%m-%d %H:%M:%S')}")
+            print(f"   Last: {datetime.fromtimestamp(stats['last']).strftime('%Y-%m-%d %H:%M:%S')}")
+    
+    indicators = state.indicators
+    if indicators is not None and len(indicators):
+        print("\n📐 Indicators:")
+        for name, values in indicators.values().items():
+            if not values['ticks']:
+                continue
+            print(
+                f"   {name:>4}: low ${values['min']:,.2f}  high ${values['max']:,.2f}  "
+                f"mean ${values['mean']:,.2f}  twap ${values['twap']:,.2f}  "
+                f"stdev {values['stdev']:,.2f}  atr {values['atr'] or 0:,.2f}  ({values['ticks']} ticks)"
+            )
+    
+    from quote_cache import QuoteCache
+    from price_monitor import KNOWN_SYMBOLS
+    cache = QuoteCache()
+    btc = {'BTC': KNOWN_SYMBOLS['BTC']}
+    quote = (cache.get(btc) if fetch_quote else cache.peek(btc)).get('BTC')
+    if quote:
+        print("\n💱 Latest Quote:")
+        stale = "  (stale)" if quote.get('stale') else ""
+        print(f"   BTC ${quote['price']:,.2f} at {quote['timestamp'].strftime('%Y-%m-%d %H:%M:%S')}{stale}")
     
     print("\n" + "="*60 + "\n")
 
 
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="View the saved state (read-only)")
+    parser.add_argument('--quote', action='store_true',
+                        help="Fetch a live BTC quote (default: last cached quote, no network)")
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
-    main()
+    main(fetch_quote=parse_args().quote)
 
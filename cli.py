@@ -0,0 +1,217 @@
+"""
+CLI - Single entry point for running the monitor and the ops tools
+
+    python cli.py status [--symbol ETH] [--full [--quote]]
+    python cli.py reset [--symbol ETH] [--full] [--yes]
+    python cli.py trades [--symbol ETH] [--last 20]
+    python cli.py run
+    python cli.py backtest <path> [backtest options]
+
+Every subcommand imports only what it uses. status and reset read or
+rewrite just the position header of the snapshot (see state_header), so
+they finish in milliseconds however large the price window is; the
+monitor's dependencies (requests, numpy, SMTP) are never loaded for them.
+"""
+import argparse
+import os
+import sys
+from typing import List, Optional
+
+
+def _symbols(args) -> List[Optional[str]]:
+    """State keys to act on: the --symbol given, the SYMBOLS in use, or single-symbol mode"""
+    if args.symbol:
+        return [args.symbol.upper()]
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+    specs = [spec for spec in os.getenv('SYMBOLS', '').split(',') if spec.strip()]
+    # Same names as resolve_symbols, without resolving provider ids
+    return [spec.split(':')[0].strip().upper() for spec in specs] or [None]
+
+
+def _print_position(symbol: Optional[str]) -> None:
+    from datetime import datetime
+    from state_header import journal_records, read_position, state_paths
+
+    state_file, _ = state_paths(symbol)
+    print(f"\n📊 {symbol or 'BTC'} ({state_file}):")
+    position = read_position(symbol)
+    if position is None:
+        print("   No saved state yet")
+        return
+    if position.is_open:
+        print("   ✅ Position OPEN")
+        print(f"   Entry Price: ${position.entry_price:,.2f}")
+        print(f"   Entry Time: {position.entry_timestamp}")
+    else:
+        print("   ❌ Position CLOSED (No active position)")
+    saved = datetime.fromtimestamp(os.path.getmtime(state_file))
+    print(f"   Snapshot: {os.path.getsize(state_file) / 1024:,.0f} KiB, "
+          f"saved {saved.strftime('%Y-%m-%d %H:%M:%S')}; {journal_records(symbol):,} ticks journaled since")
+
+
+def _print_trade_stats() -> None:
+    from trade_ledger import TRADE_LEDGER_FILE, TradeLedger
+
+    if not TRADE_LEDGER_FILE or not os.path.exists(TRADE_LEDGER_FILE):
+        return
+    # Checkpointed statistics plus whatever was appended since: no full replay
+    ledger = TradeLedger()
+    print(f"\n📒 Trades ({ledger.path}): {len(ledger.open_positions())} open")
+    for name, stats in [('All', ledger.stats)] + sorted(ledger.by_symbol.items()):
+        if stats.trades:
+            print(
+                f"   {name:>4}: {stats.trades} closed, win rate {stats.win_rate:.1f}%, "
+                f"P/L {stats.pnl_pct:+.2f}%, max drawdown {stats.max_drawdown:.2f}%"
+            )
+
+
+def cmd_status(args) -> int:
+    if args.full:
+        # Loads the whole window, archive and indicators, plus the cached quote
+        import check_state
+        check_state.main(fetch_quote=args.quote)
+        return 0
+    for symbol in _symbols(args):
+        _print_position(symbol)
+    _print_trade_stats()
+    print()
+    return 0
+
+
+def cmd_trades(args) -> int:
+    from collections import deque
+    from trade_ledger import TRADE_LEDGER_FILE, TradeLedger
+
+    if not TRADE_LEDGER_FILE:
+        print("Trade ledger disabled (TRADE_LEDGER_FILE is empty)")
+        return 1
+    symbol = args.symbol.upper() if args.symbol else None
+    closes = deque(
+        (event for event in TradeLedger(TRADE_LEDGER_FILE).history(symbol) if event['event'] == 'close'),
+        maxlen=args.last
+    )
+    if not closes:
+        print("No closed trades yet")
+        return 0
+    for event in closes:
+        exit_price = f"${event['price']:,.2f}" if event['price'] is not None else "-"
+        pnl = f"{event['pnl_pct']:+.2f}%" if event['pnl_pct'] is not None else "-"
+        print(
+            f"{event['time'][:19]}  {event['symbol']:<5} {event['exit_type']:<5} "
+            f"entry ${event['entry_price']:,.2f}  exit {exit_price}  P/L {pnl}  size {event['size']:g}"
+        )
+    return 0
+
+
+def _confirm(prompt: str, assume_yes: bool) -> bool:
+    if assume_yes:
+        return True
+    return input(f"{prompt} (yes/no): ").lower() == 'yes'
+
+
+def _record_reset(name: str, position) -> None:
+    """Close the ledger trade of a position being reset, as a manual reset"""
+    from datetime import datetime
+    from state_manager import ledger_trade
+    from trade_ledger import TRADE_LEDGER_FILE, TradeLedger
+
+    if not TRADE_LEDGER_FILE or position is None or not position.is_open:
+        return
+    ledger = TradeLedger()
+    trade = ledger_trade(ledger, name, position)
+    if trade is not None:
+        ledger.close(trade, None, datetime.now().isoformat(), 'RESET')
+
+
+def cmd_reset(args) -> int:
+    from state_header import read_position, write_position
+
+    for symbol in _symbols(args):
+        _print_position(symbol)
+        name = symbol or 'BTC'
+        if args.full:
+            if not _confirm(f"⚠️  This will reset EVERYTHING for {name} including price history. Continue?",
+                            args.yes):
+                print("Cancelled.")
+                continue
+            from state_manager import close_state, default_state
+            position = read_position(symbol)
+            # A fresh snapshot truncates the journal too
+            close_state(default_state(symbol))
+            _record_reset(name, position)
+            print(f"✅ {name} state completely reset (including price history).")
+            continue
+
+        position = read_position(symbol)
+        if position is None or not position.is_open:
+            print(f"ℹ️  No {name} position is currently open.")
+            continue
+        if not _confirm(f"Close the {name} position opened at ${position.entry_price:,.2f}?", args.yes):
+            print("Cancelled.")
+            continue
+        _record_reset(name, position)
+        position.close()
+        write_position(position, symbol)
+        print(f"✅ {name} position closed. Price history kept.")
+    print()
+    return 0
+
+
+def cmd_run(args) -> int:
+    from main import main as run_monitor
+    run_monitor()
+    return 0
+
+
+def cmd_backtest(argv: List[str]) -> int:
+    from backtest import main as run_backtest
+    run_backtest(argv)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cli.py", description="Bitcoin Short Alert System")
+    commands = parser.add_subparsers(dest='command', metavar='command')
+    commands.required = True
+
+    status = commands.add_parser('status', help="Show the saved position (header only, fast)")
+    status.add_argument('--symbol', help="Symbol in multi-symbol mode (default: every symbol in SYMBOLS)")
+    status.add_argument('--full', action='store_true',
+                        help="Also load the price window, archive, indicators and latest cached quote")
+    status.add_argument('--quote', action='store_true', help="With --full, fetch a live quote")
+    status.set_defaults(handler=cmd_status)
+
+    reset = commands.add_parser('reset', help="Close the open position (stop the monitor first)")
+    reset.add_argument('--symbol', help="Symbol in multi-symbol mode (default: every symbol in SYMBOLS)")
+    reset.add_argument('--full', action='store_true', help="Also clear the price history")
+    reset.add_argument('--yes', action='store_true', help="Do not ask for confirmation")
+    reset.set_defaults(handler=cmd_reset)
+
+    trades = commands.add_parser('trades', help="List closed trades from the trade ledger")
+    trades.add_argument('--symbol', help="Only this symbol")
+    trades.add_argument('--last', type=int, default=20, help="Number of most recent trades (default: 20)")
+    trades.set_defaults(handler=cmd_trades)
+
+    run = commands.add_parser('run', help="Run the monitor (same as python main.py)")
+    run.set_defaults(handler=cmd_run)
+
+    # Listed for --help only; its arguments go straight to backtest.py
+    commands.add_parser('backtest', help="Replay historical ticks (see python cli.py backtest --help)",
+                        add_help=False)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == 'backtest':
+        return cmd_backtest(argv[1:])
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -46,5 +46,10 @@ def load_config() -> Dict:
     # Build recipients list
     config['recipients'] = [config['alert_email_1'], config['alert_email_2']]
     
+    # Optional multi-symbol mode, e.g. SYMBOLS=BTC,ETH,SOL
+    config['symbols'] = [
+        symbol.strip() for symbol in os.getenv('SYMBOLS', '').split(',') if symbol.strip()
+    ]
+    
     return config
 
@@ -0,0 +1,460 @@
+"""
+Coordination - Leases, leader election and symbol sharding across workers
+
+Several workers can run the same monitor for availability. Each symbol is
+worked by exactly one of them, the holder of its lease: only that worker
+fetches prices, sends alerts and writes the symbol's state. The others are
+hot standbys. They follow the owner's published ticks and position
+through the shared store, so their windows stay current without API calls,
+and they take over within one LEASE_TTL of the owner going away.
+
+    COORDINATION=none   Single worker, no leases (default)
+    COORDINATION=file   Leases in a directory (COORDINATION_PATH), for
+                        workers on one host
+    COORDINATION=redis  Leases in any Redis-compatible server (REDIS_URL)
+
+With SHARD_SYMBOLS=false one "leader" lease covers every symbol. With
+SHARD_SYMBOLS=true each symbol has its own lease and live workers split
+the symbols between them by rendezvous hashing.
+"""
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Set
+from urllib.parse import urlparse
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not on Windows
+    fcntl = None
+
+from metrics import LEASE_CHANGES, OWNED_SYMBOLS
+from symbol_state import Position, SymbolState
+from tick_journal import write_atomic
+
+
+COORDINATION = os.getenv('COORDINATION', 'none').lower()
+COORDINATION_PATH = os.getenv('COORDINATION_PATH', 'coordination')
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+# Prefix of every key in the shared store, so deployments can share a server
+COORDINATION_PREFIX = os.getenv('COORDINATION_PREFIX', 'btc-alert:')
+# A lease not renewed for this many seconds passes to another worker;
+# leases are renewed every LEASE_TTL / 3
+LEASE_TTL = float(os.getenv('LEASE_TTL', '15'))
+SHARD_SYMBOLS = os.getenv('SHARD_SYMBOLS', 'false').lower() == 'true'
+WORKER_ID = os.getenv('WORKER_ID') or f"{socket.gethostname()}-{os.getpid()}"
+
+# Newest ticks in each published feed; a follower polling once per tick
+# catches up even if it runs a few ticks behind
+FEED_TICKS = 32
+# Keys SCAN looks at per call while listing leases
+_SCAN_COUNT = 500
+
+
+class StoreError(IOError):
+    """The shared store rejected a command"""
+
+
+class FileStore:
+    """
+    Leases and values in a local directory.
+
+    Leases live in one JSON file updated under an exclusive flock, so the
+    check-and-set of acquire is atomic across processes on this host.
+    """
+
+    def __init__(self, path: str = COORDINATION_PATH, clock: Callable[[], float] = time.time):
+        if fcntl is None:
+            raise ValueError("COORDINATION=file needs fcntl; use COORDINATION=redis on this platform")
+        self.path = path
+        self.clock = clock
+        os.makedirs(path, exist_ok=True)
+        self._leases_path = os.path.join(path, 'leases.json')
+
+    @contextmanager
+    def _leases(self) -> Iterator[Dict[str, Dict]]:
+        """Lease table under an exclusive lock; changes are written back"""
+        with open(self._leases_path + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                leases = {}
+                if os.path.exists(self._leases_path):
+                    with open(self._leases_path) as f:
+                        try:
+                            leases = json.load(f)
+                        except ValueError as e:
+                            # Leases are short-lived; start over rather than wedge every worker
+                            print(f"Discarding corrupt lease file {self._leases_path}: {e}")
+                before = json.dumps(leases, sort_keys=True)
+                yield leases
+                if json.dumps(leases, sort_keys=True) != before:
+                    write_atomic(self._leases_path, json.dumps(leases).encode(), durable=False)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def acquire(self, key: str, owner: str, ttl: float) -> bool:
+        """Take the lease if it is free or expired, or renew it if owner holds it"""
+        now = self.clock()
+        with self._leases() as leases:
+            lease = leases.get(key)
+            if lease is not None and lease['owner'] != owner and lease['expires'] > now:
+                return False
+            leases[key] = {'owner': owner, 'expires': now + ttl}
+            return True
+
+    def release(self, key: str, owner: str) -> None:
+        """Give the lease up if owner holds it"""
+        with self._leases() as leases:
+            if leases.get(key, {}).get('owner') == owner:
+                del leases[key]
+
+    def owners(self, prefix: str) -> Dict[str, str]:
+        """Key -> owner of every live lease whose key starts with prefix"""
+        now = self.clock()
+        with self._leases() as leases:
+            return {
+                key: lease['owner'] for key, lease in leases.items()
+                if key.startswith(prefix) and lease['expires'] > now
+            }
+
+    def _value_path(self, key: str) -> str:
+        return os.path.join(self.path, key.replace(':', '_') + '.json')
+
+    def set(self, key: str, value: str) -> None:
+        write_atomic(self._value_path(key), value.encode(), durable=False)
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            with open(self._value_path(key)) as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+
+class _RedisConnection:
+    """Minimal RESP2 client: just the commands the RedisStore uses"""
+
+    def __init__(self, url: str, timeout: float = 5):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip('/') or 0)
+        self.timeout = timeout
+        self._sock = None
+        self._reader = None
+
+    def _connect(self) -> None:
+        self._sock = socket.create_connection((self.host, self.port), self.timeout)
+        self._reader = self._sock.makefile('rb')
+        if self.password:
+            self._command('AUTH', self.password)
+        if self.db:
+            self._command('SELECT', self.db)
+
+    def command(self, *args):
+        """Send one command and return its reply; bulk strings come back as bytes"""
+        try:
+            if self._sock is None:
+                self._connect()
+            return self._command(*args)
+        except OSError:
+            # Also drops any WATCH left on the connection
+            self.close()
+            raise
+
+    def _command(self, *args):
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(b'$%d\r\n%s\r\n' % (len(data), data))
+        self._sock.sendall(b''.join(parts))
+        return self._read()
+
+    def _read(self):
+        line = self._reader.readline()
+        if not line.endswith(b'\r\n'):
+            raise ConnectionError("Redis connection closed")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest.decode()
+        if kind == b'-':
+            raise StoreError(rest.decode())
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            length = int(rest)
+            return None if length < 0 else self._reader.read(length + 2)[:-2]
+        if kind == b'*':
+            length = int(rest)
+            return None if length < 0 else [self._read() for _ in range(length)]
+        raise ConnectionError(f"Unexpected Redis reply: {line!r}")
+
+    def close(self) -> None:
+        if self._sock is not None:
+            self._reader.close()
+            self._sock.close()
+            self._sock = self._reader = None
+
+
+class RedisStore:
+    """
+    Leases and values in a Redis-compatible server.
+
+    A lease is a key holding its owner with a PX expiry: SET NX takes it,
+    and a WATCH/MULTI/EXEC transaction renews or deletes it only while the
+    owner still holds it.
+    """
+
+    def __init__(self, url: str = REDIS_URL, prefix: str = COORDINATION_PREFIX):
+        self.prefix = prefix
+        self._conn = _RedisConnection(url)
+        # One command sequence at a time on the shared connection
+        self._lock = threading.Lock()
+
+    def _if_owner(self, key: str, owner: str, *command) -> bool:
+        """Run command in a transaction if owner still holds the key"""
+        conn = self._conn
+        conn.command('WATCH', key)
+        if conn.command('GET', key) != owner.encode():
+            conn.command('UNWATCH')
+            return False
+        conn.command('MULTI')
+        conn.command(*command)
+        result = conn.command('EXEC')
+        return bool(result and result[0])
+
+    def acquire(self, key: str, owner: str, ttl: float) -> bool:
+        """Take the lease if it is free or expired, or renew it if owner holds it"""
+        key = self.prefix + key
+        ms = max(1, int(ttl * 1000))
+        with self._lock:
+            if self._conn.command('SET', key, owner, 'NX', 'PX', ms) == 'OK':
+                return True
+            return self._if_owner(key, owner, 'PEXPIRE', key, ms)
+
+    def release(self, key: str, owner: str) -> None:
+        """Give the lease up if owner holds it"""
+        key = self.prefix + key
+        with self._lock:
+            self._if_owner(key, owner, 'DEL', key)
+
+    def owners(self, prefix: str) -> Dict[str, str]:
+        """
+        Key -> owner of every live lease whose key starts with prefix
+
+        Keys are listed with SCAN, a page at a time, rather than KEYS,
+        which blocks the whole server while it walks a large keyspace.
+        """
+        start = len(self.prefix)
+        found = {}
+        with self._lock:
+            cursor = b'0'
+            while True:
+                cursor, keys = self._conn.command(
+                    'SCAN', cursor, 'MATCH', f"{self.prefix}{prefix}*", 'COUNT', _SCAN_COUNT
+                )
+                if keys:
+                    values = self._conn.command('MGET', *keys)
+                    for key, value in zip(keys, values):
+                        if value is not None:
+                            found[key.decode()[start:]] = value.decode()
+                if cursor == b'0':
+                    return found
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._conn.command('SET', self.prefix + key, value)
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._conn.command('GET', self.prefix + key)
+        return None if value is None else value.decode()
+
+
+def _rendezvous(symbol: str, members: List[str]) -> str:
+    """Member with the highest hash for the symbol; only symbols of a departed member move"""
+    return max(
+        members,
+        key=lambda member: hashlib.blake2b(f"{symbol}|{member}".encode(), digest_size=8).digest()
+    )
+
+
+class Coordinator:
+    """
+    Holds this worker's leases and decides which symbols it works.
+
+    A background thread acquires and renews the leases every ttl / 3. If
+    the main loop has not called beat() for stall_after seconds, renewal
+    stops so a hung worker hands its symbols over instead of sitting on
+    them; if the store is unreachable, ownership is dropped before the
+    leases can have expired.
+    """
+
+    def __init__(
+        self,
+        store,
+        symbols: List[str],
+        worker_id: str = WORKER_ID,
+        ttl: float = LEASE_TTL,
+        shard: bool = SHARD_SYMBOLS,
+        stall_after: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.store = store
+        self.symbols = list(symbols)
+        self.worker_id = worker_id
+        self.ttl = ttl
+        self.shard = shard
+        self.stall_after = stall_after
+        self.clock = clock
+        self._owned: Set[str] = set()
+        self._held: Set[str] = set()        # Lease keys held after the last refresh
+        self._refreshed_at: Optional[float] = None
+        self._beat = clock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _assignments(self) -> Dict[str, List[str]]:
+        """Lease key -> symbols this worker should work under it"""
+        if not self.shard:
+            return {'leader': self.symbols}
+        members = set(self.store.owners('member:').values())
+        members.add(self.worker_id)
+        members = sorted(members)
+        return {
+            f"symbol:{symbol}": [symbol] for symbol in self.symbols
+            if _rendezvous(symbol, members) == self.worker_id
+        }
+
+    def refresh(self) -> None:
+        """Acquire or renew this worker's leases and release any it should no longer hold"""
+        now = self.clock()
+        owned: Set[str] = set()
+        held: Set[str] = set()
+        try:
+            if self.stall_after is None or now - self._beat <= self.stall_after:
+                if self.shard:
+                    self.store.acquire(f"member:{self.worker_id}", self.worker_id, self.ttl)
+                for key, symbols in self._assignments().items():
+                    if self.store.acquire(key, self.worker_id, self.ttl):
+                        held.add(key)
+                        owned.update(symbols)
+            elif self._held:
+                print(f"Main loop silent for {now - self._beat:.0f}s; giving up leases")
+            for key in self._held - held:
+                self.store.release(key, self.worker_id)
+            self._refreshed_at = now
+            self._held = held
+        except IOError as e:
+            print(f"Coordination store error: {e}")
+            # Keep working only while our leases are surely still valid
+            if self._refreshed_at is not None and now - self._refreshed_at < self.ttl * 2 / 3:
+                return
+        self._set_owned(owned)
+
+    def _set_owned(self, owned: Set[str]) -> None:
+        LEASE_CHANGES.labels('gained').inc(len(owned - self._owned))
+        LEASE_CHANGES.labels('lost').inc(len(self._owned - owned))
+        self._owned = owned
+        OWNED_SYMBOLS.set(len(owned))
+
+    def owned(self) -> Set[str]:
+        """Symbols this worker works now"""
+        return set(self._owned)
+
+    def beat(self) -> None:
+        """Mark the main loop as alive"""
+        self._beat = self.clock()
+
+    def start(self) -> None:
+        """Take the first leases now, then keep renewing them in the background"""
+        self.refresh()
+        self._thread = threading.Thread(target=self._run, name="coordinator", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.ttl / 3):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Coordinator error: {e!r}")
+
+    def stop(self) -> None:
+        """Stop renewing and release every lease so a standby takes over at once"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.ttl)
+            self._thread = None
+        keys = set(self._held)
+        if self.shard:
+            keys.add(f"member:{self.worker_id}")
+        for key in keys:
+            try:
+                self.store.release(key, self.worker_id)
+            except IOError as e:
+                print(f"Error releasing lease {key}: {e}")
+        self._held = set()
+        self._set_owned(set())
+
+    def publish(self, symbol: str, state: SymbolState) -> None:
+        """Share an owned symbol's newest ticks and position with the standbys"""
+        feed = {'position': state.position.to_header(), 'ticks': state.window.tail(FEED_TICKS)}
+        try:
+            self.store.set(f"feed:{symbol}", json.dumps(feed))
+        except IOError as e:
+            print(f"Error publishing {symbol} feed: {e}")
+
+    def follow(self, symbol: str, state: SymbolState) -> int:
+        """
+        Bring a standby symbol's state up to its owner's published feed
+
+        Ticks go into the window and indicators only: the owner archives
+        and persists them.
+
+        Returns:
+            Number of new ticks applied
+        """
+        try:
+            raw = self.store.get(f"feed:{symbol}")
+            if raw is None:
+                return 0
+            feed = json.loads(raw)
+        except (IOError, ValueError) as e:
+            print(f"Error reading {symbol} feed: {e}")
+            return 0
+
+        added = 0
+        window = state.window
+        indicators = state.indicators
+        for timestamp, price in feed['ticks']:
+            latest = window.latest()
+            # Allow for the window's nanosecond rounding of the timestamp
+            if latest is not None and timestamp <= latest[0] + 1e-6:
+                continue
+            window.append(timestamp, price)
+            if indicators is not None:
+                indicators.append(timestamp, price)
+            added += 1
+        state.position = Position.from_header(feed['position'])
+        return added
+
+
+def build_coordinator(symbols: List[str]) -> Optional[Coordinator]:
+    """
+    Coordinator over the store COORDINATION selects, or None for a single worker
+
+    Raises:
+        ValueError: If COORDINATION names an unknown store
+    """
+    if COORDINATION == 'none':
+        return None
+    if COORDINATION == 'file':
+        return Coordinator(FileStore(), symbols)
+    if COORDINATION == 'redis':
+        return Coordinator(RedisStore(), symbols)
+    raise ValueError(f"Unknown COORDINATION {COORDINATION!r}; use none, file or redis")
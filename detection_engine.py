@@ -1,44 +1,106 @@
 """
 Detection Engine - Detects entry and exit signals
 """
-from typing import Optional, List, Dict, Tuple
+import os
+from typing import List, Optional, Tuple
 
+import numpy as np
 
-def check_entry_signal(current_price: float, price_history: List[Dict]) -> Tuple[bool, Optional[float], Optional[float]]:
+from indicators import IndicatorEngine
+from rolling_window import RollingWindow
+
+
+# Entry signal: spike above the 6-hour low (TESTING - temporarily lowered from 3.0%)
+ENTRY_SPIKE_PCT = 0.1
+# Take Profit: price drops this far below the short entry
+TAKE_PROFIT_PCT = 2.5
+# Stop Loss: price rises this far above the short entry (changed from 1.5%)
+STOP_LOSS_PCT = 2.5
+# Indicator horizons whose low the spike must also clear, e.g. "1h,24h"
+# (empty: the 6-hour window alone decides)
+ENTRY_CONFIRM_HORIZONS = [
+    name.strip() for name in os.getenv('ENTRY_CONFIRM_HORIZONS', '').split(',') if name.strip()
+]
+
+
+def check_entry_signal(
+    current_price: float,
+    window: RollingWindow,
+    entry_spike_pct: float = ENTRY_SPIKE_PCT,
+    indicators: Optional[IndicatorEngine] = None,
+    confirm_horizons: List[str] = ENTRY_CONFIRM_HORIZONS
+) -> Tuple[bool, Optional[float], Optional[float]]:
     """
     Check if entry signal is triggered (3%+ spike in 6-hour window)
     
     Args:
         current_price: Current BTC price
-        price_history: List of price entries with 'price' field
+        window: Rolling price window (6 hours)
+        entry_spike_pct: Minimum spike above the window low, in percent
+        indicators: Multi-horizon indicators; with confirm_horizons, the
+            spike must also clear the low of each of those horizons
+        confirm_horizons: Indicator horizon names to confirm against
         
     Returns:
         Tuple of (signal_triggered, 6hr_low, spike_percentage)
     """
-    if not price_history:
-        return False, None, None
-    
     # Get 6-hour low
-    prices = [entry['price'] for entry in price_history]
-    six_hr_low = min(prices)
+    six_hr_low = window.min()
+    if six_hr_low is None:
+        return False, None, None
     
     # Calculate spike percentage
     spike_pct = ((current_price - six_hr_low) / six_hr_low) * 100
     
-    # Entry signal: 0.1% or more spike (TESTING - temporarily lowered from 3.0%)
-    if spike_pct >= 0.1:
+    # Entry signal: entry_spike_pct or more spike
+    if spike_pct >= entry_spike_pct:
+        if indicators is not None and confirm_horizons:
+            triggered = confirm_entry(current_price, indicators, confirm_horizons, entry_spike_pct)
+            return triggered, six_hr_low, spike_pct
         return True, six_hr_low, spike_pct
     
     return False, six_hr_low, spike_pct
 
 
-def check_exit_signal(current_price: float, entry_price: float) -> Optional[str]:
+def confirm_entry(
+    current_price: float,
+    indicators: IndicatorEngine,
+    horizons: List[str],
+    entry_spike_pct: float = ENTRY_SPIKE_PCT
+) -> bool:
+    """
+    Check that the price spikes entry_spike_pct above the low of every horizon
+    
+    Args:
+        current_price: Current price
+        indicators: Multi-horizon indicators of the symbol
+        horizons: Horizon names, e.g. ["1h", "24h"]
+        entry_spike_pct: Minimum spike above each horizon low, in percent
+        
+    Returns:
+        True if every horizon confirms
+    """
+    for name in horizons:
+        low = indicators[name].min()
+        if low is None or (current_price - low) / low * 100 < entry_spike_pct:
+            return False
+    return True
+
+
+def check_exit_signal(
+    current_price: float,
+    entry_price: float,
+    take_profit_pct: float = TAKE_PROFIT_PCT,
+    stop_loss_pct: float = STOP_LOSS_PCT
+) -> Optional[str]:
     """
     Check if exit signal is triggered (TP or SL)
     
     Args:
         current_price: Current BTC price
         entry_price: Position entry price
+        take_profit_pct: Drop below entry that takes profit, in percent
+        stop_loss_pct: Rise above entry that stops out, in percent
         
     Returns:
         "TP" for take profit, "SL" for stop loss, or None
@@ -49,12 +111,12 @@ def check_exit_signal(current_price: float, entry_price: float) -> Optional[str]
     # Calculate price change percentage
     change_pct = ((current_price - entry_price) / entry_price) * 100
     
-    # Take Profit: Price drops 2.5% below entry
-    if change_pct <= -2.5:
+    # Take Profit: Price drops take_profit_pct below entry
+    if change_pct <= -take_profit_pct:
         return "TP"
     
-    # Stop Loss: Price rises 2.5% above entry (changed from 1.5%)
-    if change_pct >= 2.5:
+    # Stop Loss: Price rises stop_loss_pct above entry
+    if change_pct >= stop_loss_pct:
         return "SL"
     
     return None
@@ -70,7 +132,80 @@ def calculate_target_prices(entry_price: float) -> Tuple[float, float]:
     Returns:
         Tuple of (take_profit_price, stop_loss_price)
     """
-    take_profit = entry_price * (1 - 0.025)  # 2.5% below entry
-    stop_loss = entry_price * (1 + 0.025)    # 2.5% above entry (changed from 1.5%)
+    take_profit = entry_price * (1 - TAKE_PROFIT_PCT / 100)  # TP below entry
+    stop_loss = entry_price * (1 + STOP_LOSS_PCT / 100)      # SL above entry
     return take_profit, stop_loss
 
+
+def check_entry_signals_batch(
+    current_prices: np.ndarray,
+    window_lows: np.ndarray,
+    confirm_lows: Optional[np.ndarray] = None,
+    entry_spike_pct: float = ENTRY_SPIKE_PCT
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized check_entry_signal across many symbols
+    
+    Args:
+        current_prices: Current price per symbol
+        window_lows: 6-hour low per symbol (NaN where the window is empty)
+        confirm_lows: Optional (symbols, horizons) array of confirmation
+            horizon lows; the spike must clear every one of them
+        entry_spike_pct: Minimum spike above the window low, in percent
+        
+    Returns:
+        Tuple of (signal_mask, spike_percentages); spike is NaN and the
+        signal False for symbols without a window low
+    """
+    current_prices = np.asarray(current_prices, dtype=np.float64)
+    window_lows = np.asarray(window_lows, dtype=np.float64)
+    
+    spike_pct = (current_prices - window_lows) / window_lows * 100
+    # NaN compares False, so empty windows never signal
+    signal_mask = spike_pct >= entry_spike_pct
+    if confirm_lows is not None and confirm_lows.size:
+        confirm_spike = (current_prices[:, None] - confirm_lows) / confirm_lows * 100
+        signal_mask &= np.all(confirm_spike >= entry_spike_pct, axis=1)
+    return signal_mask, spike_pct
+
+
+def check_exit_signals_batch(
+    current_prices: np.ndarray,
+    entry_prices: np.ndarray,
+    take_profit_pct: float = TAKE_PROFIT_PCT,
+    stop_loss_pct: float = STOP_LOSS_PCT
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Vectorized check_exit_signal across many symbols (or many ticks of one)
+    
+    Args:
+        current_prices: Current price per symbol
+        entry_prices: Entry price per symbol (NaN where no position is open)
+        take_profit_pct: Drop below entry that takes profit, in percent
+        stop_loss_pct: Rise above entry that stops out, in percent
+        
+    Returns:
+        Tuple of (take_profit_mask, stop_loss_mask, change_percentages)
+    """
+    current_prices = np.asarray(current_prices, dtype=np.float64)
+    entry_prices = np.asarray(entry_prices, dtype=np.float64)
+    
+    change_pct = (current_prices - entry_prices) / entry_prices * 100
+    take_profit_mask = change_pct <= -take_profit_pct
+    stop_loss_mask = change_pct >= stop_loss_pct
+    return take_profit_mask, stop_loss_mask, change_pct
+
+
+def calculate_target_prices_batch(entry_prices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized calculate_target_prices across many symbols
+    
+    Args:
+        entry_prices: Entry price per symbol
+        
+    Returns:
+        Tuple of (take_profit_prices, stop_loss_prices)
+    """
+    entry_prices = np.asarray(entry_prices, dtype=np.float64)
+    return entry_prices * (1 - TAKE_PROFIT_PCT / 100), entry_prices * (1 + STOP_LOSS_PCT / 100)
+
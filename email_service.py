@@ -1,11 +1,162 @@
 """
 Email Service - Sends alerts via Gmail SMTP
 """
+import base64
+import os
+import re
+import secrets
 import smtplib
 import time
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from typing import List
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from alert_templates import DIGEST_HTML, DIGEST_SEPARATOR, ENTRY_TEMPLATE, EXIT_TEMPLATES
+from metrics import SMTP_RETRIES, SMTP_SEND_SECONDS
+
+
+SMTP_HOST = os.getenv('SMTP_HOST', 'smtp.gmail.com')
+
+# Try multiple SMTP methods
+SMTP_CONFIGS = [
+    # Method 1: TLS on port 587 (standard)
+    {'host': SMTP_HOST, 'port': 587, 'use_tls': True, 'use_ssl': False},
+    # Method 2: SSL on port 465 (alternative)
+    {'host': SMTP_HOST, 'port': 465, 'use_tls': False, 'use_ssl': True},
+]
+if os.getenv('SMTP_PORT'):
+    # Explicit server, e.g. a relay or a local stand-in
+    SMTP_CONFIGS = [{
+        'host': SMTP_HOST,
+        'port': int(os.getenv('SMTP_PORT')),
+        'use_tls': os.getenv('SMTP_STARTTLS', 'true').lower() == 'true',
+        'use_ssl': False,
+    }]
+
+
+def open_smtp(config: Dict, gmail_user: str, gmail_password: str) -> smtplib.SMTP:
+    """
+    Connect and log in using one of SMTP_CONFIGS
+    
+    Raises:
+        smtplib.SMTPException or OSError if the connection or login fails
+    """
+    if config['use_ssl']:
+        # Use SSL connection
+        server = smtplib.SMTP_SSL(config['host'], config['port'], timeout=10)
+    else:
+        server = smtplib.SMTP(config['host'], config['port'], timeout=10)
+        if config['use_tls']:
+            # Use TLS connection
+            server.starttls()
+    
+    try:
+        server.ehlo_or_helo_if_needed()
+        # Local stand-in servers may not offer AUTH
+        if server.has_extn('auth'):
+            server.login(gmail_user, gmail_password)
+    except Exception:
+        server.close()
+        raise
+    return server
+
+
+# Separates the MIME parts. Every part is base64, which has no '-', so no
+# body can contain a boundary line
+_BOUNDARY = 'alert-part-' + secrets.token_hex(8)
+# UTF-8 bytes per RFC 2047 encoded word: 60 base64 characters, 72 with the markers
+_WORD_BYTES = 45
+
+
+def _base64(body: str) -> bytes:
+    return base64.encodebytes(body.encode('utf-8')).replace(b'\n', b'\r\n')
+
+
+def _encode_subject(subject: str) -> bytes:
+    """Subject as RFC 2047 encoded words, one per folded line (email.header.Header is far slower)"""
+    data = subject.encode('utf-8')
+    words = []
+    start = 0
+    while start < len(data):
+        end = min(start + _WORD_BYTES, len(data))
+        # Never split a multi-byte character across two words
+        while end < len(data) and data[end] & 0xC0 == 0x80:
+            end -= 1
+        words.append(b'=?utf-8?b?' + base64.b64encode(data[start:end]) + b'?=')
+        start = end
+    return b'\r\n '.join(words)
+
+
+class MessageFrame:
+    """
+    Serialized email of one sender to one recipient list, minus the alert.
+    
+    The envelope headers and the MIME part headers never change, so they
+    are encoded once; render() only adds the subject and the bodies. This
+    replaces building a MIMEMultipart and flattening it for every email.
+    """
+    
+    def __init__(self, sender: str, recipients: Tuple[str, ...]):
+        self.sender = sender
+        self.recipients = list(recipients)
+        self._head = (
+            f'Content-Type: multipart/alternative; boundary="{_BOUNDARY}"\r\n'
+            f'MIME-Version: 1.0\r\n'
+            f'From: {sender}\r\n'
+            f'To: {", ".join(recipients)}\r\n'
+            f'Subject: '
+        ).encode()
+        part = '--' + _BOUNDARY + '\r\nContent-Type: text/{}; charset="utf-8"\r\n' \
+               'Content-Transfer-Encoding: base64\r\n\r\n'
+        self._text_part = part.format('plain').encode()
+        self._html_part = part.format('html').encode()
+        self._end = f'--{_BOUNDARY}--\r\n'.encode()
+    
+    def render(self, subject: str, html: str, text: Optional[str] = None) -> bytes:
+        """The complete message, with a plain-text part if text is given"""
+        parts = [self._head, _encode_subject(subject), b'\r\n\r\n']
+        if text is not None:
+            parts += [self._text_part, _base64(text)]
+        parts += [self._html_part, _base64(html), self._end]
+        return b''.join(parts)
+
+
+@lru_cache(maxsize=32)
+def message_frame(sender: str, recipients: Tuple[str, ...]) -> MessageFrame:
+    """Frame for a sender and recipient list, built on first use"""
+    return MessageFrame(sender, recipients)
+
+
+def build_message(
+    gmail_user: str,
+    recipients: List[str],
+    subject: str,
+    body: str,
+    text: Optional[str] = None
+) -> bytes:
+    """Serialized email for an alert: HTML body plus an optional plain-text alternative"""
+    return message_frame(gmail_user, tuple(recipients)).render(subject, body, text)
+
+
+def build_digest(alerts: List[Tuple[str, str, Optional[str]]]) -> Tuple[str, str, str]:
+    """
+    Merge several alerts into one digest email
+    
+    Args:
+        alerts: (subject, html body, plain text or None) of each alert, oldest first
+        
+    Returns:
+        (subject, html body, plain text) of the digest
+    """
+    subject = f"📬 {len(alerts)} alerts: " + " | ".join(alert[0] for alert in alerts)
+    sections = []
+    for _, body, _ in alerts:
+        match = re.search(r'<body[^>]*>(.*)</body>', body, re.S)
+        sections.append(match.group(1) if match else body)
+    body = DIGEST_HTML.render({'count': len(alerts), 'sections': DIGEST_SEPARATOR.join(sections)})
+    text = f"{len(alerts)} alerts:\n\n" + "\n\n".join(
+        text if text is not None else alert_subject for alert_subject, _, text in alerts
+    )
+    return subject, body, text
 
 
 def send_email(
@@ -14,7 +165,8 @@ def send_email(
     recipients: List[str],
     subject: str,
     body: str,
-    max_retries: int = 3
+    max_retries: int = 3,
+    text: Optional[str] = None
 ) -> bool:
     """
     Send email via Gmail SMTP with retry logic
@@ -26,57 +178,49 @@ def send_email(
         subject: Email subject
         body: Email body (HTML)
         max_retries: Maximum number of retry attempts
+        text: Plain-text alternative of the body
         
     Returns:
         True if successful, False otherwise
     """
     # Create message
-    msg = MIMEMultipart('alternative')
-    msg['Subject'] = subject
-    msg['From'] = gmail_user
-    msg['To'] = ', '.join(recipients)
-    
-    # Create HTML body
-    html_body = MIMEText(body, 'html')
-    msg.attach(html_body)
-    
-    # Try multiple SMTP methods with retries
-    smtp_configs = [
-        # Method 1: TLS on port 587 (standard)
-        {'host': 'smtp.gmail.com', 'port': 587, 'use_tls': True, 'use_ssl': False},
-        # Method 2: SSL on port 465 (alternative)
-        {'host': 'smtp.gmail.com', 'port': 465, 'use_tls': False, 'use_ssl': True},
-    ]
+    msg = build_message(gmail_user, recipients, subject, body, text)
     
     for attempt in range(max_retries):
-        for config in smtp_configs:
+        for config in SMTP_CONFIGS:
             try:
-                if config['use_ssl']:
-                    # Use SSL connection
-                    server = smtplib.SMTP_SSL(config['host'], config['port'], timeout=10)
-                else:
-                    # Use TLS connection
-                    server = smtplib.SMTP(config['host'], config['port'], timeout=10)
-                    server.starttls()
-                
-                server.login(gmail_user, gmail_password)
-                server.send_message(msg)
+                server = open_smtp(config, gmail_user, gmail_password)
+            except Exception as e:
+                print(f"SMTP attempt {attempt + 1} failed ({config['host']}:{config['port']}): {e}")
+                continue
+            
+            try:
+                with SMTP_SEND_SECONDS.time():
+                    server.sendmail(gmail_user, recipients, msg)
                 server.quit()
                 
                 print(f"Email sent successfully to {recipients}")
                 return True
                 
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+                # Refused, not lost: another attempt could only deliver it twice
+                print(f"SMTP server refused the email: {e}")
+                try:
+                    server.quit()
+                except Exception:
+                    pass
+                return False
             except Exception as e:
                 print(f"SMTP attempt {attempt + 1} failed ({config['host']}:{config['port']}): {e}")
-                if hasattr(server, 'quit'):
-                    try:
-                        server.quit()
-                    except:
-                        pass
+                try:
+                    server.quit()
+                except Exception:
+                    pass
                 continue
         
         # Wait before retry (exponential backoff)
         if attempt < max_retries - 1:
+            SMTP_RETRIES.inc()
             wait_time = 2 ** attempt  # 1s, 2s, 4s
             print(f"Retrying in {wait_time} seconds...")
             time.sleep(wait_time)
@@ -85,6 +229,99 @@ def send_email(
     return False
 
 
+class SMTPConnection:
+    """
+    Logged-in SMTP session reused across messages.
+    
+    Connects lazily, reconnects once when the server has dropped the
+    session, and can be kept warm with keepalive() between alerts.
+    """
+    
+    def __init__(self, gmail_user: str, gmail_password: str):
+        self.gmail_user = gmail_user
+        self.gmail_password = gmail_password
+        self._server: Optional[smtplib.SMTP] = None
+    
+    def connect(self) -> None:
+        """Open a session using the first SMTP config that works"""
+        self.close()
+        errors = []
+        for config in SMTP_CONFIGS:
+            try:
+                self._server = open_smtp(config, self.gmail_user, self.gmail_password)
+                return
+            except Exception as e:
+                errors.append(f"{config['host']}:{config['port']}: {e}")
+        raise smtplib.SMTPException(f"Could not connect to SMTP server ({'; '.join(errors)})")
+    
+    def send(self, recipients: List[str], msg: bytes) -> None:
+        """
+        Send a message (see build_message) over the open session, reconnecting once if it was dropped
+        
+        Only a lost connection is retried. Any other SMTP error (refused
+        recipient or sender, rejected data) is raised as is.
+        
+        Raises:
+            smtplib.SMTPException or OSError if delivery fails
+        """
+        with SMTP_SEND_SECONDS.time():
+            if self._server is None:
+                self.connect()
+            try:
+                self._server.sendmail(self.gmail_user, recipients, msg)
+                return
+            except smtplib.SMTPServerDisconnected:
+                pass
+            except smtplib.SMTPException:
+                # The server answered and refused: sending again could only deliver twice
+                raise
+            except OSError:
+                pass   # Connection reset or broken pipe
+            self.connect()
+            self._server.sendmail(self.gmail_user, recipients, msg)
+    
+    def keepalive(self) -> None:
+        """NOOP the session; reconnect now if it has gone stale"""
+        if self._server is None:
+            return
+        try:
+            code, _ = self._server.noop()
+            if code == 250:
+                return
+        except (smtplib.SMTPException, OSError):
+            pass
+        try:
+            self.connect()
+        except smtplib.SMTPException as e:
+            print(f"SMTP keepalive reconnect failed: {e}")
+    
+    def close(self) -> None:
+        """Quit the session if one is open"""
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._server = None
+
+
+def entry_alert_content(
+    current_price: float,
+    six_hr_low: float,
+    spike_pct: float,
+    entry_price: float,
+    tp_price: float,
+    sl_price: float,
+    symbol: str = "BTC"
+) -> Tuple[str, str, str]:
+    """Subject, HTML body and plain text of an entry alert"""
+    return ENTRY_TEMPLATE.render(
+        symbol=symbol, asset="Bitcoin" if symbol == "BTC" else symbol,
+        current_price=current_price, six_hr_low=six_hr_low, spike_pct=spike_pct,
+        entry_price=entry_price, tp_price=tp_price, sl_price=sl_price
+    )
+
+
 def send_entry_alert(
     gmail_user: str,
     gmail_password: str,
@@ -94,38 +331,37 @@ def send_entry_alert(
     spike_pct: float,
     entry_price: float,
     tp_price: float,
-    sl_price: float
+    sl_price: float,
+    symbol: str = "BTC",
+    dispatcher=None,
+    context: Optional[Dict] = None
 ) -> bool:
-    """Send entry alert email"""
-    subject = f"🚨 BTC SHORT SIGNAL - {spike_pct:.2f}% Spike"
+    """
+    Send entry alert email
     
-    body = f"""
-    <html>
-      <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-        <h2 style="color: #d32f2f;">🚨 Bitcoin Short Entry Signal</h2>
-        
-        <div style="background-color: #fff3cd; padding: 15px; border-left: 4px solid #ffc107; margin: 20px 0;">
-          <h3 style="margin-top: 0;">Signal Details</h3>
-          <p><strong>Spike Detected:</strong> {spike_pct:.2f}%</p>
-          <p><strong>6-Hour Low:</strong> ${six_hr_low:,.2f}</p>
-          <p><strong>Current Price:</strong> ${current_price:,.2f}</p>
-        </div>
-        
-        <div style="background-color: #e7f3ff; padding: 15px; border-left: 4px solid #2196F3; margin: 20px 0;">
-          <h3 style="margin-top: 0;">Position Details</h3>
-          <p><strong>Suggested Entry Price:</strong> ${entry_price:,.2f}</p>
-          <p><strong>Take Profit Target:</strong> ${tp_price:,.2f} (-2.5%)</p>
-          <p><strong>Stop Loss Target:</strong> ${sl_price:,.2f} (+1.5%)</p>
-        </div>
-        
-        <p style="color: #666; font-size: 12px; margin-top: 30px;">
-          This is an automated alert from the BTC Short Alert System.
-        </p>
-      </body>
-    </html>
+    With a dispatcher the alert is queued for background delivery and the
+    return value only says whether it was accepted; the outcome is reported
+    with the given context through dispatcher.poll_results().
     """
+    subject, body, text = entry_alert_content(
+        current_price, six_hr_low, spike_pct, entry_price, tp_price, sl_price, symbol
+    )
     
-    return send_email(gmail_user, gmail_password, recipients, subject, body)
+    if dispatcher is not None:
+        return dispatcher.submit(recipients, subject, body, context, text=text)
+    return send_email(gmail_user, gmail_password, recipients, subject, body, text=text)
+
+
+def exit_alert_content(
+    exit_type: str,
+    entry_price: float,
+    current_price: float,
+    pnl_pct: float,
+    symbol: str = "BTC"
+) -> Tuple[str, str, str]:
+    """Subject, HTML body and plain text of an exit alert (TP or SL)"""
+    template = EXIT_TEMPLATES['TP' if exit_type == "TP" else 'SL']
+    return template.render(symbol=symbol, entry_price=entry_price, current_price=current_price, pnl_pct=pnl_pct)
 
 
 def send_exit_alert(
@@ -135,38 +371,21 @@ def send_exit_alert(
     exit_type: str,
     entry_price: float,
     current_price: float,
-    pnl_pct: float
+    pnl_pct: float,
+    symbol: str = "BTC",
+    dispatcher=None,
+    context: Optional[Dict] = None
 ) -> bool:
-    """Send exit alert email (TP or SL)"""
-    if exit_type == "TP":
-        subject = "✅ TAKE PROFIT"
-        emoji = "✅"
-        color = "#4caf50"
-        bg_color = "#e8f5e9"
-    else:  # SL
-        subject = "🛑 STOP LOSS"
-        emoji = "🛑"
-        color = "#f44336"
-        bg_color = "#ffebee"
-    
-    body = f"""
-    <html>
-      <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-        <h2 style="color: {color};">{emoji} {exit_type} Triggered</h2>
-        
-        <div style="background-color: {bg_color}; padding: 15px; border-left: 4px solid {color}; margin: 20px 0;">
-          <h3 style="margin-top: 0;">Position Closed</h3>
-          <p><strong>Entry Price:</strong> ${entry_price:,.2f}</p>
-          <p><strong>Exit Price:</strong> ${current_price:,.2f}</p>
-          <p><strong>P/L Percentage:</strong> <span style="color: {color}; font-weight: bold;">{pnl_pct:+.2f}%</span></p>
-        </div>
-        
-        <p style="color: #666; font-size: 12px; margin-top: 30px;">
-          This is an automated alert from the BTC Short Alert System.
-        </p>
-      </body>
-    </html>
     """
+    Send exit alert email (TP or SL)
+    
+    See send_entry_alert for how a dispatcher changes the return value.
+    Exit alerts are sent as critical, so they skip digests and rate limits.
+    """
+    subject, body, text = exit_alert_content(exit_type, entry_price, current_price, pnl_pct, symbol)
     
-    return send_email(gmail_user, gmail_password, recipients, subject, body)
+    if dispatcher is not None:
+        # Exits are time-critical: never held for a digest
+        return dispatcher.submit(recipients, subject, body, context, critical=True, text=text)
+    return send_email(gmail_user, gmail_password, recipients, subject, body, text=text)
 
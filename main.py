@@ -6,17 +6,33 @@ import os
 import time
 import logging
 from datetime import datetime
+from typing import Dict, Optional, Set
+
+import numpy as np
 
 from config import load_config
 from state_manager import (
-    load_state, save_state, add_price_to_history,
+    load_state, save_state, close_state, release_state, add_price_to_history,
     open_position, close_position, get_6hr_low
 )
-from price_monitor import fetch_btc_price
+from indicators import INDICATOR_HORIZONS, parse_horizons
+from backfill import BACKFILL_INTERVAL, BACKFILL_ON_START, backfill_state
+from coordination import COORDINATION, Coordinator, build_coordinator
+from quote_cache import QUOTE_CACHE_TTL, QuoteCache
+from price_monitor import fetch_btc_price, fetch_prices, resolve_symbols, KNOWN_SYMBOLS
+from async_price_monitor import AsyncPriceFetcher
+from provider_manager import ProviderManager
+from price_stream import PriceStream, STREAM_STALE_SECONDS
 from detection_engine import (
-    check_entry_signal, check_exit_signal, calculate_target_prices
+    ENTRY_CONFIRM_HORIZONS, check_entry_signal, check_exit_signal, calculate_target_prices,
+    check_entry_signals_batch, check_exit_signals_batch
 )
 from email_service import send_entry_alert, send_exit_alert
+from notifier import Notifier, build_notifier, entry_event, exit_event
+from scheduler import PhaseTimer, TickScheduler, format_durations
+from symbol_state import SymbolState
+from trade_ledger import TRADE_LEDGER_FILE, TradeLedger
+from metrics import METRICS_PORT, TICK_LAG_SECONDS, TICK_OVERRUNS, WINDOW_SIZE, start_metrics_server
 
 
 # Configure logging
@@ -27,171 +43,684 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Per-phase timing of the current tick (fetch, detect, persist, alert)
+timer = PhaseTimer()
+# Log a phase timing summary every this many ticks
+TIMING_SUMMARY_EVERY = int(os.getenv('TIMING_SUMMARY_EVERY', '60'))
+
+
+def handle_exit_signal(
+    symbol: str,
+    exit_signal: str,
+    current_price: float,
+    state: SymbolState,
+    config: Dict,
+    tag: str,
+    notifier: Optional[Notifier] = None
+) -> None:
+    """Send the exit alert for a TP/SL signal and close the position"""
+    entry_price = state.position.entry_price
+    # Calculate P/L
+    pnl_pct = ((current_price - entry_price) / entry_price) * 100
+
+    logger.info(
+        f"{tag} {exit_signal} triggered! Entry: ${entry_price:,.2f}, "
+        f"Current: ${current_price:,.2f}, P/L: {pnl_pct:.2f}%"
+    )
+
+    # Send exit alert - close position regardless of email success
+    # (we still want to close even if email fails)
+    with timer.phase('alert'):
+        if notifier is not None:
+            email_sent = notifier.notify(
+                exit_event(symbol, exit_signal, entry_price, current_price, pnl_pct),
+                context={'event': 'exit', 'symbol': symbol, 'tag': tag}
+            )
+        else:
+            email_sent = send_exit_alert(
+                config['gmail_user'],
+                config['gmail_app_password'],
+                config['recipients'],
+                exit_signal,
+                entry_price,
+                current_price,
+                pnl_pct,
+                symbol=symbol
+            )
+
+    # Close position (even if email failed - exit signal is more important)
+    close_position(state, current_price, exit_signal)
+    with timer.phase('persist'):
+        save_state(state)
+    ledger = state.ledger
+    if ledger is not None and ledger.stats.trades:
+        stats = ledger.stats
+        logger.info(
+            f"{tag} Trades: {stats.trades}, win rate {stats.win_rate:.1f}%, "
+            f"cumulative P/L {stats.pnl_pct:+.2f}%, max drawdown {stats.max_drawdown:.2f}%"
+        )
+    if notifier is not None:
+        if email_sent:
+            logger.info(f"{tag} Position closed and exit alert queued")
+        else:
+            logger.warning(f"{tag} Position closed but exit alert could not be queued")
+    elif email_sent:
+        logger.info(f"{tag} Position closed and exit alert sent")
+    else:
+        logger.warning(f"{tag} Position closed but exit alert email failed to send")
+
+
+def handle_entry_signal(
+    symbol: str,
+    current_price: float,
+    six_hr_low: float,
+    spike_pct: float,
+    state: SymbolState,
+    config: Dict,
+    tag: str,
+    notifier: Optional[Notifier] = None
+) -> None:
+    """
+    Send the entry alert for a spike and open the position if it was delivered
+
+    With a notifier the position opens as soon as the alert is queued, so
+    its entry time is the signal's even when the alert waits in a digest;
+    handle_delivery_reports withdraws it if delivery then fails.
+    """
+    logger.info(
+        f"{tag} Entry signal triggered! Spike: {spike_pct:.2f}%, "
+        f"6hr Low: ${six_hr_low:,.2f}, Current: ${current_price:,.2f}"
+    )
+
+    # Calculate target prices
+    entry_price = current_price
+    tp_price, sl_price = calculate_target_prices(entry_price)
+
+    # Send entry alert - only open position if email succeeds
+    with timer.phase('alert'):
+        if notifier is not None:
+            context = {'event': 'entry', 'symbol': symbol, 'entry_price': entry_price, 'tag': tag}
+            email_sent = notifier.notify(
+                entry_event(symbol, current_price, six_hr_low, spike_pct, entry_price, tp_price, sl_price),
+                context=context
+            )
+        else:
+            email_sent = send_entry_alert(
+                config['gmail_user'],
+                config['gmail_app_password'],
+                config['recipients'],
+                current_price,
+                six_hr_low,
+                spike_pct,
+                entry_price,
+                tp_price,
+                sl_price,
+                symbol=symbol
+            )
+
+    if notifier is not None:
+        if email_sent:
+            open_position(entry_price, state)
+            # Reports are polled on this thread, so the context is complete
+            # before its delivery outcome is handled
+            context['entry_timestamp'] = state.position.entry_timestamp
+            with timer.phase('persist'):
+                save_state(state)
+            logger.info(f"{tag} Entry alert queued. Position opened at ${entry_price:,.2f}")
+        else:
+            logger.warning(f"{tag} Entry alert could not be queued. Position NOT opened.")
+    elif email_sent:
+        # Only open position if email was sent successfully
+        open_position(entry_price, state)
+        with timer.phase('persist'):
+            save_state(state)
+        logger.info(f"{tag} Position opened at ${entry_price:,.2f}")
+    else:
+        logger.warning(
+            f"{tag} Entry signal detected but email failed to send. "
+            f"Position NOT opened. Will retry on next signal."
+        )
+
+
+def process_tick(
+    symbol: str,
+    current_price: float,
+    timestamp: datetime,
+    state: SymbolState,
+    config: Dict,
+    tag: str,
+    notifier: Optional[Notifier] = None
+) -> None:
+    """
+    Record a price for one symbol and act on its entry/exit signals
+
+    Args:
+        symbol: Asset symbol, e.g. "BTC"
+        current_price: Latest price
+        timestamp: Time the price was observed
+        state: State of this symbol (position and window)
+        config: Application configuration
+        tag: Log prefix, e.g. "[Loop 12] BTC"
+        notifier: Background multi-channel notifier, or None to email synchronously
+    """
+    # Per-tick lines use lazy %-formatting so nothing is formatted when INFO is off
+    logger.info("%s Current price: $%s", tag, f"{current_price:,.2f}")
+
+    # Add price to history and clean up old entries; the tick is saved once
+    # at the end (or right away by a position change)
+    with timer.phase('persist'):
+        add_price_to_history(current_price, timestamp, state)
+    WINDOW_SIZE.labels(symbol).set(len(state.window))
+
+    # Check signals based on position status
+    if state.position.is_open:
+        # Position is open - check for exit signals
+        entry_price = state.position.entry_price
+        with timer.phase('detect'):
+            exit_signal = check_exit_signal(current_price, entry_price)
+
+        if exit_signal:
+            handle_exit_signal(symbol, exit_signal, current_price, state, config, tag, notifier)
+        else:
+            logger.info(
+                "%s Position open. Entry: $%s, Current: $%s, Change: %.2f%%",
+                tag, f"{entry_price:,.2f}", f"{current_price:,.2f}",
+                ((current_price - entry_price) / entry_price) * 100
+            )
+    else:
+        # Position is closed - check for entry signals
+        with timer.phase('detect'):
+            signal_triggered, six_hr_low, spike_pct = check_entry_signal(
+                current_price,
+                state.window,
+                indicators=state.indicators
+            )
+
+        if signal_triggered:
+            handle_entry_signal(
+                symbol, current_price, six_hr_low, spike_pct, state, config, tag, notifier
+            )
+        else:
+            # Always log status, with appropriate detail level
+            if six_hr_low is not None:
+                logger.info(
+                    "%s No entry signal. Current: $%s, 6hr Low: $%s, Spike: %.2f%%",
+                    tag, f"{current_price:,.2f}", f"{six_hr_low:,.2f}", spike_pct
+                )
+            else:
+                # Still building price history (need at least 2 entries for comparison)
+                logger.info(
+                    "%s Building price history. Current: $%s, History entries: %d",
+                    tag, f"{current_price:,.2f}", len(state.window)
+                )
+
+    # One coalesced write per tick; a no-op if a position change already saved
+    with timer.phase('persist'):
+        save_state(state)
+
+
+def process_ticks(
+    quotes: Dict[str, Dict],
+    states: Dict[str, SymbolState],
+    config: Dict,
+    loop_count: int,
+    notifier: Optional[Notifier] = None
+) -> None:
+    """
+    Record prices for many symbols and evaluate all signals in one vectorized pass
+
+    Args:
+        quotes: Dict of symbol -> {'price', 'timestamp'}
+        states: Dict of symbol -> state
+        config: Application configuration
+        loop_count: Current loop number, for log prefixes
+        notifier: Background multi-channel notifier, or None to email synchronously
+    """
+    symbols = list(quotes)
+    prices = np.empty(len(symbols))
+    lows = np.empty(len(symbols))
+    entry_prices = np.full(len(symbols), np.nan)
+    confirm_lows = None
+    if ENTRY_CONFIRM_HORIZONS:
+        confirm_lows = np.full((len(symbols), len(ENTRY_CONFIRM_HORIZONS)), np.nan)
+
+    with timer.phase('persist'):
+        for i, symbol in enumerate(symbols):
+            state = states[symbol]
+            price = quotes[symbol]['price']
+            prices[i] = price
+            add_price_to_history(price, quotes[symbol]['timestamp'], state)
+            WINDOW_SIZE.labels(symbol).set(len(state.window))
+            low = state.window.min()
+            lows[i] = np.nan if low is None else low
+            indicators = state.indicators
+            if confirm_lows is not None and indicators is not None:
+                for j, name in enumerate(ENTRY_CONFIRM_HORIZONS):
+                    confirm_lows[i, j] = indicators[name].min()
+            if state.position.is_open:
+                entry_prices[i] = state.position.entry_price
+
+    with timer.phase('detect'):
+        entry_mask, spike_pct = check_entry_signals_batch(prices, lows, confirm_lows)
+        # Only symbols without an open position can enter
+        entry_mask &= np.isnan(entry_prices)
+        tp_mask, sl_mask, _ = check_exit_signals_batch(prices, entry_prices)
+
+    # Act on signals; a failure on one symbol must not skip the rest
+    for i in np.flatnonzero(tp_mask | sl_mask):
+        symbol = symbols[i]
+        tag = f"[Loop {loop_count}] {symbol}"
+        try:
+            exit_signal = "TP" if tp_mask[i] else "SL"
+            handle_exit_signal(
+                symbol, exit_signal, float(prices[i]), states[symbol], config, tag, notifier
+            )
+        except Exception as e:
+            logger.error(f"{tag} exit handling failed: {e}", exc_info=True)
+
+    for i in np.flatnonzero(entry_mask):
+        symbol = symbols[i]
+        tag = f"[Loop {loop_count}] {symbol}"
+        try:
+            handle_entry_signal(
+                symbol, float(prices[i]), float(lows[i]), float(spike_pct[i]),
+                states[symbol], config, tag, notifier
+            )
+        except Exception as e:
+            logger.error(f"{tag} entry handling failed: {e}", exc_info=True)
+
+    # One coalesced write per symbol per tick
+    with timer.phase('persist'):
+        for symbol in symbols:
+            save_state(states[symbol])
+
+    logger.info(
+        "[Loop %d] Evaluated %d symbols. Open positions: %d, entry signals: %d, exit signals: %d",
+        loop_count, len(symbols), np.count_nonzero(~np.isnan(entry_prices)),
+        np.count_nonzero(entry_mask), np.count_nonzero(tp_mask | sl_mask)
+    )
+
+
+def handle_delivery_reports(notifier: Notifier, states: Dict[str, SymbolState]) -> None:
+    """Apply background delivery outcomes: withdraw positions whose entry alert never went out"""
+    for report in notifier.poll_results():
+        context = report['context']
+        tag = context['tag']
+        if context['event'] == 'exit':
+            if report['sent']:
+                logger.info(f"{tag} Exit alert delivered ({report['channel']})")
+            else:
+                logger.warning(f"{tag} Exit alert failed on every channel")
+            continue
+
+        if report['sent']:
+            logger.info(f"{tag} Entry alert delivered ({report['channel']})")
+            continue
+        state = states[context['symbol']]
+        position = state.position
+        if position.is_open and position.entry_timestamp == context.get('entry_timestamp'):
+            # Nobody was told about this position; close it without a price
+            # so it stays out of the trade statistics
+            close_position(state, None, 'UNDELIVERED')
+            with timer.phase('persist'):
+                save_state(state)
+            logger.warning(
+                f"{tag} Entry alert failed on every channel. "
+                f"Position at ${context['entry_price']:,.2f} withdrawn. Will retry on next signal."
+            )
+        else:
+            logger.warning(f"{tag} Entry alert failed on every channel (position already closed)")
+
+
+def pace_loop(scheduler: Optional[TickScheduler], loop_count: int) -> None:
+    """
+    Close the tick's phase timings and wait for the next tick
+
+    With no scheduler (streaming mode) the next tick comes straight from
+    the stream, so this returns immediately.
+    """
+    durations = timer.finish_tick()
+    if loop_count % TIMING_SUMMARY_EVERY == 0:
+        logger.info(f"[Loop {loop_count}] Phase timings: {timer.summary()}")
+        if scheduler is not None:
+            logger.info(
+                f"[Loop {loop_count}] Overruns: {scheduler.overruns}, "
+                f"skipped ticks: {scheduler.skipped}"
+            )
+
+    if scheduler is None:
+        return
+    overruns = scheduler.overruns
+    lag = scheduler.wait()
+    TICK_LAG_SECONDS.set(lag)
+    if scheduler.overruns > overruns:
+        TICK_OVERRUNS.inc()
+        logger.warning(
+            f"[Loop {loop_count}] Tick overran the {scheduler.interval:g}s interval, "
+            f"next tick starts {lag:.2f}s late ({format_durations(durations)})"
+        )
+
+
+def poll_providers(fetcher, symbols) -> Dict[str, Dict]:
+    """Poll prices over REST - one batched call per provider in multi-symbol mode"""
+    if fetcher is not None:
+        return fetcher.fetch(symbols)
+    if symbols:
+        return fetch_prices(symbols)
+    price_data = fetch_btc_price()
+    return {"BTC": price_data} if price_data else {}
+
+
+def new_quotes(quotes: Dict[str, Dict], states: Dict[str, SymbolState]) -> Dict[str, Dict]:
+    """
+    Quotes newer than their symbol's last tick
+
+    A cached quote seen before, or a stream tick stamped after the wall
+    clock stepped back, must never count as a new tick.
+    """
+    fresh = {}
+    for symbol, quote in quotes.items():
+        latest = states[symbol].window.latest()
+        # Allow for the window's nanosecond rounding of the timestamp
+        if latest is not None and quote['timestamp'].timestamp() <= latest[0] + 1e-6:
+            continue
+        fresh[symbol] = quote
+    return fresh
+
+
+def fetch_quotes(cache: QuoteCache, watched, states: Dict[str, SymbolState]) -> Dict[str, Dict]:
+    """
+    Latest quotes through the shared quote cache
+
+    Stale quotes, and quotes no newer than the symbol's last tick, are dropped.
+    """
+    quotes = {symbol: quote for symbol, quote in cache.get(watched).items() if not quote.get('stale')}
+    return new_quotes(quotes, states)
+
+
+def coordinate(
+    coordinator: Coordinator,
+    states: Dict[str, SymbolState],
+    owned: Set[str],
+    loop_count: int
+) -> Set[str]:
+    """
+    Apply lease changes and bring standby symbols up to their owners' feeds
+
+    Args:
+        coordinator: This worker's Coordinator
+        states: Dict of symbol -> state, for every watched symbol
+        owned: Symbols this worker owned during the previous tick
+        loop_count: Current loop number, for log prefixes
+
+    Returns:
+        Symbols this worker owns for this tick
+    """
+    coordinator.beat()
+    now_owned = coordinator.owned()
+    for symbol in sorted(now_owned - owned):
+        logger.info(f"[Loop {loop_count}] {symbol} lease acquired; taking over from standby")
+    for symbol in sorted(owned - now_owned):
+        # Another worker may already be writing this symbol's state
+        release_state(states[symbol])
+        logger.warning(f"[Loop {loop_count}] {symbol} lease lost; now on standby")
+
+    for symbol, state in states.items():
+        if symbol not in now_owned:
+            coordinator.follow(symbol, state)
+            WINDOW_SIZE.labels(symbol).set(len(state.window))
+    return now_owned
+
 
 def main():
     """Main application loop"""
     logger.info("Starting Bitcoin Short Alert System...")
-    
+    started = time.perf_counter()
+
     # Load configuration
     try:
         config = load_config()
+        symbols = resolve_symbols(config['symbols']) if config['symbols'] else None
+        horizons = parse_horizons(INDICATOR_HORIZONS)
+        unknown = [name for name in ENTRY_CONFIRM_HORIZONS if name not in horizons]
+        if unknown:
+            raise ValueError(
+                f"ENTRY_CONFIRM_HORIZONS {', '.join(unknown)} not in INDICATOR_HORIZONS ({INDICATOR_HORIZONS})"
+            )
         logger.info("Configuration loaded successfully")
     except ValueError as e:
         logger.error(f"Configuration error: {e}")
         return
-    
-    # Load initial state
-    state = load_state()
-    logger.info(f"State loaded. Position open: {state['position_open']}")
-    
+
+    # Load initial state - one state per symbol in multi-symbol mode
+    load_started = time.perf_counter()
+    if symbols:
+        states = {symbol: load_state(symbol) for symbol in symbols}
+        logger.info(f"Multi-symbol mode: watching {', '.join(symbols)}")
+    else:
+        states = {"BTC": load_state()}
+    for symbol, state in states.items():
+        logger.info(f"{symbol} state loaded. Position open: {state.position.is_open}")
+    # Every position change of every symbol goes to one trade ledger
+    if TRADE_LEDGER_FILE:
+        ledger = TradeLedger()
+        for state in states.values():
+            state.ledger = ledger
+        logger.info(
+            f"Trade ledger {ledger.path}: {ledger.stats.trades} closed trades, "
+            f"{len(ledger.open_positions())} open"
+        )
+    logger.info(f"State loaded in {(time.perf_counter() - load_started) * 1000:.1f}ms")
+
+    # With several workers, each symbol is worked only by the holder of its
+    # lease; the other workers follow it on hot standby
+    owned = set(states)
+    try:
+        coordinator = build_coordinator(list(states))
+    except (ValueError, IOError) as e:
+        logger.error(f"Configuration error: {e}")
+        return
+    if coordinator is not None:
+        coordinator.start()
+        owned = coordinator.owned()
+        for symbol, state in states.items():
+            if symbol not in owned:
+                release_state(state)
+                coordinator.follow(symbol, state)
+        standby = ', '.join(sorted(set(states) - owned))
+        logger.info(
+            f"Worker {coordinator.worker_id} ({COORDINATION} coordination"
+            f"{', sharded' if coordinator.shard else ''}): "
+            f"working {', '.join(sorted(owned)) or 'nothing'}"
+            + (f", standby for {standby}" if standby else "")
+        )
+
     # Optional: Reset state if RESET_STATE environment variable is set
     reset_requested = os.getenv('RESET_STATE', '').lower() == 'true'
     if reset_requested:
-        if state['position_open']:
-            logger.info("RESET_STATE=true detected. Closing position...")
-            close_position(state)
-            save_state(state)
-            logger.info("Position closed. State reset.")
-        else:
-            logger.info("RESET_STATE=true detected, but no position is open.")
-        
-        # Also clear price history if RESET_STATE_FULL is set
-        if os.getenv('RESET_STATE_FULL', '').lower() == 'true':
-            logger.info("RESET_STATE_FULL=true detected. Clearing price history...")
-            state['price_history'] = []
+        for symbol, state in states.items():
+            if symbol not in owned:
+                continue
+            if state.position.is_open:
+                logger.info(f"RESET_STATE=true detected. Closing {symbol} position...")
+                close_position(state)
+                logger.info("Position closed. State reset.")
+            else:
+                logger.info(f"RESET_STATE=true detected, but no {symbol} position is open.")
+
+            # Also clear price history if RESET_STATE_FULL is set
+            if os.getenv('RESET_STATE_FULL', '').lower() == 'true':
+                logger.info(f"RESET_STATE_FULL=true detected. Clearing {symbol} price history...")
+                state.window.clear()
+                if state.indicators is not None:
+                    state.indicators.clear()
+                logger.info("Price history cleared.")
+            # Close and clear in one snapshot
             save_state(state)
-            logger.info("Price history cleared.")
-    
+
+    # Fill the gap since the last saved tick with one klines request per
+    # symbol, so the 6-hour low is complete from the first tick
+    watched = symbols or {"BTC": KNOWN_SYMBOLS["BTC"]}
+    if BACKFILL_ON_START:
+        for symbol, state in states.items():
+            if symbol not in owned:
+                continue   # Standbys get their ticks from the owner
+            added = backfill_state(state, watched[symbol][1])
+            if added:
+                save_state(state)
+                logger.info(f"{symbol} backfilled {added} ticks from {BACKFILL_INTERVAL} klines")
+        logger.info(f"Detector warm {time.perf_counter() - started:.2f}s after start")
+
+    # Adaptive routing to the best healthy providers with a cross-provider
+    # outlier check; PRICE_FETCHER=async races CoinGecko and Binance over
+    # pooled connections, PRICE_FETCHER=sync uses the serial retry/backoff fetchers
+    fetcher = None
+    fetcher_kind = os.getenv('PRICE_FETCHER', 'adaptive').lower()
+    if fetcher_kind == 'adaptive':
+        try:
+            fetcher = ProviderManager(symbols)
+        except ValueError as e:
+            logger.error(f"Configuration error: {e}")
+            return
+        logger.info(f"Price providers: {', '.join(fetcher.providers)} (cross-check {fetcher.cross_check})")
+    elif fetcher_kind == 'async':
+        fetcher = AsyncPriceFetcher(symbols)
+
+    # PRICE_SOURCE=stream evaluates every WebSocket tick as it arrives and
+    # only polls REST while the stream is quiet
+    stream = None
+    if os.getenv('PRICE_SOURCE', 'rest').lower() == 'stream':
+        stream = PriceStream(symbols or {"BTC": KNOWN_SYMBOLS["BTC"]})
+        stream.start()
+        logger.info(f"Streaming prices from {stream.url}")
+
+    # REST polling runs on a fixed monotonic-clock grid so that work time
+    # does not push later samples back
+    scheduler = None
+    if stream is None:
+        try:
+            scheduler = TickScheduler()
+        except ValueError as e:
+            logger.error(f"Configuration error: {e}")
+            return
+        logger.info(f"Polling every {scheduler.interval:g}s ({scheduler.policy} policy on overrun)")
+
+    # REST quotes go through the shared cache, so other tools (check_state.py,
+    # dashboards) reuse them; the TTL is kept well under the tick interval so
+    # the monitor itself always sees a new quote per tick
+    interval = scheduler.interval if scheduler is not None else STREAM_STALE_SECONDS
+    if coordinator is not None:
+        # A worker whose loop hangs for a few ticks lets its leases go
+        coordinator.stall_after = 3 * interval
+        coordinator.beat()
+    cache = QuoteCache(
+        # Only the symbols asked for: a sharded worker never fetches another's
+        fetch=lambda missing: poll_providers(fetcher, missing if symbols else None),
+        ttl=min(QUOTE_CACHE_TTL, interval / 2)
+    )
+
+    # Prometheus-style /metrics endpoint; off unless METRICS_PORT is set
+    if METRICS_PORT:
+        try:
+            start_metrics_server(int(METRICS_PORT))
+            logger.info(f"Serving metrics on port {METRICS_PORT}")
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not start metrics endpoint: {e}")
+
+    # Fan alerts out in the background to email (over a persistent SMTP
+    # session) and any configured webhook/chat channels; ALERT_DISPATCH=sync
+    # emails inline as before
+    notifier = None
+    if os.getenv('ALERT_DISPATCH', 'background').lower() != 'sync':
+        notifier = build_notifier(config)
+        notifier.start()
+        logger.info(f"Alert channels: {', '.join(channel.name for channel in notifier.channels)}")
+
     # Main monitoring loop
     loop_count = 0
     while True:
         try:
             loop_count += 1
-            
-            # Fetch current BTC price
-            price_data = fetch_btc_price()
-            
-            if price_data is None:
-                logger.warning(f"[Loop {loop_count}] Failed to fetch price. Retrying in next cycle...")
-                time.sleep(60)
-                continue
-            
-            current_price = price_data['price']
-            timestamp = price_data['timestamp']
-            
-            logger.info(f"[Loop {loop_count}] Current BTC price: ${current_price:,.2f}")
-            
-            # Add price to history and clean up old entries
-            add_price_to_history(current_price, timestamp, state)
-            save_state(state)
-            
-            # Check signals based on position status
-            if state['position_open']:
-                # Position is open - check for exit signals
-                entry_price = state['entry_price']
-                exit_signal = check_exit_signal(current_price, entry_price)
-                
-                if exit_signal:
-                    # Calculate P/L
-                    pnl_pct = ((current_price - entry_price) / entry_price) * 100
-                    
-                    logger.info(
-                        f"[Loop {loop_count}] {exit_signal} triggered! Entry: ${entry_price:,.2f}, "
-                        f"Current: ${current_price:,.2f}, P/L: {pnl_pct:.2f}%"
-                    )
-                    
-                    # Send exit alert - close position regardless of email success
-                    # (we still want to close even if email fails)
-                    email_sent = send_exit_alert(
-                        config['gmail_user'],
-                        config['gmail_app_password'],
-                        config['recipients'],
-                        exit_signal,
-                        entry_price,
-                        current_price,
-                        pnl_pct
-                    )
-                    
-                    # Close position (even if email failed - exit signal is more important)
-                    close_position(state)
-                    save_state(state)
-                    if email_sent:
-                        logger.info(f"[Loop {loop_count}] Position closed and exit alert sent")
-                    else:
-                        logger.warning(f"[Loop {loop_count}] Position closed but exit alert email failed to send")
+
+            if notifier is not None:
+                with timer.phase('alert'):
+                    handle_delivery_reports(notifier, states)
+
+            if coordinator is not None:
+                owned = coordinate(coordinator, states, owned, loop_count)
+            # Only the symbols this worker owns are fetched and evaluated
+            active = {symbol: ids for symbol, ids in watched.items() if symbol in owned}
+
+            if not active:
+                logger.info(f"[Loop {loop_count}] Standby: following {', '.join(sorted(states))}")
+                quotes = {}
+            elif stream is not None:
+                tick = stream.get(timeout=STREAM_STALE_SECONDS)
+                if tick is not None:
+                    quotes = new_quotes({symbol: quote for symbol, quote in [tick] if symbol in owned}, states)
                 else:
-                    logger.info(
-                        f"[Loop {loop_count}] Position open. Entry: ${entry_price:,.2f}, "
-                        f"Current: ${current_price:,.2f}, "
-                        f"Change: {((current_price - entry_price) / entry_price) * 100:.2f}%"
+                    logger.warning(
+                        f"[Loop {loop_count}] No stream tick for {STREAM_STALE_SECONDS:.0f}s. "
+                        f"Falling back to REST..."
                     )
+                    with timer.phase('fetch'):
+                        quotes = fetch_quotes(cache, active, states)
             else:
-                # Position is closed - check for entry signals
-                signal_triggered, six_hr_low, spike_pct = check_entry_signal(
-                    current_price,
-                    state['price_history']
+                with timer.phase('fetch'):
+                    quotes = fetch_quotes(cache, active, states)
+
+            if not active:
+                if stream is not None:
+                    time.sleep(1)
+            elif not quotes:
+                logger.warning(f"[Loop {loop_count}] Failed to fetch price. Retrying in next cycle...")
+                if stream is not None:
+                    time.sleep(1)
+            elif symbols:
+                process_ticks(quotes, states, config, loop_count, notifier)
+            else:
+                process_tick(
+                    "BTC",
+                    quotes["BTC"]['price'],
+                    quotes["BTC"]['timestamp'],
+                    states["BTC"],
+                    config,
+                    f"[Loop {loop_count}]",
+                    notifier
                 )
-                
-                if signal_triggered:
-                    logger.info(
-                        f"[Loop {loop_count}] Entry signal triggered! Spike: {spike_pct:.2f}%, "
-                        f"6hr Low: ${six_hr_low:,.2f}, Current: ${current_price:,.2f}"
-                    )
-                    
-                    # Calculate target prices
-                    entry_price = current_price
-                    tp_price, sl_price = calculate_target_prices(entry_price)
-                    
-                    # Send entry alert - only open position if email succeeds
-                    email_sent = send_entry_alert(
-                        config['gmail_user'],
-                        config['gmail_app_password'],
-                        config['recipients'],
-                        current_price,
-                        six_hr_low,
-                        spike_pct,
-                        entry_price,
-                        tp_price,
-                        sl_price
-                    )
-                    
-                    if email_sent:
-                        # Only open position if email was sent successfully
-                        open_position(entry_price, state)
-                        save_state(state)
-                        logger.info(f"[Loop {loop_count}] Position opened at ${entry_price:,.2f}")
-                    else:
-                        logger.warning(
-                            f"[Loop {loop_count}] Entry signal detected but email failed to send. "
-                            f"Position NOT opened. Will retry on next signal."
-                        )
-                else:
-                    # Always log status, with appropriate detail level
-                    if six_hr_low is not None:
-                        logger.info(
-                            f"[Loop {loop_count}] No entry signal. Current: ${current_price:,.2f}, "
-                            f"6hr Low: ${six_hr_low:,.2f}, Spike: {spike_pct:.2f}%"
-                        )
-                    else:
-                        # Still building price history (need at least 2 entries for comparison)
-                        logger.info(
-                            f"[Loop {loop_count}] Building price history. Current: ${current_price:,.2f}, "
-                            f"History entries: {len(state['price_history'])}"
-                        )
-            
-            # Sleep for 60 seconds (minus execution time)
-            # This ensures we check approximately every minute
-            time.sleep(60)
-            
+
+            if coordinator is not None:
+                with timer.phase('persist'):
+                    for symbol in owned:
+                        coordinator.publish(symbol, states[symbol])
+
+            # Wait for the next scheduled tick (work time already deducted)
+            pace_loop(scheduler, loop_count)
+
         except KeyboardInterrupt:
             logger.info("Received interrupt signal. Shutting down gracefully...")
+            if stream is not None:
+                stream.stop()
+            if fetcher is not None:
+                fetcher.close()
+            if notifier is not None:
+                notifier.stop()
+                handle_delivery_reports(notifier, states)
+            for symbol, state in states.items():
+                if symbol in owned:
+                    close_state(state)
+            if coordinator is not None:
+                # Hand the leases straight to a standby
+                coordinator.stop()
             break
         except Exception as e:
             logger.error(f"Unexpected error in main loop: {e}", exc_info=True)
             # Continue running even on errors
-            time.sleep(60)
+            if scheduler is not None:
+                pace_loop(scheduler, loop_count)
+            else:
+                time.sleep(1)
 
 
 if __name__ == "__main__":
     main()
-
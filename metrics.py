@@ -0,0 +1,252 @@
+"""
+Metrics - Lightweight counters, gauges and histograms with a Prometheus text endpoint
+
+Recording a value is a few attribute updates; nothing is formatted until
+the endpoint is scraped. The endpoint only runs when METRICS_PORT is set.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Sequence, Tuple
+
+
+METRICS_PORT = os.getenv('METRICS_PORT')
+
+# Seconds; covers sub-millisecond local work up to slow network calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    """Metric family; children hold the values for each label combination"""
+
+    kind = ''
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            # Unlabelled series are exported (as zero) before the first update
+            self.labels()
+        REGISTRY.append(self)
+
+    def labels(self, *values: str):
+        """Child metric for one combination of label values"""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _default(self):
+        return self.labels()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self._children.items()):
+            lines.extend(child.render(self.name, self.labelnames, values))
+        return lines
+
+
+class _Value:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def render(self, name, labelnames, values) -> List[str]:
+        return [f"{name}{_format_labels(labelnames, values)} {self.value:g}"]
+
+
+class _CounterChild(_Value):
+    __slots__ = ()
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+
+class _GaugeChild(_Value):
+    __slots__ = ()
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class _HistogramChild:
+    __slots__ = ('bounds', 'counts', 'sum')
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def time(self) -> '_Timer':
+        """Context manager that observes the duration of its block, in seconds"""
+        return _Timer(self)
+
+    def render(self, name, labelnames, values) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            labels = _format_labels(labelnames, values, f'le="{bound:g}"')
+            lines.append(f"{name}_bucket{labels} {cumulative}")
+        cumulative += self.counts[-1]
+        labels = _format_labels(labelnames, values, 'le="+Inf"')
+        lines.append(f"{name}_bucket{labels} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, values)} {self.sum:g}")
+        lines.append(f"{name}_count{_format_labels(labelnames, values)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    # A plain class rather than @contextmanager: no generator per use
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram: _HistogramChild):
+        self.histogram = histogram
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info) -> None:
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1) -> None:
+        self._default().inc(amount)
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self._default().set(value)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values over fixed buckets"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help_text, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+
+REGISTRY: List[_Metric] = []
+
+
+def render_metrics() -> str:
+    """All registered metrics in Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        body = render_metrics().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes are frequent; keep them out of the application log
+        pass
+
+
+def start_metrics_server(port: int, host: str = '0.0.0.0') -> ThreadingHTTPServer:
+    """Serve /metrics from a daemon thread"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
+
+
+# Application metrics
+FETCH_SECONDS = Histogram(
+    'btc_alert_price_fetch_seconds', "Price fetch latency per provider", ('provider',))
+FETCH_RETRIES = Counter(
+    'btc_alert_price_fetch_retries_total', "Price fetch retries per provider", ('provider',))
+FETCH_FALLBACKS = Counter(
+    'btc_alert_price_fetch_fallbacks_total', "Fetches that fell back to (or hedged with) another provider")
+SAVE_STATE_SECONDS = Histogram(
+    'btc_alert_save_state_seconds', "save_state duration")
+SMTP_SEND_SECONDS = Histogram(
+    'btc_alert_smtp_send_seconds', "SMTP send duration per attempt")
+SMTP_RETRIES = Counter(
+    'btc_alert_smtp_retries_total', "SMTP delivery retries")
+WINDOW_SIZE = Gauge(
+    'btc_alert_window_ticks', "Ticks in the rolling window per symbol", ('symbol',))
+TICK_LAG_SECONDS = Gauge(
+    'btc_alert_tick_lag_seconds', "How late the latest tick started against its schedule")
+TICK_OVERRUNS = Counter(
+    'btc_alert_tick_overruns_total', "Ticks that ran past the next deadline")
+RATE_LIMITED = Counter(
+    'btc_alert_rate_limited_total', "Provider requests skipped because the rate budget was spent", ('provider',))
+PROVIDER_LATENCY_SECONDS = Gauge(
+    'btc_alert_provider_latency_seconds', "Smoothed fetch latency per provider, as used for routing", ('provider',))
+PROVIDER_BREAKER_OPEN = Gauge(
+    'btc_alert_provider_breaker_open', "1 while a provider's circuit breaker is open", ('provider',))
+PRICE_OUTLIERS = Counter(
+    'btc_alert_price_outliers_total', "Quotes rejected by the cross-provider check", ('provider',))
+NOTIFY_SECONDS = Histogram(
+    'btc_alert_notify_seconds', "HTTP notification request duration per channel", ('channel',))
+NOTIFY_RETRIES = Counter(
+    'btc_alert_notify_retries_total', "HTTP notification retries per channel", ('channel',))
+ALERT_EMAILS = Counter(
+    'btc_alert_alert_emails_total', "Alert emails sent by kind (single, digest, critical)", ('kind',))
+QUOTE_CACHE_LOOKUPS = Counter(
+    'btc_alert_quote_cache_lookups_total', "Quote cache lookups by result (hit, miss, stale)", ('result',))
+OWNED_SYMBOLS = Gauge(
+    'btc_alert_owned_symbols', "Symbols this worker currently holds the lease for")
+LEASE_CHANGES = Counter(
+    'btc_alert_lease_changes_total', "Symbols gained or lost by this worker (gained, lost)", ('change',))
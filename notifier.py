@@ -0,0 +1,315 @@
+"""
+Notifier - Fans each alert out to every configured channel in parallel
+
+Channels:
+    email     Gmail SMTP through the AlertDispatcher (always on)
+    webhook   JSON POST of the alert to each URL in ALERT_WEBHOOK_URLS
+    slack     Slack-style incoming webhook (SLACK_WEBHOOK_URL)
+    telegram  Telegram Bot API sendMessage (TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID)
+
+Every channel has its own worker thread, timeout and retries, so a slow
+channel never delays the others or the price loop. An alert counts as
+delivered as soon as the first channel delivers it.
+"""
+import itertools
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+from alert_dispatcher import ALERT_QUEUE_SIZE, AlertDispatcher
+from email_service import entry_alert_content, exit_alert_content
+from metrics import NOTIFY_RETRIES, NOTIFY_SECONDS
+
+
+# Comma-separated URLs that receive every alert as JSON
+ALERT_WEBHOOK_URLS = os.getenv('ALERT_WEBHOOK_URLS', '')
+SLACK_WEBHOOK_URL = os.getenv('SLACK_WEBHOOK_URL', '')
+TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN', '')
+TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID', '')
+# Overridable, e.g. to point at a local HTTP stand-in
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', 'https://api.telegram.org')
+
+# Per-request timeout of each HTTP channel, in seconds
+WEBHOOK_TIMEOUT = float(os.getenv('WEBHOOK_TIMEOUT', '2'))
+SLACK_TIMEOUT = float(os.getenv('SLACK_TIMEOUT', '2'))
+TELEGRAM_TIMEOUT = float(os.getenv('TELEGRAM_TIMEOUT', '2'))
+# Delivery attempts per alert on each HTTP channel
+NOTIFY_MAX_RETRIES = int(os.getenv('NOTIFY_MAX_RETRIES', '3'))
+
+
+def entry_event(
+    symbol: str,
+    current_price: float,
+    six_hr_low: float,
+    spike_pct: float,
+    entry_price: float,
+    tp_price: float,
+    sl_price: float
+) -> Dict:
+    """Entry alert for every channel: subject, html and plain text (see alert_templates) plus raw fields"""
+    subject, html, text = entry_alert_content(
+        current_price, six_hr_low, spike_pct, entry_price, tp_price, sl_price, symbol
+    )
+    return {
+        'event': 'entry', 'symbol': symbol, 'subject': subject, 'html': html, 'text': text,
+        'critical': False,
+        'data': {
+            'current_price': current_price, 'six_hr_low': six_hr_low, 'spike_pct': spike_pct,
+            'entry_price': entry_price, 'tp_price': tp_price, 'sl_price': sl_price,
+        },
+    }
+
+
+def exit_event(
+    symbol: str,
+    exit_type: str,
+    entry_price: float,
+    current_price: float,
+    pnl_pct: float
+) -> Dict:
+    """Exit alert (TP or SL) for every channel; exits are critical"""
+    subject, html, text = exit_alert_content(exit_type, entry_price, current_price, pnl_pct, symbol)
+    return {
+        'event': 'exit', 'symbol': symbol, 'subject': subject, 'html': html, 'text': text,
+        'critical': True,
+        'data': {
+            'exit_type': exit_type, 'entry_price': entry_price,
+            'current_price': current_price, 'pnl_pct': pnl_pct,
+        },
+    }
+
+
+class EmailChannel:
+    """Email through the AlertDispatcher, which already runs its own worker"""
+
+    name = 'email'
+
+    def __init__(self, dispatcher: AlertDispatcher, recipients: List[str]):
+        self.dispatcher = dispatcher
+        self.recipients = recipients
+
+    def start(self) -> None:
+        self.dispatcher.start()
+
+    def stop(self, timeout: float = 30) -> None:
+        self.dispatcher.stop(timeout)
+
+    def submit(self, alert: Dict, alert_id: int) -> bool:
+        return self.dispatcher.submit(
+            self.recipients, alert['subject'], alert['html'], alert_id, alert['critical'], alert['text']
+        )
+
+    def poll_results(self) -> List[Dict]:
+        return self.dispatcher.poll_results()
+
+
+class HttpChannel:
+    """
+    Channel that delivers each alert with one HTTP POST.
+
+    A worker thread with a pooled session posts alerts in order, retrying
+    failures with a short exponential backoff. Subclasses provide the
+    request for an alert.
+    """
+
+    name = 'http'
+
+    def __init__(self, timeout: float, max_retries: int = NOTIFY_MAX_RETRIES,
+                 max_queue: int = ALERT_QUEUE_SIZE):
+        self.timeout = timeout
+        self.max_retries = max(1, max_retries)
+        self._session = requests.Session()
+        self._pending: "queue.Queue[Optional[Tuple[Dict, int]]]" = queue.Queue(maxsize=max_queue)
+        self._results: "queue.Queue[Dict]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+
+    def request(self, alert: Dict) -> Tuple[str, Dict]:
+        """(url, JSON payload) delivering the alert"""
+        raise NotImplementedError
+
+    def accepted(self, response: requests.Response) -> bool:
+        """True if the response confirms delivery"""
+        return response.ok
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name=f"notify-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 30) -> None:
+        """Deliver what is already queued, then stop the worker"""
+        if self._thread is None:
+            return
+        self._pending.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+        self._session.close()
+
+    def submit(self, alert: Dict, alert_id: int) -> bool:
+        try:
+            self._pending.put_nowait((alert, alert_id))
+            return True
+        except queue.Full:
+            print(f"{self.name} queue full, dropping alert: {alert['subject']}")
+            return False
+
+    def poll_results(self) -> List[Dict]:
+        results = []
+        while True:
+            try:
+                results.append(self._results.get_nowait())
+            except queue.Empty:
+                return results
+
+    def _deliver(self, alert: Dict) -> bool:
+        url, payload = self.request(alert)
+        for attempt in range(self.max_retries):
+            try:
+                with NOTIFY_SECONDS.labels(self.name).time():
+                    response = self._session.post(url, json=payload, timeout=self.timeout)
+                if self.accepted(response):
+                    return True
+                print(f"{self.name} attempt {attempt + 1} rejected: HTTP {response.status_code}")
+            except requests.RequestException as e:
+                print(f"{self.name} attempt {attempt + 1} failed: {e}")
+
+            if attempt < self.max_retries - 1:
+                NOTIFY_RETRIES.labels(self.name).inc()
+                time.sleep(0.25 * 2 ** attempt)   # 0.25s, 0.5s, ...
+
+        print(f"{self.name} delivery failed after {self.max_retries} attempts")
+        return False
+
+    def _run(self) -> None:
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            alert, alert_id = item
+            self._results.put({'context': alert_id, 'sent': self._deliver(alert)})
+
+
+class WebhookChannel(HttpChannel):
+    """POSTs the alert's fields as JSON to a generic webhook"""
+
+    name = 'webhook'
+
+    def __init__(self, url: str, timeout: float = WEBHOOK_TIMEOUT, **kwargs):
+        super().__init__(timeout, **kwargs)
+        self.url = url
+
+    def request(self, alert: Dict) -> Tuple[str, Dict]:
+        payload = {key: alert[key] for key in ('event', 'symbol', 'subject', 'text', 'critical')}
+        payload.update(alert['data'])
+        return self.url, payload
+
+
+class SlackChannel(HttpChannel):
+    """Posts the alert text to a Slack-style incoming webhook"""
+
+    name = 'slack'
+
+    def __init__(self, url: str, timeout: float = SLACK_TIMEOUT, **kwargs):
+        super().__init__(timeout, **kwargs)
+        self.url = url
+
+    def request(self, alert: Dict) -> Tuple[str, Dict]:
+        return self.url, {'text': alert['text']}
+
+
+class TelegramChannel(HttpChannel):
+    """Sends the alert text to a chat through the Telegram Bot API"""
+
+    name = 'telegram'
+
+    def __init__(self, token: str, chat_id: str, api_url: str = TELEGRAM_API_URL,
+                 timeout: float = TELEGRAM_TIMEOUT, **kwargs):
+        super().__init__(timeout, **kwargs)
+        self.url = f"{api_url.rstrip('/')}/bot{token}/sendMessage"
+        self.chat_id = chat_id
+
+    def request(self, alert: Dict) -> Tuple[str, Dict]:
+        return self.url, {'chat_id': self.chat_id, 'text': alert['text']}
+
+    def accepted(self, response: requests.Response) -> bool:
+        if not response.ok:
+            return False
+        try:
+            return bool(response.json().get('ok'))
+        except ValueError:
+            return False
+
+
+class Notifier:
+    """
+    Delivers each alert through every channel at once.
+
+    notify() only enqueues. poll_results() returns one {'context', 'sent',
+    'channel'} report per alert: sent=True as soon as any channel delivered
+    it (channel names the first one), sent=False once every channel failed.
+    """
+
+    def __init__(self, channels: List):
+        self.channels = channels
+        self._ids = itertools.count(1)
+        # alert id -> {'context', 'waiting' (channels yet to report), 'reported'}
+        self._alerts: Dict[int, Dict] = {}
+
+    def start(self) -> None:
+        for channel in self.channels:
+            channel.start()
+
+    def stop(self, timeout: float = 30) -> None:
+        """Deliver what is already queued on every channel, then stop them"""
+        for channel in self.channels:
+            channel.stop(timeout)
+
+    def notify(self, alert: Dict, context: Optional[Dict] = None) -> bool:
+        """
+        Queue an alert (from entry_event or exit_event) on every channel
+
+        Returns:
+            True if at least one channel accepted it
+        """
+        alert_id = next(self._ids)
+        accepted = sum(1 for channel in self.channels if channel.submit(alert, alert_id))
+        if not accepted:
+            return False
+        self._alerts[alert_id] = {'context': context, 'waiting': accepted, 'reported': False}
+        return True
+
+    def poll_results(self) -> List[Dict]:
+        """One report per alert that was delivered or failed on every channel since the last call"""
+        reports = []
+        for channel in self.channels:
+            for result in channel.poll_results():
+                pending = self._alerts.get(result['context'])
+                if pending is None:
+                    continue
+                pending['waiting'] -= 1
+                if result['sent'] and not pending['reported']:
+                    pending['reported'] = True
+                    reports.append({'context': pending['context'], 'sent': True, 'channel': channel.name})
+                if not pending['waiting']:
+                    if not pending['reported']:
+                        reports.append({'context': pending['context'], 'sent': False, 'channel': None})
+                    del self._alerts[result['context']]
+        return reports
+
+
+def build_notifier(config: Dict) -> Notifier:
+    """Notifier with email plus every HTTP channel configured in the environment"""
+    channels = [
+        EmailChannel(AlertDispatcher(config['gmail_user'], config['gmail_app_password']), config['recipients'])
+    ]
+    for url in ALERT_WEBHOOK_URLS.split(','):
+        if url.strip():
+            channels.append(WebhookChannel(url.strip()))
+    if SLACK_WEBHOOK_URL:
+        channels.append(SlackChannel(SLACK_WEBHOOK_URL))
+    if TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID:
+        channels.append(TelegramChannel(TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID))
+    return Notifier(channels)
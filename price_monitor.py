@@ -1,18 +1,82 @@
 """
 Price Monitor - Fetches BTC/USD price from free APIs
 """
+import os
 import time
 import requests
 from datetime import datetime
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Tuple
+
+from metrics import FETCH_FALLBACKS, FETCH_RETRIES, FETCH_SECONDS
+from rate_limit import acquire, has_budget
+
+
+# Provider base URLs; overridable to point at a mirror or a local mock server
+COINGECKO_API_URL = os.getenv('COINGECKO_API_URL', 'https://api.coingecko.com/api/v3')
+BINANCE_API_URL = os.getenv('BINANCE_API_URL', 'https://api.binance.com/api/v3')
+KRAKEN_API_URL = os.getenv('KRAKEN_API_URL', 'https://api.kraken.com/0/public')
+COINBASE_API_URL = os.getenv('COINBASE_API_URL', 'https://api.exchange.coinbase.com')
+
+
+# Symbol -> (CoinGecko id, Binance pair) for commonly watched assets.
+# Others can be given explicitly as SYMBOL:coingecko-id:BINANCEPAIR.
+KNOWN_SYMBOLS = {
+    'BTC': ('bitcoin', 'BTCUSDT'),
+    'ETH': ('ethereum', 'ETHUSDT'),
+    'SOL': ('solana', 'SOLUSDT'),
+    'BNB': ('binancecoin', 'BNBUSDT'),
+    'XRP': ('ripple', 'XRPUSDT'),
+    'DOGE': ('dogecoin', 'DOGEUSDT'),
+    'ADA': ('cardano', 'ADAUSDT'),
+    'AVAX': ('avalanche-2', 'AVAXUSDT'),
+    'LINK': ('chainlink', 'LINKUSDT'),
+    'DOT': ('polkadot', 'DOTUSDT'),
+    'LTC': ('litecoin', 'LTCUSDT'),
+    'TRX': ('tron', 'TRXUSDT'),
+}
+
+# Kraken's names for assets whose code differs from the usual symbol
+KRAKEN_ASSETS = {'BTC': 'XBT', 'DOGE': 'XDG'}
+
+
+def resolve_symbols(specs: List[str]) -> Dict[str, Tuple[str, str]]:
+    """
+    Resolve symbol specs to provider identifiers
+    
+    Args:
+        specs: Symbols such as "ETH", or "SYMBOL:coingecko-id:BINANCEPAIR"
+        
+    Returns:
+        Dict of symbol -> (coingecko_id, binance_pair)
+        
+    Raises:
+        ValueError: If a bare symbol is not in KNOWN_SYMBOLS
+    """
+    symbols = {}
+    for spec in specs:
+        parts = [part.strip() for part in spec.split(':')]
+        symbol = parts[0].upper()
+        if len(parts) == 3:
+            symbols[symbol] = (parts[1], parts[2].upper())
+        elif symbol in KNOWN_SYMBOLS:
+            symbols[symbol] = KNOWN_SYMBOLS[symbol]
+        else:
+            raise ValueError(
+                f"Unknown symbol {symbol!r}. Use SYMBOL:coingecko-id:BINANCEPAIR"
+            )
+    return symbols
 
 
 def fetch_btc_price_coingecko() -> Optional[Dict]:
     """Fetch BTC price from CoinGecko API"""
-    url = "https://api.coingecko.com/api/v3/simple/price?ids=bitcoin&vs_currencies=usd"
+    url = f"{COINGECKO_API_URL}/simple/price?ids=bitcoin&vs_currencies=usd"
+    if not acquire('coingecko'):
+        print("CoinGecko rate budget spent, skipping request")
+        return None
     
     try:
-        response = requests.get(url, timeout=10)
+        with FETCH_SECONDS.labels('coingecko').time():
+            response = requests.get(url, timeout=10)
         response.raise_for_status()
         data = response.json()
         
@@ -30,10 +94,14 @@ def fetch_btc_price_coingecko() -> Optional[Dict]:
 
 def fetch_btc_price_binance() -> Optional[Dict]:
     """Fetch BTC price from Binance API (fallback)"""
-    url = "https://api.binance.com/api/v3/ticker/price?symbol=BTCUSDT"
+    url = f"{BINANCE_API_URL}/ticker/price?symbol=BTCUSDT"
+    if not acquire('binance'):
+        print("Binance rate budget spent, skipping request")
+        return None
     
     try:
-        response = requests.get(url, timeout=10)
+        with FETCH_SECONDS.labels('binance').time():
+            response = requests.get(url, timeout=10)
         response.raise_for_status()
         data = response.json()
         
@@ -59,27 +127,294 @@ def fetch_btc_price(max_retries: int = 3) -> Optional[Dict]:
     Returns:
         Dict with 'price' and 'timestamp' or None if all attempts fail
     """
-    # Try CoinGecko first
+    # Try CoinGecko first; a spent rate budget moves on instead of backing off
     for attempt in range(max_retries):
+        if not has_budget('coingecko'):
+            break
         result = fetch_btc_price_coingecko()
         if result:
             return result
         
         if attempt < max_retries - 1:
+            FETCH_RETRIES.labels('coingecko').inc()
             wait_time = 2 ** attempt  # Exponential backoff: 1s, 2s, 4s
             time.sleep(wait_time)
     
     # Fallback to Binance
     print("CoinGecko failed, trying Binance...")
+    FETCH_FALLBACKS.inc()
     for attempt in range(max_retries):
+        if not has_budget('binance'):
+            break
         result = fetch_btc_price_binance()
         if result:
             return result
         
         if attempt < max_retries - 1:
+            FETCH_RETRIES.labels('binance').inc()
             wait_time = 2 ** attempt
             time.sleep(wait_time)
     
     print("All price API attempts failed")
     return None
 
+
+
+def coingecko_params(symbols: Dict[str, Tuple[str, str]]) -> Dict[str, str]:
+    """Query parameters for one batched CoinGecko simple/price request"""
+    ids = ','.join(sorted({coingecko_id for coingecko_id, _ in symbols.values()}))
+    return {'ids': ids, 'vs_currencies': 'usd'}
+
+
+def parse_coingecko_prices(data: Dict, symbols: Dict[str, Tuple[str, str]]) -> Dict[str, Dict]:
+    """Map a CoinGecko simple/price response to symbol -> quote"""
+    timestamp = datetime.now()
+    quotes = {}
+    for symbol, (coingecko_id, _) in symbols.items():
+        if coingecko_id in data and 'usd' in data[coingecko_id]:
+            quotes[symbol] = {
+                "price": float(data[coingecko_id]['usd']),
+                "timestamp": timestamp
+            }
+    return quotes
+
+
+def parse_binance_prices(data, symbols: Dict[str, Tuple[str, str]]) -> Dict[str, Dict]:
+    """Map a Binance ticker/price response (one ticker or a list) to symbol -> quote"""
+    timestamp = datetime.now()
+    tickers = data if isinstance(data, list) else [data]
+    by_pair = {ticker['symbol']: ticker['price'] for ticker in tickers if 'price' in ticker}
+    quotes = {}
+    for symbol, (_, pair) in symbols.items():
+        if pair in by_pair:
+            quotes[symbol] = {
+                "price": float(by_pair[pair]),
+                "timestamp": timestamp
+            }
+    return quotes
+
+
+def fetch_prices_coingecko(symbols: Dict[str, Tuple[str, str]]) -> Dict[str, Dict]:
+    """
+    Fetch prices for many symbols with a single CoinGecko request
+    
+    Args:
+        symbols: Dict of symbol -> (coingecko_id, binance_pair)
+        
+    Returns:
+        Dict of symbol -> {'price', 'timestamp'} for the symbols that were quoted
+    """
+    url = f"{COINGECKO_API_URL}/simple/price"
+    if not acquire('coingecko'):
+        print("CoinGecko rate budget spent, skipping request")
+        return {}
+    
+    try:
+        with FETCH_SECONDS.labels('coingecko').time():
+            response = requests.get(url, params=coingecko_params(symbols), timeout=10)
+        response.raise_for_status()
+        return parse_coingecko_prices(response.json(), symbols)
+    except Exception as e:
+        print(f"CoinGecko API error: {e}")
+        return {}
+
+
+def fetch_prices_binance(symbols: Dict[str, Tuple[str, str]]) -> Dict[str, Dict]:
+    """
+    Fetch prices for many symbols from Binance's all-tickers endpoint
+    
+    Args:
+        symbols: Dict of symbol -> (coingecko_id, binance_pair)
+        
+    Returns:
+        Dict of symbol -> {'price', 'timestamp'} for the symbols that were quoted
+    """
+    url = f"{BINANCE_API_URL}/ticker/price"
+    if not acquire('binance'):
+        print("Binance rate budget spent, skipping request")
+        return {}
+    
+    try:
+        with FETCH_SECONDS.labels('binance').time():
+            response = requests.get(url, timeout=10)
+        response.raise_for_status()
+        return parse_binance_prices(response.json(), symbols)
+    except Exception as e:
+        print(f"Binance API error: {e}")
+        return {}
+
+
+def fetch_klines(
+    pair: str,
+    start: float,
+    end: float,
+    interval: str = '1m',
+    limit: int = 1000
+) -> List[Tuple[float, float]]:
+    """
+    Fetch closed Binance klines (candles) in one request
+    
+    Args:
+        pair: Binance pair, e.g. "BTCUSDT"
+        start: Epoch seconds of the earliest candle open
+        end: Epoch seconds; only candles closed by then are returned
+        interval: Binance kline interval, e.g. "1m"
+        limit: Maximum candles (Binance allows up to 1000)
+        
+    Returns:
+        (close time, close price) per candle, oldest first; empty on error
+    """
+    url = f"{BINANCE_API_URL}/klines"
+    if not acquire('binance'):
+        print("Binance rate budget spent, skipping klines request")
+        return []
+    
+    params = {
+        'symbol': pair,
+        'interval': interval,
+        'startTime': int(start * 1000),
+        'endTime': int(end * 1000),
+        'limit': limit,
+    }
+    try:
+        with FETCH_SECONDS.labels('binance').time():
+            response = requests.get(url, params=params, timeout=10)
+        response.raise_for_status()
+        # [open time, open, high, low, close, volume, close time (ms, inclusive), ...]
+        return [
+            ((kline[6] + 1) / 1000, float(kline[4]))
+            for kline in response.json()
+            if (kline[6] + 1) / 1000 <= end
+        ]
+    except Exception as e:
+        print(f"Binance klines error: {e}")
+        return []
+
+
+def kraken_pair(symbol: str) -> str:
+    """Kraken USD pair for a symbol, e.g. BTC -> XBTUSD"""
+    return KRAKEN_ASSETS.get(symbol, symbol) + 'USD'
+
+
+def parse_kraken_prices(data: Dict, symbols: Dict[str, Tuple[str, str]]) -> Dict[str, Dict]:
+    """Map a Kraken Ticker response to symbol -> quote (last trade price)"""
+    timestamp = datetime.now()
+    result = data.get('result') or {}
+    quotes = {}
+    for symbol in symbols:
+        asset = KRAKEN_ASSETS.get(symbol, symbol)
+        # Older assets are keyed by their extended name, e.g. XXBTZUSD
+        for key in (f"{asset}USD", f"X{asset}ZUSD"):
+            if key in result:
+                quotes[symbol] = {
+                    "price": float(result[key]['c'][0]),
+                    "timestamp": timestamp
+                }
+                break
+    return quotes
+
+
+def fetch_prices_kraken(symbols: Dict[str, Tuple[str, str]]) -> Dict[str, Dict]:
+    """
+    Fetch prices for many symbols with a single Kraken Ticker request
+    
+    Args:
+        symbols: Dict of symbol -> (coingecko_id, binance_pair)
+        
+    Returns:
+        Dict of symbol -> {'price', 'timestamp'} for the symbols that were quoted
+    """
+    url = f"{KRAKEN_API_URL}/Ticker"
+    if not acquire('kraken'):
+        print("Kraken rate budget spent, skipping request")
+        return {}
+    
+    try:
+        params = {'pair': ','.join(kraken_pair(symbol) for symbol in symbols)}
+        with FETCH_SECONDS.labels('kraken').time():
+            response = requests.get(url, params=params, timeout=10)
+        response.raise_for_status()
+        data = response.json()
+        if data.get('error'):
+            raise ValueError(', '.join(data['error']))
+        return parse_kraken_prices(data, symbols)
+    except Exception as e:
+        print(f"Kraken API error: {e}")
+        return {}
+
+
+def fetch_prices_coinbase(symbols: Dict[str, Tuple[str, str]]) -> Dict[str, Dict]:
+    """
+    Fetch prices from Coinbase Exchange, one ticker request per symbol
+    
+    Coinbase Exchange has no public multi-product ticker, so this is the
+    one provider that cannot quote a batch in a single call. The rate
+    budget is charged for every request up front; the provider manager
+    only routes single-symbol fetches here.
+    
+    Args:
+        symbols: Dict of symbol -> (coingecko_id, binance_pair)
+        
+    Returns:
+        Dict of symbol -> {'price', 'timestamp'} for the symbols that were quoted
+    """
+    quotes = {}
+    if not acquire('coinbase', len(symbols)):
+        print(f"Coinbase rate budget cannot cover {len(symbols)} request(s), skipping")
+        return quotes
+    
+    for symbol in symbols:
+        url = f"{COINBASE_API_URL}/products/{symbol}-USD/ticker"
+        try:
+            with FETCH_SECONDS.labels('coinbase').time():
+                response = requests.get(url, timeout=10)
+            response.raise_for_status()
+            data = response.json()
+            if 'price' in data:
+                quotes[symbol] = {
+                    "price": float(data['price']),
+                    "timestamp": datetime.now()
+                }
+        except Exception as e:
+            print(f"Coinbase API error ({symbol}): {e}")
+    return quotes
+
+
+def fetch_prices(symbols: Dict[str, Tuple[str, str]], max_retries: int = 3) -> Dict[str, Dict]:
+    """
+    Fetch prices for many symbols, one HTTP call per provider per attempt
+    
+    CoinGecko is tried first; any symbols it did not quote are requested
+    from Binance.
+    
+    Args:
+        symbols: Dict of symbol -> (coingecko_id, binance_pair)
+        max_retries: Maximum number of retry attempts per provider
+        
+    Returns:
+        Dict of symbol -> {'price', 'timestamp'}; symbols no provider could
+        quote are missing
+    """
+    quotes = {}
+    missing = dict(symbols)
+    
+    # Try CoinGecko first, then ask Binance for whatever is still missing
+    for provider, fetch in (('coingecko', fetch_prices_coingecko), ('binance', fetch_prices_binance)):
+        for attempt in range(max_retries):
+            if not has_budget(provider):
+                break
+            quotes.update(fetch(missing))
+            missing = {symbol: ids for symbol, ids in missing.items() if symbol not in quotes}
+            if not missing:
+                return quotes
+            
+            if attempt < max_retries - 1:
+                FETCH_RETRIES.labels(provider).inc()
+                time.sleep(2 ** attempt)  # Exponential backoff: 1s, 2s, 4s
+        
+        if fetch is fetch_prices_coingecko:
+            print(f"CoinGecko missing {len(missing)} symbol(s), trying Binance...")
+            FETCH_FALLBACKS.inc()
+    
+    print(f"No price for: {', '.join(sorted(missing))}")
+    return quotes
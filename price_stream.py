@@ -0,0 +1,144 @@
+"""
+Price Stream - Streams ticks from Binance WebSocket market data
+"""
+import asyncio
+import json
+import os
+import queue
+import threading
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+import aiohttp
+
+
+# Base URL of the Binance combined-stream endpoint; overridable for a local stand-in
+BINANCE_STREAM_URL = os.getenv('BINANCE_STREAM_URL', 'wss://stream.binance.com:9443')
+# "trade" (every executed trade) or "bookTicker" (best bid/ask updates)
+STREAM_CHANNEL = os.getenv('PRICE_STREAM_CHANNEL', 'trade')
+# Fall back to REST polling when no tick arrives for this many seconds
+STREAM_STALE_SECONDS = float(os.getenv('PRICE_STREAM_STALE_SECONDS', '10'))
+
+MAX_RECONNECT_DELAY = 30
+
+
+def parse_stream_message(message: Dict, pairs: Dict[str, str]) -> Optional[Tuple[str, Dict]]:
+    """
+    Turn a combined-stream message into a (symbol, quote) tick
+
+    Args:
+        message: Decoded message, {"stream": ..., "data": {...}}
+        pairs: Dict of Binance pair -> symbol
+
+    Returns:
+        (symbol, {'price', 'timestamp'}) or None for messages without a price
+    """
+    data = message.get('data', message)
+    symbol = pairs.get(data.get('s'))
+    if symbol is None:
+        return None
+    if 'p' in data:
+        # Trade: last traded price
+        price = float(data['p'])
+    elif 'b' in data and 'a' in data:
+        # Book ticker: mid of best bid/ask
+        price = (float(data['b']) + float(data['a'])) / 2
+    else:
+        return None
+    return symbol, {"price": price, "timestamp": datetime.now()}
+
+
+class PriceStream:
+    """
+    Background WebSocket price feed.
+
+    Runs its own event loop in a daemon thread, reconnects with exponential
+    backoff, and hands ticks to the main loop through a bounded queue. When
+    the consumer falls behind, the oldest ticks are dropped.
+    """
+
+    def __init__(
+        self,
+        symbols: Dict[str, Tuple[str, str]],
+        channel: str = STREAM_CHANNEL,
+        base_url: str = BINANCE_STREAM_URL,
+        max_queue: int = 10000
+    ):
+        self.pairs = {pair: symbol for symbol, (_, pair) in symbols.items()}
+        streams = '/'.join(f"{pair.lower()}@{channel}" for pair in self.pairs)
+        self.url = f"{base_url}/stream?streams={streams}"
+        self.ticks: "queue.Queue[Tuple[str, Dict]]" = queue.Queue(maxsize=max_queue)
+        self.connected = threading.Event()
+        self.dropped = 0
+        self.reconnects = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start streaming in the background"""
+        self._thread = threading.Thread(target=self._run, name="price-stream", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5) -> None:
+        """Stop streaming and wait for the background thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def get(self, timeout: float = STREAM_STALE_SECONDS) -> Optional[Tuple[str, Dict]]:
+        """Next (symbol, quote) tick, or None if the stream stayed quiet for timeout seconds"""
+        try:
+            return self.ticks.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _publish(self, tick: Tuple[str, Dict]) -> None:
+        try:
+            self.ticks.put_nowait(tick)
+        except queue.Full:
+            try:
+                self.ticks.get_nowait()
+                self.dropped += 1
+            except queue.Empty:
+                pass
+            self.ticks.put_nowait(tick)
+
+    def _run(self) -> None:
+        asyncio.run(self._stream_forever())
+
+    async def _stream_forever(self) -> None:
+        delay = 1
+        async with aiohttp.ClientSession() as session:
+            while not self._stop.is_set():
+                try:
+                    async with session.ws_connect(self.url, heartbeat=20) as ws:
+                        self.connected.set()
+                        delay = 1
+                        await self._consume(ws)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"Price stream error: {e!r}")
+                finally:
+                    self.connected.clear()
+
+                if self._stop.is_set():
+                    break
+                self.reconnects += 1
+                print(f"Price stream disconnected, reconnecting in {delay}s...")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    async def _consume(self, ws: aiohttp.ClientWebSocketResponse) -> None:
+        while not self._stop.is_set():
+            try:
+                msg = await ws.receive(timeout=1)
+            except asyncio.TimeoutError:
+                continue
+            if msg.type == aiohttp.WSMsgType.TEXT:
+                tick = parse_stream_message(json.loads(msg.data), self.pairs)
+                if tick is not None:
+                    self._publish(tick)
+            elif msg.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSED,
+                              aiohttp.WSMsgType.CLOSING, aiohttp.WSMsgType.ERROR):
+                return
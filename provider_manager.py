@@ -0,0 +1,282 @@
+"""
+Provider Manager - Adaptive price provider routing
+
+Every provider's latency and success rate are tracked as moving averages,
+and each tick goes to the providers that currently score best (fastest
+after penalising failures). A circuit breaker per provider takes it out of
+rotation after repeated failures and lets a single trial request through
+once a cooldown has passed.
+
+With PRICE_CROSS_CHECK >= 2 each tick is quoted by that many providers at
+once; a quote more than PRICE_OUTLIER_PCT away from the median is rejected
+and counts as a failure of its provider. If two quotes disagree, the next
+provider breaks the tie, and a symbol without a majority gets no quote that
+tick rather than a wrong one.
+"""
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from metrics import PRICE_OUTLIERS, PROVIDER_BREAKER_OPEN, PROVIDER_LATENCY_SECONDS
+from price_monitor import (
+    KNOWN_SYMBOLS, fetch_prices_binance, fetch_prices_coinbase,
+    fetch_prices_coingecko, fetch_prices_kraken
+)
+from rate_limit import has_budget
+
+
+Symbols = Dict[str, Tuple[str, str]]
+Fetch = Callable[[Symbols], Dict[str, Dict]]
+
+# Every provider the manager can route to; register others by adding a
+# name -> fetch(symbols) entry (and a rate budget in rate_limit.py)
+PROVIDER_FETCHERS: Dict[str, Fetch] = {
+    'coingecko': fetch_prices_coingecko,
+    'binance': fetch_prices_binance,
+    'kraken': fetch_prices_kraken,
+    'coinbase': fetch_prices_coinbase,
+}
+
+# Providers that need one request per symbol (no batch endpoint). They are
+# left out of multi-symbol fetches, so each tick stays one call per provider
+PER_SYMBOL_PROVIDERS = frozenset({'coinbase'})
+
+# Providers in use, in order of preference until there are measurements
+PRICE_PROVIDERS = os.getenv('PRICE_PROVIDERS', 'coingecko,binance,kraken,coinbase')
+# Providers quoting each tick; 1 disables the cross-check
+PRICE_CROSS_CHECK = int(os.getenv('PRICE_CROSS_CHECK', '2'))
+# Largest accepted deviation from the median quote, in percent
+PRICE_OUTLIER_PCT = float(os.getenv('PRICE_OUTLIER_PCT', '1.0'))
+# Consecutive failures that open a provider's circuit breaker
+BREAKER_FAILURES = int(os.getenv('PROVIDER_BREAKER_FAILURES', '3'))
+# Seconds an open breaker waits before letting a trial request through
+BREAKER_COOLDOWN = float(os.getenv('PROVIDER_BREAKER_COOLDOWN', '60'))
+
+# Weight of the newest sample in the latency and success moving averages
+_ALPHA = 0.2
+# Assumed latency of a provider that has not been measured yet, in seconds
+_PRIOR_LATENCY = 0.5
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after `failures` consecutive failures; open -> half-open
+    after `cooldown` seconds. A success in any state closes the breaker and a
+    failed half-open trial opens it again.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failures: int = BREAKER_FAILURES, cooldown: float = BREAKER_COOLDOWN,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = max(1, failures)
+        self.cooldown = cooldown
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+
+    def allow(self) -> bool:
+        """True if a request may be sent"""
+        if self.state == self.OPEN and self.clock() - self._opened_at >= self.cooldown:
+            self.state = self.HALF_OPEN
+        return self.state != self.OPEN
+
+    def record(self, success: bool) -> None:
+        if success:
+            self.failures = 0
+            self.state = self.CLOSED
+            return
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self._opened_at = self.clock()
+
+
+class ProviderHealth:
+    """Moving averages of one provider's latency and success rate, plus its breaker"""
+
+    def __init__(self, name: str, breaker: CircuitBreaker):
+        self.name = name
+        self.breaker = breaker
+        self.latency: Optional[float] = None
+        self.success_rate = 1.0
+        self.requests = 0
+
+    def record(self, success: bool, latency: Optional[float] = None) -> None:
+        """Record one request outcome; latency only counts for answered requests"""
+        self.requests += 1
+        if success and latency is not None:
+            self.latency = latency if self.latency is None else self.latency + _ALPHA * (latency - self.latency)
+            PROVIDER_LATENCY_SECONDS.labels(self.name).set(self.latency)
+        self.success_rate += _ALPHA * ((1.0 if success else 0.0) - self.success_rate)
+        self.breaker.record(success)
+        PROVIDER_BREAKER_OPEN.labels(self.name).set(1 if self.breaker.state == CircuitBreaker.OPEN else 0)
+
+    def score(self) -> float:
+        """Expected seconds per good answer; lower is better"""
+        latency = self.latency if self.latency is not None else _PRIOR_LATENCY
+        return latency / max(self.success_rate, 0.05)
+
+
+class ProviderManager:
+    """
+    Routes each fetch to the currently best providers.
+
+    Has the same fetch()/close() interface as AsyncPriceFetcher, so main
+    can use either.
+    """
+
+    def __init__(
+        self,
+        symbols: Optional[Symbols] = None,
+        providers: Optional[Dict[str, Fetch]] = None,
+        cross_check: int = PRICE_CROSS_CHECK,
+        outlier_pct: float = PRICE_OUTLIER_PCT,
+        breaker_failures: int = BREAKER_FAILURES,
+        breaker_cooldown: float = BREAKER_COOLDOWN,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        if providers is None:
+            names = [name.strip().lower() for name in PRICE_PROVIDERS.split(',') if name.strip()]
+            unknown = [name for name in names if name not in PROVIDER_FETCHERS]
+            if unknown:
+                raise ValueError(
+                    f"Unknown price provider(s) {', '.join(unknown)}; "
+                    f"available: {', '.join(PROVIDER_FETCHERS)}"
+                )
+            providers = {name: PROVIDER_FETCHERS[name] for name in names}
+        self.symbols = symbols or {'BTC': KNOWN_SYMBOLS['BTC']}
+        self.providers = providers
+        self.cross_check = max(1, cross_check)
+        self.outlier_pct = outlier_pct
+        self.health = {
+            name: ProviderHealth(name, CircuitBreaker(breaker_failures, breaker_cooldown, clock))
+            for name in providers
+        }
+        self._executor = ThreadPoolExecutor(max_workers=max(1, len(providers)), thread_name_prefix="provider")
+
+    def ranked(self, symbols: Optional[Symbols] = None) -> List[str]:
+        """Providers that may be called now for the given symbols, best first"""
+        batch = len(symbols or self.symbols) > 1
+        usable = [
+            name for name in self.providers
+            if not (batch and name in PER_SYMBOL_PROVIDERS)
+            and self.health[name].breaker.allow() and has_budget(name)
+        ]
+        # sorted() is stable, so unmeasured providers keep the configured order
+        return sorted(usable, key=lambda name: self.health[name].score())
+
+    def _call(self, name: str, symbols: Symbols) -> Tuple[Dict[str, Dict], float]:
+        start = time.perf_counter()
+        try:
+            quotes = self.providers[name](symbols)
+        except Exception as e:
+            print(f"{name} provider error: {e!r}")
+            quotes = {}
+        return quotes, time.perf_counter() - start
+
+    def _call_many(self, names: List[str], symbols: Symbols) -> Dict[str, Tuple[Dict[str, Dict], float]]:
+        """Provider name -> (quotes, latency), calling several providers concurrently"""
+        if len(names) == 1:
+            return {names[0]: self._call(names[0], symbols)}
+        futures = {name: self._executor.submit(self._call, name, symbols) for name in names}
+        return {name: future.result() for name, future in futures.items()}
+
+    def _reconcile(self, results: Dict[str, Dict[str, Dict]], symbol: str,
+                   final: bool) -> Tuple[Optional[Dict], List[str]]:
+        """
+        Agreed quote for one symbol from the providers' answers (in rank order)
+
+        Returns:
+            (quote, outlier provider names); the quote is None while more
+            answers are needed or, when final, if there is no majority
+        """
+        quoted = [(name, quotes[symbol]) for name, quotes in results.items() if symbol in quotes]
+        if not quoted:
+            return None, []
+        if len(quoted) == 1:
+            # Nothing to check against unless more providers can still answer
+            return (quoted[0][1] if final or self.cross_check == 1 else None), []
+
+        median = statistics.median(quote['price'] for _, quote in quoted)
+        tolerance = abs(median) * self.outlier_pct / 100
+        agreeing = [(name, quote) for name, quote in quoted if abs(quote['price'] - median) <= tolerance]
+        if len(agreeing) * 2 > len(quoted):
+            outliers = [name for name, _ in quoted if all(name != other for other, _ in agreeing)]
+            return agreeing[0][1], outliers
+        return None, []
+
+    def fetch(self, symbols: Optional[Symbols] = None) -> Dict[str, Dict]:
+        """
+        Fetch the latest quotes from the best providers
+
+        Args:
+            symbols: Dict of symbol -> (coingecko_id, binance_pair); defaults
+                to the symbols given at construction
+
+        Returns:
+            Dict of symbol -> {'price', 'timestamp'}; symbols without an
+            agreed quote are missing
+        """
+        symbols = symbols or self.symbols
+        ranked = self.ranked(symbols)
+        if not ranked:
+            print("No price provider available (all breakers open or budgets spent)")
+            return {}
+
+        calls = self._call_many(ranked[:self.cross_check], symbols)
+        results = {name: quotes for name, (quotes, _) in calls.items()}
+        remaining = ranked[self.cross_check:]
+        quotes: Dict[str, Dict] = {}
+        outliers = set()
+        while True:
+            final = not remaining
+            unsettled = {}
+            for symbol, ids in symbols.items():
+                if symbol in quotes:
+                    continue
+                quote, rejected = self._reconcile(results, symbol, final)
+                if quote is not None:
+                    quotes[symbol] = quote
+                    outliers.update((name, symbol) for name in rejected)
+                else:
+                    unsettled[symbol] = ids
+            if not unsettled or final:
+                break
+            # Missing or disputed quotes go to the next provider in line
+            name = remaining.pop(0)
+            calls[name] = self._call(name, unsettled)
+            results[name] = calls[name][0]
+
+        for name, symbol in sorted(outliers):
+            print(f"Rejected {name} quote for {symbol}: outside {self.outlier_pct}% of the other providers")
+            PRICE_OUTLIERS.labels(name).inc()
+        # An outlier counts as a failure, so a provider quoting garbage trips its breaker
+        rejected = {name for name, _ in outliers}
+        for name, (answer, latency) in calls.items():
+            self.health[name].record(bool(answer) and name not in rejected, latency)
+        missing = [symbol for symbol in symbols if symbol not in quotes]
+        if missing:
+            print(f"No agreed price for: {', '.join(sorted(missing))}")
+        return quotes
+
+    def status(self) -> Dict[str, Dict]:
+        """Provider name -> {'state', 'latency', 'success_rate', 'requests'}"""
+        return {
+            name: {
+                'state': health.breaker.state,
+                'latency': health.latency,
+                'success_rate': health.success_rate,
+                'requests': health.requests,
+            }
+            for name, health in self.health.items()
+        }
+
+    def close(self) -> None:
+        """Stop the worker threads"""
+        self._executor.shutdown(wait=False)
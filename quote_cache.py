@@ -0,0 +1,185 @@
+"""
+Quote Cache - TTL cache of latest quotes shared by every price consumer
+
+Callers ask the cache instead of the providers. A quote younger than the
+TTL is served as is; otherwise one caller fetches while the others wait for
+its result (a thread lock within a process, a file lock across processes),
+so concurrent requests coalesce into one provider call. If the fetch fails,
+quotes up to the max staleness are served and marked stale.
+
+With QUOTE_CACHE_FILE set, quotes are also shared through that file, so
+several monitor processes coalesce their fetches and check_state.py or a
+dashboard can read what the monitor fetched. It is off by default: a
+single process needs neither the file lock nor the write every tick.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not on Windows
+    fcntl = None
+
+from metrics import QUOTE_CACHE_LOOKUPS
+from price_monitor import fetch_prices
+from tick_journal import write_atomic
+
+
+QUOTE_CACHE_TTL = float(os.getenv('QUOTE_CACHE_TTL', '5'))
+# Serve a cached quote this old (seconds) when the providers fail; 0 never serves stale quotes
+QUOTE_MAX_STALENESS = float(os.getenv('QUOTE_MAX_STALENESS', '120'))
+# Shared cache file, e.g. quotes.json; empty (the default) keeps the cache in-process
+QUOTE_CACHE_FILE = os.getenv('QUOTE_CACHE_FILE', '')
+
+Symbols = Dict[str, Tuple[str, str]]
+
+
+def _fetch_once(symbols: Symbols) -> Dict[str, Dict]:
+    # One attempt per provider: the cache serves stale quotes rather than backing off
+    return fetch_prices(symbols, max_retries=1)
+
+
+class QuoteCache:
+    """Latest quote per symbol, fetched at most once per TTL"""
+
+    def __init__(
+        self,
+        fetch: Callable[[Symbols], Dict[str, Dict]] = _fetch_once,
+        ttl: float = QUOTE_CACHE_TTL,
+        max_staleness: float = QUOTE_MAX_STALENESS,
+        path: Optional[str] = QUOTE_CACHE_FILE,
+        clock: Callable[[], float] = time.time
+    ):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.max_staleness = max_staleness
+        self.path = path or None
+        self.clock = clock
+        # symbol -> (fetched_at epoch seconds, price)
+        self._quotes: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def _fresh(self, symbols, now: float) -> Dict[str, Dict]:
+        quotes = {}
+        for symbol in symbols:
+            cached = self._quotes.get(symbol)
+            if cached is not None and now - cached[0] < self.ttl:
+                quotes[symbol] = _quote(cached)
+        return quotes
+
+    def get(self, symbols: Symbols) -> Dict[str, Dict]:
+        """
+        Quotes for the given symbols
+
+        Args:
+            symbols: Dict of symbol -> (coingecko_id, binance_pair)
+
+        Returns:
+            Dict of symbol -> {'price', 'timestamp'} (plus 'stale': True for
+            quotes served past the TTL because the fetch failed); symbols
+            with no usable quote are missing
+        """
+        quotes = self._fresh(symbols, self.clock())
+        if len(quotes) == len(symbols):
+            QUOTE_CACHE_LOOKUPS.labels('hit').inc()
+            return quotes
+
+        # One fetch at a time; waiters usually find the quotes it stored
+        with self._lock, self._file_lock():
+            self._load()
+            quotes = self._fresh(symbols, self.clock())
+            missing = {symbol: ids for symbol, ids in symbols.items() if symbol not in quotes}
+            if not missing:
+                QUOTE_CACHE_LOOKUPS.labels('hit').inc()
+                return quotes
+
+            QUOTE_CACHE_LOOKUPS.labels('miss').inc()
+            fetched = self.fetch(missing)
+            self._store(fetched)
+            quotes.update(fetched)
+
+            now = self.clock()
+            for symbol in missing:
+                cached = self._quotes.get(symbol)
+                if symbol not in quotes and cached is not None and now - cached[0] <= self.max_staleness:
+                    QUOTE_CACHE_LOOKUPS.labels('stale').inc()
+                    quotes[symbol] = dict(_quote(cached), stale=True)
+            return quotes
+
+    def peek(self, symbols) -> Dict[str, Dict]:
+        """
+        Cached quotes for the given symbols, without fetching
+
+        Quotes past the TTL are included and marked stale; symbols never
+        cached are missing.
+        """
+        with self._lock:
+            self._load()
+            now = self.clock()
+            quotes = {}
+            for symbol in symbols:
+                cached = self._quotes.get(symbol)
+                if cached is not None:
+                    quotes[symbol] = _quote(cached)
+                    if now - cached[0] >= self.ttl:
+                        quotes[symbol]['stale'] = True
+            return quotes
+
+    def put(self, quotes: Dict[str, Dict]) -> None:
+        """Store quotes obtained elsewhere, e.g. from the WebSocket stream"""
+        with self._lock, self._file_lock():
+            self._load()
+            self._store(quotes)
+
+    def _store(self, quotes: Dict[str, Dict]) -> None:
+        if not quotes:
+            return
+        for symbol, quote in quotes.items():
+            timestamp = quote['timestamp'].timestamp()
+            cached = self._quotes.get(symbol)
+            if cached is None or timestamp >= cached[0]:
+                self._quotes[symbol] = (timestamp, quote['price'])
+        if self.path:
+            data = {symbol: {'fetched_at': ts, 'price': price} for symbol, (ts, price) in self._quotes.items()}
+            try:
+                # Quotes are cheap to refetch; no need to wait for the disk
+                write_atomic(self.path, json.dumps(data).encode(), durable=False)
+            except IOError as e:
+                print(f"Error writing quote cache: {e}")
+
+    def _load(self) -> None:
+        """Merge newer quotes from the shared file"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            for symbol, entry in data.items():
+                cached = self._quotes.get(symbol)
+                if cached is None or entry['fetched_at'] > cached[0]:
+                    self._quotes[symbol] = (float(entry['fetched_at']), float(entry['price']))
+        except (json.JSONDecodeError, IOError, KeyError, TypeError, ValueError) as e:
+            print(f"Error reading quote cache: {e}")
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """Hold an exclusive lock on <path>.lock so processes fetch one at a time"""
+        if not self.path or fcntl is None:
+            yield
+            return
+        with open(self.path + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _quote(cached: Tuple[float, float]) -> Dict:
+    fetched_at, price = cached
+    return {"price": price, "timestamp": datetime.fromtimestamp(fetched_at)}
@@ -0,0 +1,97 @@
+"""
+Rate Limit - Per-provider request budgets (token buckets)
+
+A provider whose budget is spent is skipped instead of called, so we never
+provoke the 429s that would otherwise send us into retry backoff.
+"""
+import os
+import threading
+import time
+from typing import Callable, Dict
+
+from metrics import RATE_LIMITED
+
+
+# Requests per minute each provider may receive from this process.
+# CoinGecko's free tier allows roughly 30/min; Binance's request weight
+# limit is far higher. Kraken's public endpoints allow about one call per
+# second and Coinbase Exchange several per second.
+PROVIDER_RATE_LIMITS = {
+    'coingecko': float(os.getenv('COINGECKO_RATE_LIMIT', '25')),
+    'binance': float(os.getenv('BINANCE_RATE_LIMIT', '600')),
+    'kraken': float(os.getenv('KRAKEN_RATE_LIMIT', '50')),
+    'coinbase': float(os.getenv('COINBASE_RATE_LIMIT', '300')),
+}
+
+
+class RateBudget:
+    """
+    Token bucket holding up to a minute's worth of requests.
+
+    Tokens refill continuously at per_minute / 60 per second.
+    """
+
+    def __init__(self, per_minute: float, clock: Callable[[], float] = time.monotonic):
+        self.per_minute = per_minute
+        self.capacity = max(1.0, per_minute)
+        self.clock = clock
+        self.tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.per_minute / 60)
+        self._updated = now
+
+    def available(self, count: int = 1) -> bool:
+        """True if count requests could be made now"""
+        with self._lock:
+            self._refill()
+            return self.tokens >= count
+
+    def wait_time(self) -> float:
+        """Seconds until a request could be made (0 if one can be made now)"""
+        with self._lock:
+            self._refill()
+            if self.tokens >= 1 or self.per_minute <= 0:
+                return 0.0 if self.tokens >= 1 else float('inf')
+            return (1 - self.tokens) * 60 / self.per_minute
+
+    def take(self, count: int = 1) -> bool:
+        """Spend count requests; False (and nothing spent) if the budget cannot cover them"""
+        with self._lock:
+            self._refill()
+            if self.tokens < count:
+                return False
+            self.tokens -= count
+            return True
+
+
+RATE_BUDGETS: Dict[str, RateBudget] = {
+    provider: RateBudget(per_minute) for provider, per_minute in PROVIDER_RATE_LIMITS.items()
+}
+
+
+def acquire(provider: str, count: int = 1) -> bool:
+    """
+    Take requests from a provider's budget
+
+    Args:
+        provider: Provider name
+        count: Number of requests about to be made
+
+    Returns:
+        True if the request may go ahead; unknown providers are unlimited
+    """
+    budget = RATE_BUDGETS.get(provider)
+    if budget is None or budget.take(count):
+        return True
+    RATE_LIMITED.labels(provider).inc()
+    return False
+
+
+def has_budget(provider: str, count: int = 1) -> bool:
+    """True if the provider's budget allows count requests right now"""
+    budget = RATE_BUDGETS.get(provider)
+    return budget is None or budget.available(count)
@@ -0,0 +1,469 @@
+"""
+Rolling Window - Time-based price window with O(1) min/max lookups
+"""
+import math
+from array import array
+from collections import deque
+from datetime import datetime
+from itertools import islice
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+
+# Raw ticks a BucketedWindow keeps for tail(), i.e. for journaling
+TAIL_TICKS = 1024
+NS_PER_SECOND = 1_000_000_000
+# Expired ticks allowed to pile up at the head of the columns before compacting
+_COMPACT_MIN = 1024
+# RollingWindow trims its columns every (mask + 1) appends
+_SYNC_MASK = 255
+
+
+class RollingWindow:
+    """
+    Sliding time window of (timestamp, price) ticks.
+
+    Ticks are stored column-wise: int64 epoch nanoseconds in an array('q')
+    and prices in an array('d'), 16 bytes per tick instead of a tuple and
+    two boxed floats. Timestamps go in and come out as epoch seconds
+    (floats). Appends and expiry are amortized O(1), and the window
+    minimum/maximum are kept in monotonic deques so reading them is O(1)
+    as well.
+    """
+
+    def __init__(self, window_seconds: float):
+        self.window_seconds = window_seconds
+        self._window_ns = int(window_seconds * NS_PER_SECOND)
+        self._ts = array('q')
+        self._prices = array('d')
+        # Index of the oldest live tick in the columns. Expired ticks are
+        # dropped from the columns lazily (see _sync); the cutoff is the
+        # epoch-ns timestamp below which ticks no longer count
+        self._head = 0
+        self._cutoff_ns = -1 << 63
+        # (epoch ns, price) pairs; prices increase front to back, so the
+        # front is the window low
+        self._lows: Deque[Tuple[int, float]] = deque()
+        # Prices decrease front to back; the front is the window high
+        self._highs: Deque[Tuple[int, float]] = deque()
+        # Total ticks ever appended, and number of clear() calls; lets
+        # persistence work out which ticks it has not written yet
+        self.appended = 0
+        self.generation = 0
+
+    def __len__(self) -> int:
+        self._sync()
+        return len(self._ts) - self._head
+
+    def __iter__(self) -> Iterator[Tuple[float, float]]:
+        self._sync()
+        head = self._head
+        return zip(
+            (ns / NS_PER_SECOND for ns in self._ts[head:]),
+            self._prices[head:]
+        )
+
+    def append(self, timestamp: float, price: float) -> None:
+        """
+        Add a tick and expire ticks older than the window
+
+        A tick older than the latest one (e.g. a late quote, or one stamped
+        after the wall clock stepped back) or already older than the window
+        is ignored: the columns and the low/high deques rely on ticks
+        arriving in time order. Repeated timestamps are kept.
+        """
+        ns = int(timestamp * NS_PER_SECOND)
+        ts = self._ts
+        if ns < self._cutoff_ns or (ts and ns < ts[-1]):
+            return
+        ts.append(ns)
+        self._prices.append(price)
+        self.appended += 1
+        tick = (ns, price)
+
+        lows = self._lows
+        while lows and lows[-1][1] > price:
+            lows.pop()
+        lows.append(tick)
+
+        highs = self._highs
+        while highs and highs[-1][1] < price:
+            highs.pop()
+        highs.append(tick)
+
+        cutoff_ns = ns - self._window_ns
+        if cutoff_ns > self._cutoff_ns:
+            self._cutoff_ns = cutoff_ns
+        cutoff_ns = self._cutoff_ns
+        while lows and lows[0][0] < cutoff_ns:
+            lows.popleft()
+        while highs and highs[0][0] < cutoff_ns:
+            highs.popleft()
+        # The columns only need trimming now and then
+        if not self.appended & _SYNC_MASK:
+            self._sync()
+
+    def expire(self, cutoff: float) -> None:
+        """Drop ticks with a timestamp older than cutoff"""
+        cutoff_ns = int(cutoff * NS_PER_SECOND)
+        if cutoff_ns <= self._cutoff_ns:
+            return
+        self._cutoff_ns = cutoff_ns
+        lows = self._lows
+        while lows and lows[0][0] < cutoff_ns:
+            lows.popleft()
+        highs = self._highs
+        while highs and highs[0][0] < cutoff_ns:
+            highs.popleft()
+        self._sync()
+
+    def _sync(self) -> None:
+        """Advance the columns past expired ticks, compacting them when worthwhile"""
+        ts = self._ts
+        cutoff_ns = self._cutoff_ns
+        head = self._head
+        end = len(ts)
+        while head < end and ts[head] < cutoff_ns:
+            head += 1
+        self._head = head
+        # Compact once the expired prefix outweighs the live ticks
+        if head >= _COMPACT_MIN and head * 2 >= end:
+            del ts[:head]
+            del self._prices[:head]
+            self._head = 0
+
+    def clear(self) -> None:
+        """Remove all ticks"""
+        del self._ts[:]
+        del self._prices[:]
+        self._head = 0
+        self._cutoff_ns = -1 << 63
+        self._lows.clear()
+        self._highs.clear()
+        self.generation += 1
+
+    def min(self) -> Optional[float]:
+        """Lowest price in the window, or None if empty"""
+        return self._lows[0][1] if self._lows else None
+
+    def max(self) -> Optional[float]:
+        """Highest price in the window, or None if empty"""
+        return self._highs[0][1] if self._highs else None
+
+    def oldest(self) -> Optional[Tuple[float, float]]:
+        """Oldest (timestamp, price) tick, or None if empty"""
+        if not len(self):
+            return None
+        return self._ts[self._head] / NS_PER_SECOND, self._prices[self._head]
+
+    def latest(self) -> Optional[Tuple[float, float]]:
+        """Newest (timestamp, price) tick, or None if empty"""
+        # The newest tick only expires through expire(), which syncs
+        if self._head >= len(self._ts):
+            return None
+        return self._ts[-1] / NS_PER_SECOND, self._prices[-1]
+
+    def tail(self, count: int) -> List[Tuple[float, float]]:
+        """Newest count ticks, oldest first"""
+        if count <= 0:
+            return []
+        self._sync()
+        start = max(self._head, len(self._ts) - count)
+        return [(ns / NS_PER_SECOND, price) for ns, price in zip(self._ts[start:], self._prices[start:])]
+
+    def timestamps_ns(self) -> array:
+        """Copy of the live timestamp column (int64 epoch nanoseconds)"""
+        self._sync()
+        return self._ts[self._head:]
+
+    def prices(self) -> array:
+        """Copy of the live price column"""
+        self._sync()
+        return self._prices[self._head:]
+
+    def to_ticks(self) -> Dict:
+        """Serialize to the state.json price_ticks format (one list per column)"""
+        return {'timestamps_ns': self.timestamps_ns().tolist(), 'prices': self.prices().tolist()}
+
+    @classmethod
+    def from_ticks(cls, data: Dict, window_seconds: float) -> "RollingWindow":
+        """
+        Build a window from state.json price_ticks
+
+        The columns are loaded as they are; only the low/high deques are
+        rebuilt, in one pass with no timestamp parsing.
+        """
+        window = cls(window_seconds)
+        window._ts.extend(data['timestamps_ns'])
+        window._prices.extend(data['prices'])
+        lows = window._lows
+        highs = window._highs
+        for tick in zip(window._ts, window._prices):
+            price = tick[1]
+            while lows and lows[-1][1] > price:
+                lows.pop()
+            lows.append(tick)
+            while highs and highs[-1][1] < price:
+                highs.pop()
+            highs.append(tick)
+        window.appended = len(window._ts)
+        if window.appended:
+            window.expire((window._ts[-1] - window._window_ns) / NS_PER_SECOND)
+        return window
+
+    def to_history(self) -> List[Dict]:
+        """Serialize to the legacy state.json price_history format"""
+        return [
+            {"timestamp": datetime.fromtimestamp(ts).isoformat(), "price": price}
+            for ts, price in self
+        ]
+
+    @classmethod
+    def from_history(cls, history: List[Dict], window_seconds: float) -> "RollingWindow":
+        """Build a window from state.json price_history entries"""
+        window = cls(window_seconds)
+        for entry in history:
+            ts = datetime.fromisoformat(entry['timestamp']).timestamp()
+            window.append(ts, float(entry['price']))
+        return window
+
+
+class BucketedWindow:
+    """
+    Sliding time window that folds ticks into fixed-size OHLC buckets.
+
+    Memory and snapshot size are bounded by window_seconds / bucket_seconds
+    whatever the tick rate. Buckets live in array-backed columns; bucket
+    lows and highs are exact, so min() and max() are the exact extremes of
+    every tick in the retained buckets. A bucket is expired once its newest
+    tick falls out of the window, so the window reaches back up to one
+    bucket further than a RollingWindow of the same length.
+    """
+
+    COLUMNS = ('first', 'last', 'open', 'high', 'low', 'close', 'count')
+
+    def __init__(self, window_seconds: float, bucket_seconds: float, tail_ticks: int = TAIL_TICKS):
+        if bucket_seconds <= 0:
+            raise ValueError("bucket_seconds must be positive")
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self._first = array('d')    # Timestamp of each bucket's first tick
+        self._last = array('d')     # Timestamp of each bucket's last tick
+        self._open = array('d')
+        self._high = array('d')
+        self._low = array('d')
+        self._close = array('d')
+        self._count = array('q')
+        self._head = 0              # Index of the oldest live bucket in the columns
+        self._base = 0              # Sequence number of the oldest live bucket
+        self._current_start: Optional[float] = None
+        # (bucket sequence, price) monotonic deques, as in RollingWindow
+        self._lows: Deque[Tuple[int, float]] = deque()
+        self._highs: Deque[Tuple[int, float]] = deque()
+        self._recent: Deque[Tuple[float, float]] = deque(maxlen=tail_ticks)
+        self.appended = 0
+        self.generation = 0
+
+    def _columns(self) -> Tuple[array, ...]:
+        return self._first, self._last, self._open, self._high, self._low, self._close, self._count
+
+    def __len__(self) -> int:
+        """Number of buckets in the window"""
+        return len(self._first) - self._head
+
+    def __iter__(self) -> Iterator[Tuple[float, float]]:
+        """
+        Representative (timestamp, price) ticks, up to four per bucket
+
+        Each bucket yields its open, low, high (in the order that keeps the
+        path plausible) and close, so consumers see the exact extremes.
+        """
+        for i in range(self._head, len(self._first)):
+            first, last = self._first[i], self._last[i]
+            open_, high, low, close = self._open[i], self._high[i], self._low[i], self._close[i]
+            yield first, open_
+            if self._count[i] == 1:
+                continue
+            if close >= open_:
+                yield first, low
+                yield first, high
+            else:
+                yield first, high
+                yield first, low
+            yield last, close
+
+    def ticks(self) -> int:
+        """Number of raw ticks folded into the live buckets"""
+        return sum(self._count[self._head:])
+
+    def append(self, timestamp: float, price: float) -> None:
+        """Fold a tick into its bucket and expire buckets older than the window"""
+        bucket_start = math.floor(timestamp / self.bucket_seconds) * self.bucket_seconds
+        # Late ticks are folded into the current bucket rather than reopening an old one
+        if self._current_start is not None and bucket_start <= self._current_start:
+            i = len(self._first) - 1
+            self._last[i] = max(self._last[i], timestamp)
+            self._close[i] = price
+            self._count[i] += 1
+            if price < self._low[i]:
+                self._low[i] = price
+                self._push_low(self._base + i - self._head, price)
+            if price > self._high[i]:
+                self._high[i] = price
+                self._push_high(self._base + i - self._head, price)
+        else:
+            seq = self._base + len(self._first) - self._head
+            for column, value in zip(self._columns(), (timestamp, timestamp, price, price, price, price, 1)):
+                column.append(value)
+            self._current_start = bucket_start
+            self._push_low(seq, price)
+            self._push_high(seq, price)
+
+        self._recent.append((timestamp, price))
+        self.appended += 1
+        self.expire(timestamp - self.window_seconds)
+
+    def _push_low(self, seq: int, price: float) -> None:
+        lows = self._lows
+        if lows and lows[-1][0] == seq:
+            lows.pop()
+        while lows and lows[-1][1] > price:
+            lows.pop()
+        lows.append((seq, price))
+
+    def _push_high(self, seq: int, price: float) -> None:
+        highs = self._highs
+        if highs and highs[-1][0] == seq:
+            highs.pop()
+        while highs and highs[-1][1] < price:
+            highs.pop()
+        highs.append((seq, price))
+
+    def expire(self, cutoff: float) -> None:
+        """Drop buckets whose newest tick is older than cutoff"""
+        last = self._last
+        head = self._head
+        while head < len(last) and last[head] < cutoff:
+            head += 1
+        if head == self._head:
+            return
+        self._base += head - self._head
+        self._head = head
+        if head == len(last):
+            self._current_start = None
+        # Compact once the expired prefix outweighs the live buckets
+        if head * 2 >= len(last):
+            for column in self._columns():
+                del column[:head]
+            self._head = 0
+
+        base = self._base
+        lows = self._lows
+        while lows and lows[0][0] < base:
+            lows.popleft()
+        highs = self._highs
+        while highs and highs[0][0] < base:
+            highs.popleft()
+
+    def clear(self) -> None:
+        """Remove all buckets"""
+        for column in self._columns():
+            del column[:]
+        self._head = 0
+        self._current_start = None
+        self._lows.clear()
+        self._highs.clear()
+        self._recent.clear()
+        self.generation += 1
+
+    def min(self) -> Optional[float]:
+        """Lowest price in the window, or None if empty"""
+        return self._lows[0][1] if self._lows else None
+
+    def max(self) -> Optional[float]:
+        """Highest price in the window, or None if empty"""
+        return self._highs[0][1] if self._highs else None
+
+    def oldest(self) -> Optional[Tuple[float, float]]:
+        """First (timestamp, price) tick of the oldest bucket, or None if empty"""
+        if not len(self):
+            return None
+        return self._first[self._head], self._open[self._head]
+
+    def latest(self) -> Optional[Tuple[float, float]]:
+        """Newest (timestamp, price) tick, or None if empty"""
+        if self._recent:
+            return self._recent[-1]
+        if not len(self):
+            return None
+        return self._last[-1], self._close[-1]
+
+    def tail(self, count: int) -> List[Tuple[float, float]]:
+        """
+        Newest count raw ticks, oldest first
+
+        Only the last tail_ticks raw ticks are kept, so fewer may be returned.
+        """
+        if count <= 0:
+            return []
+        ticks = list(islice(reversed(self._recent), count))
+        ticks.reverse()
+        return ticks
+
+    def to_buckets(self) -> Dict:
+        """Serialize to the state.json price_buckets format (one list per column)"""
+        head = self._head
+        data = {'bucket_seconds': self.bucket_seconds}
+        for name, column in zip(self.COLUMNS, self._columns()):
+            data[name] = column[head:].tolist()
+        return data
+
+    @classmethod
+    def from_buckets(cls, data: Dict, window_seconds: float, bucket_seconds: float) -> "BucketedWindow":
+        """
+        Build a window from state.json price_buckets
+
+        Buckets saved with a different bucket size are re-folded from their
+        representative ticks.
+        """
+        window = cls(window_seconds, bucket_seconds)
+        if data.get('bucket_seconds') != bucket_seconds:
+            saved = cls(float('inf'), data['bucket_seconds'])
+            saved._load_columns(data)
+            for ts, price in saved:
+                window.append(ts, price)
+            return window
+        window._load_columns(data)
+        if len(window):
+            window.expire(window._last[-1] - window_seconds)
+        return window
+
+    def _load_columns(self, data: Dict) -> None:
+        for name, column in zip(self.COLUMNS, self._columns()):
+            column.extend(data[name])
+        for i in range(len(self._first)):
+            self._push_low(i, self._low[i])
+            self._push_high(i, self._high[i])
+        if len(self._first):
+            last = self._first[-1]
+            self._current_start = math.floor(last / self.bucket_seconds) * self.bucket_seconds
+
+    def to_history(self) -> List[Dict]:
+        """Serialize representative ticks to the state.json price_history format"""
+        return [
+            {"timestamp": datetime.fromtimestamp(ts).isoformat(), "price": price}
+            for ts, price in self
+        ]
+
+    @classmethod
+    def from_history(
+        cls,
+        history: List[Dict],
+        window_seconds: float,
+        bucket_seconds: float
+    ) -> "BucketedWindow":
+        """Fold state.json price_history entries into buckets"""
+        window = cls(window_seconds, bucket_seconds)
+        for entry in history:
+            ts = datetime.fromisoformat(entry['timestamp']).timestamp()
+            window.append(ts, float(entry['price']))
+        return window
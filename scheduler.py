@@ -0,0 +1,118 @@
+"""
+Scheduler - Drift-free tick scheduling and per-phase timing for the main loop
+"""
+import os
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator
+
+
+TICK_INTERVAL_SECONDS = float(os.getenv('TICK_INTERVAL_SECONDS', '60'))
+# "skip": after an overrun, run once immediately and drop the other missed slots
+# "catchup": run missed slots back to back (up to MAX_CATCHUP_TICKS) to keep the sample count
+SCHEDULE_POLICY = os.getenv('SCHEDULE_POLICY', 'skip').lower()
+MAX_CATCHUP_TICKS = int(os.getenv('MAX_CATCHUP_TICKS', '5'))
+
+
+class TickScheduler:
+    """
+    Fixed-rate scheduler on the monotonic clock.
+
+    Deadlines sit on a fixed grid (start + n * interval) rather than being
+    measured from the end of the previous tick, so work time does not
+    accumulate as drift.
+    """
+
+    def __init__(
+        self,
+        interval: float = TICK_INTERVAL_SECONDS,
+        policy: str = SCHEDULE_POLICY,
+        max_catchup: int = MAX_CATCHUP_TICKS,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        if policy not in ('skip', 'catchup'):
+            raise ValueError(f"Unknown schedule policy {policy!r} (expected 'skip' or 'catchup')")
+        self.interval = interval
+        self.policy = policy
+        self.max_catchup = max_catchup
+        self.clock = clock
+        self.sleep = sleep
+        self.overruns = 0       # Ticks that finished after the next deadline
+        self.skipped = 0        # Grid slots dropped without running
+        self.last_lag = 0.0     # How late the most recent tick started, in seconds
+        self._deadline = clock()
+
+    def wait(self) -> float:
+        """
+        Block until the next tick is due
+
+        Returns:
+            Lag in seconds between the tick's scheduled and actual start
+        """
+        self._deadline += self.interval
+        now = self.clock()
+        if now < self._deadline:
+            self.sleep(self._deadline - now)
+            self.last_lag = max(0.0, self.clock() - self._deadline)
+            return self.last_lag
+
+        self.overruns += 1
+        behind = int((now - self._deadline) // self.interval)
+        if self.policy == 'catchup' and behind < self.max_catchup:
+            # Keep the deadline; the following waits return at once until caught up
+            self.last_lag = now - self._deadline
+            return self.last_lag
+
+        # Realign to the latest grid slot and run now
+        self.skipped += behind
+        self._deadline += behind * self.interval
+        self.last_lag = now - self._deadline
+        return self.last_lag
+
+
+class PhaseTimer:
+    """
+    Accumulates wall time per named phase within a tick, plus running
+    totals and maxima across ticks.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter):
+        self.clock = clock
+        self.current: Dict[str, float] = {}
+        self.totals: Dict[str, float] = {}
+        self.maxima: Dict[str, float] = {}
+        self.ticks = 0
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time the enclosed block as part of phase name"""
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self.current[name] = self.current.get(name, 0.0) + self.clock() - start
+
+    def finish_tick(self) -> Dict[str, float]:
+        """Close the current tick; returns its per-phase durations in seconds"""
+        durations = self.current
+        for name, seconds in durations.items():
+            self.totals[name] = self.totals.get(name, 0.0) + seconds
+            self.maxima[name] = max(self.maxima.get(name, 0.0), seconds)
+        self.ticks += 1
+        self.current = {}
+        return durations
+
+    def summary(self) -> str:
+        """Average and maximum milliseconds per phase, e.g. for a periodic log line"""
+        if not self.ticks:
+            return "no ticks yet"
+        return ', '.join(
+            f"{name} avg {self.totals[name] / self.ticks * 1000:.1f}ms max {self.maxima[name] * 1000:.1f}ms"
+            for name in self.totals
+        )
+
+
+def format_durations(durations: Dict[str, float]) -> str:
+    """Per-phase durations as "fetch 1.20s, detect 0.00s, ..." """
+    return ', '.join(f"{name} {seconds:.2f}s" for name, seconds in durations.items())
@@ -0,0 +1,104 @@
+"""
+State Header - Reads and rewrites the position header of a state snapshot
+
+Snapshots start with the position fields (Position.to_header) and end with
+the price window, which can run to megabytes. Ops tools only need the
+position, so these helpers stop reading at the first price key instead of
+parsing the whole file, and import nothing heavier than json.
+"""
+import json
+import os
+import re
+from typing import Dict, Optional, Tuple
+
+from symbol_state import Position
+from tick_journal import RECORD, write_atomic
+
+
+STATE_FILE = "state.json"
+JOURNAL_FILE = "state.journal"
+
+# Start of the price window in any snapshot format; the position fields
+# (booleans, numbers, ISO timestamps, trade ids) never contain it
+_WINDOW_KEY = re.compile(rb',\s*"price_(ticks|buckets|history)"\s*:')
+
+# Bytes read per step while looking for the end of the header
+_CHUNK = 4096
+
+
+def state_paths(symbol: Optional[str] = None) -> Tuple[str, str]:
+    """
+    Snapshot and journal paths for a symbol
+
+    Single-symbol mode (symbol=None) keeps using state.json/state.journal;
+    each symbol in multi-symbol mode gets its own state_<SYMBOL>.* files.
+    """
+    if symbol is None:
+        return STATE_FILE, JOURNAL_FILE
+    return f"state_{symbol}.json", f"state_{symbol}.journal"
+
+
+def read_header(path: str) -> Dict:
+    """
+    Top-level fields of a snapshot that come before its price window
+
+    Raises:
+        IOError: If the file cannot be read
+        ValueError: If the header is not valid JSON
+    """
+    head = b''
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(_CHUNK)
+            head += chunk
+            # Search from just before the new chunk, in case the key straddles it
+            match = _WINDOW_KEY.search(head, max(0, len(head) - len(chunk) - 32))
+            if match:
+                return json.loads(head[:match.start()] + b'}')
+            if not chunk:
+                # No price window (or an unfamiliar layout): parse everything
+                data = json.loads(head)
+                if not isinstance(data, dict):
+                    raise ValueError("state snapshot is not a JSON object")
+                return data
+
+
+def read_position(symbol: Optional[str] = None) -> Optional[Position]:
+    """
+    Position saved in a symbol's snapshot, without loading its price window
+
+    Returns:
+        The Position, or None if there is no snapshot yet
+    """
+    state_file, _ = state_paths(symbol)
+    if not os.path.exists(state_file):
+        return None
+    return Position.from_header(read_header(state_file))
+
+
+def write_position(position: Position, symbol: Optional[str] = None) -> None:
+    """
+    Replace the position in a symbol's snapshot, keeping its price window
+
+    The window is copied byte for byte rather than parsed, and the journal
+    is left alone: its ticks still replay on top of the new snapshot.
+    """
+    state_file, _ = state_paths(symbol)
+    header = json.dumps(position.to_header()).encode()
+    rest = b'}'
+    if os.path.exists(state_file):
+        with open(state_file, 'rb') as f:
+            data = f.read()
+        match = _WINDOW_KEY.search(data)
+        if match:
+            rest = data[match.start():]
+    write_atomic(state_file, header[:-1] + rest)
+
+
+def journal_records(symbol: Optional[str] = None) -> int:
+    """Ticks journaled since the last snapshot, from the journal's size"""
+    _, journal_file = state_paths(symbol)
+    try:
+        return os.path.getsize(journal_file) // RECORD.size
+    except OSError:
+        return 0
@@ -3,85 +3,347 @@ State Manager - Handles persistence of application state
 """
 import json
 import os
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+import time
+from datetime import datetime
+from typing import Dict, Optional
 
+from indicators import INDICATOR_HORIZONS, IndicatorEngine, parse_horizons
+from metrics import SAVE_STATE_SECONDS
+from rolling_window import BucketedWindow, RollingWindow
+from state_header import state_paths
+from symbol_state import Position, SymbolState
+from tick_archive import ARCHIVE_ENABLED, TickArchive
+from tick_journal import TickJournal, write_atomic
+from trade_ledger import DEFAULT_STRATEGY, OpenTrade, TradeLedger
 
-STATE_FILE = "state.json"
 
+HISTORY_WINDOW_SECONDS = 6 * 60 * 60  # 6-hour rolling window
+# Fold ticks into OHLC buckets of this many seconds (0 keeps every raw tick);
+# bounds window memory and state.json size for 1-second or streaming ticks
+WINDOW_BUCKET_SECONDS = float(os.getenv('WINDOW_BUCKET_SECONDS', '0'))
 
-def load_state() -> Dict:
-    """Load state from JSON file, create default if missing"""
-    if os.path.exists(STATE_FILE):
+# Compact the journal into a fresh state.json snapshot after this many ticks
+SNAPSHOT_EVERY = int(os.getenv('STATE_SNAPSHOT_EVERY', '360'))
+
+# When state reaches the disk:
+#   always    fsync every save
+#   interval  fsync snapshots (so every position change) at once, and
+#             journaled ticks at most every STATE_FSYNC_INTERVAL seconds
+#   never     leave flushing to the OS; writes stay atomic but a power
+#             loss can lose recent saves
+STATE_FSYNC = os.getenv('STATE_FSYNC', 'interval').lower()
+STATE_FSYNC_INTERVAL = float(os.getenv('STATE_FSYNC_INTERVAL', '30'))
+
+# Position fields of the state.json header (see Position.to_header)
+POSITION_FIELDS = ('position_open', 'entry_price', 'entry_timestamp', 'trade_id')
+
+
+def new_window():
+    """Empty price window: bucketed if WINDOW_BUCKET_SECONDS is set, raw otherwise"""
+    if WINDOW_BUCKET_SECONDS > 0:
+        return BucketedWindow(HISTORY_WINDOW_SECONDS, WINDOW_BUCKET_SECONDS)
+    return RollingWindow(HISTORY_WINDOW_SECONDS)
+
+
+def window_from_snapshot(data: Dict):
+    """
+    Rebuild the price window from a state.json snapshot
+    
+    Reads any format (raw price_ticks, price_buckets, or the legacy ISO
+    price_history) into whichever window WINDOW_BUCKET_SECONDS selects, so
+    switching bucketing on or off keeps the saved history.
+    """
+    if 'price_buckets' in data:
+        buckets = data['price_buckets']
+        if WINDOW_BUCKET_SECONDS > 0:
+            return BucketedWindow.from_buckets(buckets, HISTORY_WINDOW_SECONDS, WINDOW_BUCKET_SECONDS)
+        window = RollingWindow(HISTORY_WINDOW_SECONDS)
+        saved = BucketedWindow.from_buckets(buckets, HISTORY_WINDOW_SECONDS, buckets['bucket_seconds'])
+        for ts, price in saved:
+            window.append(ts, price)
+        return window
+    if 'price_ticks' in data:
+        window = RollingWindow.from_ticks(data['price_ticks'], HISTORY_WINDOW_SECONDS)
+        if WINDOW_BUCKET_SECONDS > 0:
+            bucketed = BucketedWindow(HISTORY_WINDOW_SECONDS, WINDOW_BUCKET_SECONDS)
+            for ts, price in window:
+                bucketed.append(ts, price)
+            return bucketed
+        return window
+    history = data.get('price_history', [])
+    if WINDOW_BUCKET_SECONDS > 0:
+        return BucketedWindow.from_history(history, HISTORY_WINDOW_SECONDS, WINDOW_BUCKET_SECONDS)
+    return RollingWindow.from_history(history, HISTORY_WINDOW_SECONDS)
+
+
+def default_state(symbol: Optional[str] = None) -> SymbolState:
+    """Build a fresh state with no position and an empty window"""
+    return SymbolState(symbol, new_window())
+
+
+def load_state(symbol: Optional[str] = None, read_only: bool = False) -> SymbolState:
+    """
+    Load the state snapshot and replay the tick journal on top of it
+
+    Args:
+        symbol: Symbol to load, or None in single-symbol mode
+        read_only: Leave the files untouched (a torn journal record is
+            skipped rather than truncated); the state must not be saved
+    """
+    state_file, journal_file = state_paths(symbol)
+    state = default_state(symbol)
+    if os.path.exists(state_file):
         try:
-            with open(STATE_FILE, 'r') as f:
-                state = json.load(f)
-                # Ensure all required fields exist
-                if 'position_open' not in state:
-                    state['position_open'] = False
-                if 'entry_price' not in state:
-                    state['entry_price'] = None
-                if 'entry_timestamp' not in state:
-                    state['entry_timestamp'] = None
-                if 'price_history' not in state:
-                    state['price_history'] = []
-                return state
-        except (json.JSONDecodeError, IOError) as e:
+            with open(state_file, 'r') as f:
+                data = json.load(f)
+            # Missing position fields keep their defaults
+            state.position = Position.from_header(data)
+            state.window = window_from_snapshot(data)
+        except (json.JSONDecodeError, IOError, KeyError, ValueError) as e:
             print(f"Error loading state: {e}. Creating new state.")
+            state = default_state(symbol)
+    
+    window = state.window
+    journal = TickJournal(journal_file)
+    try:
+        for timestamp, price in journal.replay(truncate=not read_only):
+            journal.records += 1
+            # Ticks already folded into the snapshot can reappear if we
+            # crashed between writing the snapshot and truncating the journal
+            latest = window.latest()
+            if latest is None or timestamp > latest[0]:
+                window.append(timestamp, price)
+    except IOError as e:
+        print(f"Error replaying tick journal: {e}")
+    
+    journal.header = state.position.copy()
+    journal.synced = window.appended
+    journal.generation = window.generation
+    state.journal = journal
     
-    # Return default state
-    return {
-        "position_open": False,
-        "entry_price": None,
-        "entry_timestamp": None,
-        "price_history": []
-    }
+    # Long-horizon history of every tick, outside the state file
+    if ARCHIVE_ENABLED:
+        state.archive = TickArchive(symbol or 'BTC')
+    if INDICATOR_HORIZONS:
+        state.indicators = _warm_indicators(state)
+    return state
+
+
+def _warm_indicators(state: SymbolState) -> IndicatorEngine:
+    """
+    Build the multi-horizon indicators for a loaded state
+    
+    Horizons longer than the rolling window are filled from the tick
+    archive when there is one; the window supplies any newer ticks.
+    """
+    engine = IndicatorEngine(parse_horizons(INDICATOR_HORIZONS))
+    window = state.window
+    latest = window.latest()
+    archive = state.archive
+    if latest is not None and archive is not None:
+        try:
+            engine.extend(archive.iter_ticks(latest[0] - engine.longest, latest[0]))
+        except (IOError, ValueError) as e:
+            print(f"Error reading tick archive: {e}")
+            engine = IndicatorEngine(parse_horizons(INDICATOR_HORIZONS))
+    last = engine.latest()
+    engine.extend((ts, price) for ts, price in window if last is None or ts > last[0])
+    return engine
+
 
+def _write_snapshot(state: SymbolState) -> None:
+    """Write the full state snapshot atomically (and durably unless STATE_FSYNC=never)"""
+    state_file, _ = state_paths(state.symbol)
+    # Position first: state_header reads it without parsing the window
+    data = state.position.to_header()
+    window = state.window
+    # Columns as compact one-line lists: loading them needs no timestamp parsing
+    if isinstance(window, BucketedWindow):
+        data['price_buckets'] = window.to_buckets()
+    else:
+        data['price_ticks'] = window.to_ticks()
+    write_atomic(state_file, json.dumps(data).encode(), durable=STATE_FSYNC != 'never')
 
-def save_state(state: Dict) -> None:
-    """Save state to JSON file"""
+
+def save_state(state: SymbolState) -> None:
+    """
+    Persist state changes
+    
+    New ticks are appended to the binary journal. A compacted snapshot is
+    written instead when the position changed, the window was cleared, or
+    the journal has grown past SNAPSHOT_EVERY records. Snapshots replace
+    state.json atomically, so a crash leaves either the old or the new
+    file. How soon either reaches the disk is set by STATE_FSYNC.
+    
+    Saving with nothing new is cheap, so callers save once per tick after
+    all of the tick's changes rather than after each one.
+    """
+    window = state.window
+    journal = state.journal
+    if journal is None:
+        _, journal_file = state_paths(state.symbol)
+        journal = state.journal = TickJournal(journal_file)
+    
+    position = state.position
+    pending = window.appended - journal.synced
     try:
-        with open(STATE_FILE, 'w') as f:
-            json.dump(state, f, indent=2)
+        with SAVE_STATE_SECONDS.time():
+            # A bucketed window only keeps its newest raw ticks; if the
+            # unjournaled ones are gone, only a snapshot can capture them
+            unsaved = window.tail(pending)
+            if (position != journal.header
+                    or window.generation != journal.generation
+                    or journal.records + pending > SNAPSHOT_EVERY
+                    or len(unsaved) < pending):
+                _write_snapshot(state)
+                journal.reset()
+                journal.header = position.copy()
+                journal.fsynced_at = time.monotonic()
+            elif pending:
+                for timestamp, price in unsaved:
+                    journal.append(timestamp, price)
+                now = time.monotonic()
+                durable = STATE_FSYNC == 'always' or (
+                    STATE_FSYNC == 'interval' and now - journal.fsynced_at >= STATE_FSYNC_INTERVAL
+                )
+                journal.flush(durable)
+                if durable:
+                    journal.fsynced_at = now
+        journal.synced = window.appended
+        journal.generation = window.generation
     except IOError as e:
         print(f"Error saving state: {e}")
 
 
-def add_price_to_history(price: float, timestamp: datetime, state: Dict) -> None:
-    """Add price to history and remove entries older than 6 hours"""
-    # Add new price entry
-    state['price_history'].append({
-        "timestamp": timestamp.isoformat(),
-        "price": price
-    })
+def close_state(state: SymbolState) -> None:
+    """Save any pending changes, make them durable and close the state's files"""
+    save_state(state)
+    journal = state.journal
+    if journal is not None:
+        try:
+            journal.flush(durable=STATE_FSYNC != 'never')
+        except IOError as e:
+            print(f"Error flushing tick journal: {e}")
+        journal.close()
+    if state.archive is not None:
+        state.archive.close()
+
+
+def release_state(state: SymbolState) -> None:
+    """
+    Stop writing a state another worker owns
     
-    # Remove entries older than 6 hours
-    cutoff_time = timestamp - timedelta(hours=6)
-    state['price_history'] = [
-        entry for entry in state['price_history']
-        if datetime.fromisoformat(entry['timestamp']) >= cutoff_time
-    ]
+    Closes the state's files without saving. If this worker takes the
+    symbol over later, its first save writes a full snapshot instead of
+    appending to a journal that belongs to another worker's snapshot.
+    """
+    journal = state.journal
+    if journal is not None:
+        journal.close()
+        journal.header = None
+    if state.archive is not None:
+        state.archive.close()
 
 
-def get_6hr_low(state: Dict) -> Optional[float]:
-    """Get the lowest price in the last 6 hours"""
-    if not state['price_history']:
-        return None
+def add_price_to_history(price: float, timestamp: datetime, state: SymbolState) -> None:
+    """
+    Add price to the rolling window; entries older than 6 hours expire
     
-    prices = [entry['price'] for entry in state['price_history']]
-    return min(prices)
+    The tick is also fed to the state's indicators and appended to its
+    tick archive, if it has them. Both only take ticks newer than the last
+    one they hold: after a full reset, or a crash that lost journal records
+    the archive already had, a backfill replays ticks they must not see
+    again or out of order.
+    """
+    ts = timestamp.timestamp()
+    state.window.append(ts, price)
+    indicators = state.indicators
+    if indicators is not None:
+        latest = indicators.latest()
+        if latest is None or ts > latest[0]:
+            indicators.append(ts, price)
+    archive = state.archive
+    if archive is not None:
+        try:
+            # Drops the tick itself if it is not newer than the archive's last
+            archive.append(ts, price)
+        except IOError as e:
+            print(f"Error archiving tick: {e}")
+
 
+def get_6hr_low(state: SymbolState) -> Optional[float]:
+    """Get the lowest price in the last 6 hours"""
+    return state.window.min()
+
+
+def get_6hr_high(state: SymbolState) -> Optional[float]:
+    """Get the highest price in the last 6 hours"""
+    return state.window.max()
+
+
+def open_position(entry_price: float, state: SymbolState) -> None:
+    """Open a position with the given entry price, recording it in the trade ledger"""
+    entry_time = datetime.now().isoformat()
+    state.position.open(entry_price, entry_time)
+    ledger = state.ledger
+    if ledger is not None:
+        try:
+            state.position.trade_id = ledger.open(state.symbol or 'BTC', entry_price, entry_time).position_id
+        except IOError as e:
+            print(f"Error recording trade: {e}")
+
+
+def ledger_trade(ledger: TradeLedger, symbol: str, position: Position) -> Optional[OpenTrade]:
+    """
+    The open ledger trade that records a position
 
-def open_position(entry_price: float, state: Dict) -> None:
-    """Open a position with the given entry price"""
-    state['position_open'] = True
-    state['entry_price'] = entry_price
-    state['entry_timestamp'] = datetime.now().isoformat()
+    Matched by the trade id stored on the position, or by entry time for
+    positions saved before trade ids were, so a position never closes a
+    trade of another strategy or of the other BTC state (single-symbol
+    and multi-symbol mode share the 'BTC' ledger symbol).
 
+    Returns:
+        The OpenTrade, or None if the ledger has no open trade for it
+    """
+    for trade in ledger.open_positions(symbol):
+        if position.trade_id is not None:
+            if trade.position_id == position.trade_id:
+                return trade
+        elif trade.strategy == DEFAULT_STRATEGY and trade.entry_time == position.entry_timestamp:
+            return trade
+    return None
 
-def close_position(state: Dict) -> None:
-    """Close the current position"""
-    state['position_open'] = False
-    state['entry_price'] = None
-    state['entry_timestamp'] = None
 
+def close_position(
+    state: SymbolState,
+    exit_price: Optional[float] = None,
+    exit_type: str = 'RESET'
+) -> Optional[float]:
+    """
+    Close the current position, recording the exit in the trade ledger
+    
+    Args:
+        state: State whose position to close
+        exit_price: Price the position closed at; None for a manual reset
+        exit_type: "TP", "SL", "RESET" or "UNDELIVERED"
+        
+    Returns:
+        Short return of the closed position in percent, if it was recorded
+    """
+    position = state.position
+    ledger = state.ledger
+    pnl_pct = None
+    if ledger is not None and position.is_open:
+        symbol = state.symbol or 'BTC'
+        exit_time = datetime.now().isoformat()
+        try:
+            trade = ledger_trade(ledger, symbol, position)
+            if trade is None:
+                # Opened where the ledger was not kept (e.g. by another
+                # worker without a shared ledger): record the entry first
+                trade = ledger.open(symbol, position.entry_price, position.entry_timestamp)
+            pnl_pct = ledger.close(trade, exit_price, exit_time, exit_type)
+        except IOError as e:
+            print(f"Error recording trade: {e}")
+    position.close()
+    return pnl_pct
@@ -0,0 +1,224 @@
+"""
+Parameter Sweep - Evaluates many entry/TP/SL/window combinations in parallel
+
+Usage:
+    python sweep.py ticks.csv --entry-spike 1:5:0.5 --take-profit 1,2,2.5,3 --stop-loss 1:4:1
+    python sweep.py ticks.bin --random 2000 --entry-spike 0.5:6 --window-hours 1:24 --top 20
+
+Each parameter takes a comma list (1,2,3) or a range start:stop[:step]. With
+--random N, N combinations are drawn uniformly from each range instead of
+taking the full grid. The tick series is written once to a binary file and
+memory-mapped by every worker, so it is never pickled per task.
+"""
+import argparse
+import csv
+import itertools
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from backtest import iter_csv_ticks, run_backtest_chunks
+from detection_engine import ENTRY_SPIKE_PCT, TAKE_PROFIT_PCT, STOP_LOSS_PCT
+from state_manager import HISTORY_WINDOW_SECONDS
+from tick_journal import RECORD
+
+
+PARAMETERS = ('entry_spike_pct', 'take_profit_pct', 'stop_loss_pct', 'window_hours')
+# Ticks handed to the backtest per chunk
+CHUNK_TICKS = 1 << 16
+
+# Per-worker memory map of the tick series, set by _init_worker
+_ticks: Optional[np.ndarray] = None
+
+
+def load_tick_file(path: str) -> np.ndarray:
+    """
+    Memory-map a binary tick file as an (n, 2) array of timestamp, price
+
+    A torn last record (as a crash can leave in a journal) is left out.
+    """
+    count = os.path.getsize(path) // RECORD.size
+    if count == 0:
+        return np.empty((0, 2))
+    return np.memmap(path, dtype='<f8', mode='r', shape=(count, 2))
+
+
+def write_tick_file(ticks: Iterator[Tuple[float, float]], path: str) -> int:
+    """Write ticks in the binary journal record format; returns the tick count"""
+    count = 0
+    with open(path, 'wb') as f:
+        for ts, price in ticks:
+            f.write(RECORD.pack(ts, price))
+            count += 1
+    return count
+
+
+def iter_mapped_chunks(ticks: np.ndarray) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """Stream (timestamps, prices) views of a mapped array, one chunk at a time"""
+    for start in range(0, len(ticks), CHUNK_TICKS):
+        chunk = ticks[start:start + CHUNK_TICKS]
+        yield chunk[:, 0], chunk[:, 1]
+
+
+def _init_worker(path: str) -> None:
+    global _ticks
+    _ticks = load_tick_file(path)
+
+
+def _evaluate(params: Dict) -> Dict:
+    report = run_backtest_chunks(
+        iter_mapped_chunks(_ticks),
+        entry_spike_pct=params['entry_spike_pct'],
+        take_profit_pct=params['take_profit_pct'],
+        stop_loss_pct=params['stop_loss_pct'],
+        window_seconds=params['window_hours'] * 3600,
+        keep_trades=False
+    )
+    trades = report['trades']
+    return {
+        **params,
+        'trades': trades,
+        'hit_rate': report['wins'] / trades * 100 if trades else 0.0,
+        'pnl_pct': report['pnl_pct'],
+        'avg_pnl_pct': report['pnl_pct'] / trades if trades else 0.0,
+    }
+
+
+def parse_values(spec: str) -> List[float]:
+    """Values for a grid axis from "a,b,c" or "start:stop[:step]" (stop inclusive)"""
+    if ':' not in spec:
+        return [float(value) for value in spec.split(',')]
+    parts = [float(part) for part in spec.split(':')]
+    start, stop = parts[0], parts[1]
+    step = parts[2] if len(parts) > 2 else (stop - start) / 4 or 1
+    count = int(round((stop - start) / step)) + 1
+    return [round(start + i * step, 10) for i in range(count)]
+
+
+def parse_range(spec: str) -> Tuple[float, float]:
+    """Bounds for random sampling from "start:stop[:step]" or "a,b,..." (min/max)"""
+    values = parse_values(spec)
+    return min(values), max(values)
+
+
+def build_grid(specs: Dict[str, str], samples: Optional[int] = None, seed: int = 0) -> List[Dict]:
+    """
+    Parameter combinations to evaluate
+
+    Args:
+        specs: Dict of parameter name -> value spec
+        samples: Draw this many random combinations instead of the full grid
+        seed: Random seed for sampling
+
+    Returns:
+        List of parameter dicts
+    """
+    if samples:
+        rng = random.Random(seed)
+        bounds = {name: parse_range(spec) for name, spec in specs.items()}
+        return [
+            {name: round(rng.uniform(low, high), 4) for name, (low, high) in bounds.items()}
+            for _ in range(samples)
+        ]
+    axes = {name: parse_values(spec) for name, spec in specs.items()}
+    return [dict(zip(axes, values)) for values in itertools.product(*axes.values())]
+
+
+def run_sweep(tick_path: str, grid: List[Dict], workers: Optional[int] = None) -> List[Dict]:
+    """
+    Evaluate every parameter combination against a binary tick file
+
+    Args:
+        tick_path: Binary tick file (journal record format)
+        grid: Parameter dicts from build_grid
+        workers: Process count (default: all cores)
+
+    Returns:
+        One result dict per combination, in grid order
+    """
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(grid) // (workers * 8))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(tick_path,)) as pool:
+        return list(pool.map(_evaluate, grid, chunksize=chunksize))
+
+
+def format_table(results: List[Dict], rank_by: str, top: int) -> str:
+    """Ranked results as a fixed-width table"""
+    ranked = sorted(results, key=lambda row: row[rank_by], reverse=True)[:top]
+    header = f"{'#':>4} {'entry%':>8} {'tp%':>7} {'sl%':>7} {'window_h':>9} {'trades':>7} {'hit%':>7} {'pnl%':>9}"
+    lines = [header, '-' * len(header)]
+    for rank, row in enumerate(ranked, 1):
+        lines.append(
+            f"{rank:>4} {row['entry_spike_pct']:>8.3f} {row['take_profit_pct']:>7.3f} "
+            f"{row['stop_loss_pct']:>7.3f} {row['window_hours']:>9.2f} {row['trades']:>7} "
+            f"{row['hit_rate']:>7.1f} {row['pnl_pct']:>+9.2f}"
+        )
+    return '\n'.join(lines)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Parallel parameter sweep over historical ticks")
+    parser.add_argument('path', help="Tick/OHLC CSV file or binary tick file")
+    parser.add_argument('--format', choices=('csv', 'binary'),
+                        help="Input format (default: by file extension)")
+    parser.add_argument('--entry-spike', default=str(ENTRY_SPIKE_PCT), help="Entry spike %% values")
+    parser.add_argument('--take-profit', default=str(TAKE_PROFIT_PCT), help="Take profit %% values")
+    parser.add_argument('--stop-loss', default=str(STOP_LOSS_PCT), help="Stop loss %% values")
+    parser.add_argument('--window-hours', default=str(HISTORY_WINDOW_SECONDS / 3600),
+                        help="Rolling window values, in hours")
+    parser.add_argument('--random', type=int, help="Sample this many random combinations")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed for --random")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: all cores)")
+    parser.add_argument('--rank-by', default='pnl_pct', choices=('pnl_pct', 'hit_rate', 'avg_pnl_pct', 'trades'))
+    parser.add_argument('--top', type=int, default=25, help="Rows to print")
+    parser.add_argument('--output', help="Write all results to this CSV file")
+    args = parser.parse_args(argv)
+
+    grid = build_grid({
+        'entry_spike_pct': args.entry_spike,
+        'take_profit_pct': args.take_profit,
+        'stop_loss_pct': args.stop_loss,
+        'window_hours': args.window_hours,
+    }, samples=args.random, seed=args.seed)
+
+    fmt = args.format or ('csv' if args.path.lower().endswith('.csv') else 'binary')
+    tmp_path = None
+    tick_path = args.path
+    if fmt == 'csv':
+        # Convert once so workers can share the series through the page cache
+        fd, tmp_path = tempfile.mkstemp(suffix='.ticks')
+        os.close(fd)
+        count = write_tick_file(iter_csv_ticks(args.path), tmp_path)
+        tick_path = tmp_path
+        print(f"Converted {count:,} ticks to {tmp_path}")
+
+    try:
+        ticks = len(load_tick_file(tick_path))
+        print(f"Evaluating {len(grid):,} combinations over {ticks:,} ticks...")
+        start = time.perf_counter()
+        results = run_sweep(tick_path, grid, args.workers)
+        elapsed = time.perf_counter() - start
+    finally:
+        if tmp_path:
+            os.remove(tmp_path)
+
+    print(format_table(results, args.rank_by, args.top))
+    print(f"\n{len(grid):,} combinations in {elapsed:.1f}s "
+          f"({len(grid) * ticks / elapsed:,.0f} ticks/s across workers)")
+
+    if args.output:
+        with open(args.output, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(PARAMETERS) + ['trades', 'hit_rate', 'pnl_pct', 'avg_pnl_pct'])
+            writer.writeheader()
+            writer.writerows(sorted(results, key=lambda row: row[args.rank_by], reverse=True))
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
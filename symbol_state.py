@@ -0,0 +1,94 @@
+"""
+Symbol State - Typed, slotted state of one watched symbol
+"""
+from typing import Dict, Optional
+
+
+class Position:
+    """Short position of one symbol; its fields map onto the state.json header"""
+
+    __slots__ = ('is_open', 'entry_price', 'entry_timestamp', 'trade_id')
+
+    def __init__(
+        self,
+        is_open: bool = False,
+        entry_price: Optional[float] = None,
+        entry_timestamp: Optional[str] = None,
+        trade_id: Optional[str] = None
+    ):
+        self.is_open = is_open
+        self.entry_price = entry_price
+        self.entry_timestamp = entry_timestamp   # ISO-8601, as stored in state.json
+        self.trade_id = trade_id                 # Trade ledger position id, if recorded
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Position):
+            return NotImplemented
+        return (self.is_open, self.entry_price, self.entry_timestamp, self.trade_id) == (
+            other.is_open, other.entry_price, other.entry_timestamp, other.trade_id
+        )
+
+    def __repr__(self) -> str:
+        if not self.is_open:
+            return "Position(closed)"
+        return f"Position(open at {self.entry_price} since {self.entry_timestamp})"
+
+    def copy(self) -> "Position":
+        return Position(self.is_open, self.entry_price, self.entry_timestamp, self.trade_id)
+
+    def open(self, entry_price: float, entry_timestamp: str, trade_id: Optional[str] = None) -> None:
+        self.is_open = True
+        self.entry_price = entry_price
+        self.entry_timestamp = entry_timestamp
+        self.trade_id = trade_id
+
+    def close(self) -> None:
+        self.is_open = False
+        self.entry_price = None
+        self.entry_timestamp = None
+        self.trade_id = None
+
+    def to_header(self) -> Dict:
+        """Position fields under their state.json names"""
+        return {
+            'position_open': self.is_open,
+            'entry_price': self.entry_price,
+            'entry_timestamp': self.entry_timestamp,
+            'trade_id': self.trade_id,
+        }
+
+    @classmethod
+    def from_header(cls, data: Dict) -> "Position":
+        """Position from state.json fields; missing fields keep their defaults"""
+        return cls(
+            bool(data.get('position_open', False)),
+            data.get('entry_price'),
+            data.get('entry_timestamp'),
+            data.get('trade_id')
+        )
+
+
+class SymbolState:
+    """
+    Everything the monitor keeps for one symbol.
+
+    Attributes:
+        symbol: Symbol name, or None in single-symbol mode
+        position: Current Position
+        window: RollingWindow or BucketedWindow of recent prices
+        journal: TickJournal of ticks since the last snapshot (set by load_state)
+        archive: TickArchive of every tick, if archiving is enabled
+        indicators: IndicatorEngine, if indicator horizons are configured
+        ledger: TradeLedger that records this symbol's trades, if any
+    """
+
+    __slots__ = ('symbol', 'position', 'window', 'journal', 'archive', 'indicators', 'ledger')
+
+    def __init__(self, symbol: Optional[str], window, position: Optional[Position] = None):
+        self.symbol = symbol
+        self.position = position if position is not None else Position()
+        self.window = window
+        self.journal = None
+        self.archive = None
+        self.indicators = None
+        self.ledger = None
@@ -0,0 +1,164 @@
+"""
+Shared fixtures: the flat modules on sys.path, and local stand-in servers
+"""
+import asyncio
+import email
+import os
+import socket
+import sys
+import threading
+import time
+from email import policy
+
+import pytest
+from aiohttp import web
+from aiosmtpd.controller import Controller
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import email_service  # noqa: E402
+import rate_limit  # noqa: E402
+
+
+# Recipient the local SMTP server refuses
+REFUSED = 'refused@example.com'
+
+
+def free_port() -> int:
+    """A TCP port nothing is listening on right now"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class LocalServer:
+    """
+    aiohttp application served from a background thread.
+
+    Works for both synchronous clients (requests, the fetch threads) and
+    asyncio clients running their own loop.
+    """
+
+    def __init__(self, app: web.Application, port: int = 0):
+        self.app = app
+        self.port = port or free_port()
+        self.loop = asyncio.new_event_loop()
+        self._runner = None
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self) -> "LocalServer":
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self.loop).result(5)
+        return self
+
+    async def _start(self) -> None:
+        self._runner = web.AppRunner(self.app, shutdown_timeout=0.1)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, '127.0.0.1', self.port).start()
+
+    def stop(self) -> None:
+        if self._runner is not None:
+            asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self.loop).result(5)
+            self._runner = None
+
+    def close(self) -> None:
+        self.stop()
+        # Handlers still sleeping for a client that gave up
+        asyncio.run_coroutine_threadsafe(self._cancel_handlers(), self.loop).result(5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(5)
+        self.loop.close()
+
+    async def _cancel_handlers(self) -> None:
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+@pytest.fixture
+def serve():
+    """Start an aiohttp application locally; returns the LocalServer"""
+    servers = []
+
+    def start(app: web.Application, port: int = 0) -> LocalServer:
+        server = LocalServer(app, port).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+class Mailbox:
+    """aiosmtpd handler recording sessions, recipients and delivered messages"""
+
+    def __init__(self):
+        self.sessions = []
+        self.rcpts = []
+        self.messages = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        self.rcpts.append(address)
+        if address == REFUSED:
+            return '550 No such user'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        if not any(known is session for known in self.sessions):
+            self.sessions.append(session)
+        self.messages.append(email.message_from_bytes(envelope.content, policy=policy.default))
+        return '250 Message accepted'
+
+    def subjects(self):
+        return [str(message['Subject']) for message in self.messages]
+
+
+class SMTPServer:
+    """A restartable aiosmtpd server on a fixed local port"""
+
+    def __init__(self):
+        self.port = free_port()
+        self.mailbox = Mailbox()
+        self.controller = None
+
+    def start(self) -> None:
+        self.controller = Controller(self.mailbox, hostname='127.0.0.1', port=self.port)
+        self.controller.start()
+
+    def stop(self) -> None:
+        if self.controller is not None:
+            self.controller.stop()
+            self.controller = None
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    """Local SMTP server that email_service sends to"""
+    server = SMTPServer()
+    server.start()
+    monkeypatch.setattr(email_service, 'SMTP_CONFIGS', [
+        {'host': '127.0.0.1', 'port': server.port, 'use_tls': False, 'use_ssl': False}
+    ])
+    yield server
+    server.stop()
+
+
+def wait_for(condition, timeout: float = 5) -> None:
+    """Poll until condition() is true; fail after timeout seconds"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+@pytest.fixture(autouse=True)
+def unlimited_rate_budgets(monkeypatch):
+    """Tests make far more requests than the live per-minute budgets allow"""
+    monkeypatch.setattr(rate_limit, 'RATE_BUDGETS', {})
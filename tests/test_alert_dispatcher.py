@@ -0,0 +1,119 @@
+"""
+SMTP session reuse, reconnects and background delivery against a local aiosmtpd server
+"""
+import smtplib
+import time
+
+import pytest
+
+from alert_dispatcher import AlertDispatcher
+from conftest import REFUSED, wait_for
+from email_service import SMTPConnection, build_message
+
+
+def message(subject: str, recipients=('a@example.com',)) -> bytes:
+    return build_message('alerts@example.com', list(recipients), subject, f"<p>{subject}</p>", subject)
+
+
+def test_connection_is_reused_across_messages(smtp):
+    connection = SMTPConnection('alerts@example.com', 'secret')
+    try:
+        for i in range(3):
+            connection.send(['a@example.com'], message(f"alert {i}"))
+    finally:
+        connection.close()
+
+    assert smtp.mailbox.subjects() == ['alert 0', 'alert 1', 'alert 2']
+    assert len(smtp.mailbox.sessions) == 1
+    body = smtp.mailbox.messages[0]
+    assert body.get_body(('plain',)).get_content() == 'alert 0'
+    assert body.get_body(('html',)).get_content() == '<p>alert 0</p>'
+
+
+def test_dropped_session_is_reconnected(smtp):
+    connection = SMTPConnection('alerts@example.com', 'secret')
+    try:
+        connection.send(['a@example.com'], message('before'))
+        smtp.stop()
+        smtp.start()
+        connection.send(['a@example.com'], message('after'))
+    finally:
+        connection.close()
+
+    assert smtp.mailbox.subjects() == ['before', 'after']
+    assert len(smtp.mailbox.sessions) == 2
+
+
+def test_keepalive_reconnects_stale_session(smtp):
+    connection = SMTPConnection('alerts@example.com', 'secret')
+    try:
+        connection.send(['a@example.com'], message('first'))
+        stale = connection._server
+        smtp.stop()
+        smtp.start()
+        connection.keepalive()
+        assert connection._server is not stale
+        connection.send(['a@example.com'], message('second'))
+    finally:
+        connection.close()
+    assert smtp.mailbox.subjects() == ['first', 'second']
+
+
+def test_refused_recipient_is_not_resent(smtp):
+    connection = SMTPConnection('alerts@example.com', 'secret')
+    try:
+        with pytest.raises(smtplib.SMTPRecipientsRefused):
+            connection.send([REFUSED], message('nope', [REFUSED]))
+    finally:
+        connection.close()
+    assert smtp.mailbox.rcpts == [REFUSED]
+
+
+def test_dispatcher_delivers_in_background_over_one_session(smtp):
+    dispatcher = AlertDispatcher('alerts@example.com', 'secret', digest_seconds=0, rate_limit=0)
+    dispatcher.start()
+    try:
+        start = time.monotonic()
+        for i in range(3):
+            assert dispatcher.submit(['a@example.com'], f"exit {i}", '<p>x</p>', {'n': i}, critical=True, text='x')
+        assert time.monotonic() - start < 0.05   # submit() never waits on the server
+        wait_for(lambda: len(smtp.mailbox.messages) == 3)
+    finally:
+        dispatcher.stop()
+
+    reports = dispatcher.poll_results()
+    assert sorted(report['context']['n'] for report in reports) == [0, 1, 2]
+    assert all(report['sent'] for report in reports)
+    assert len(smtp.mailbox.sessions) == 1
+
+
+def test_dispatcher_reconnects_after_server_restart(smtp):
+    dispatcher = AlertDispatcher('alerts@example.com', 'secret', digest_seconds=0, rate_limit=0)
+    dispatcher.start()
+    try:
+        dispatcher.submit(['a@example.com'], 'one', '<p>1</p>', critical=True)
+        wait_for(lambda: len(smtp.mailbox.messages) == 1)
+        smtp.stop()
+        smtp.start()
+        dispatcher.submit(['a@example.com'], 'two', '<p>2</p>', critical=True)
+        wait_for(lambda: len(smtp.mailbox.messages) == 2)
+    finally:
+        dispatcher.stop()
+    assert [report['sent'] for report in dispatcher.poll_results()] == [True, True]
+
+
+def test_dispatcher_reports_refusal_without_retrying(smtp):
+    dispatcher = AlertDispatcher('alerts@example.com', 'secret', digest_seconds=0, rate_limit=0)
+    dispatcher.start()
+    try:
+        dispatcher.submit([REFUSED], 'refused', '<p>x</p>', {'n': 1}, critical=True)
+    finally:
+        dispatcher.stop()
+    assert dispatcher.poll_results() == [{'context': {'n': 1}, 'sent': False}]
+    assert smtp.mailbox.rcpts == [REFUSED]
+
+
+def test_full_queue_rejects_alerts(smtp):
+    dispatcher = AlertDispatcher('alerts@example.com', 'secret', max_queue=1)
+    assert dispatcher.submit(['a@example.com'], 'one', '<p>1</p>')
+    assert not dispatcher.submit(['a@example.com'], 'two', '<p>2</p>')
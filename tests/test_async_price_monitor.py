@@ -0,0 +1,136 @@
+"""
+Hedged async fetching against a local stand-in for CoinGecko and Binance
+"""
+import asyncio
+import time
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+import async_price_monitor
+from async_price_monitor import AsyncPriceFetcher, fetch_prices_hedged
+
+
+SYMBOLS = {'BTC': ('bitcoin', 'BTCUSDT'), 'ETH': ('ethereum', 'ETHUSDT')}
+
+
+class MockProviders:
+    """Both provider APIs on one server, each with its own latency and failure switch"""
+
+    def __init__(self):
+        self.latency = {'coingecko': 0.0, 'binance': 0.0}
+        self.fail = {'coingecko': False, 'binance': False}
+        self.requests = []   # (provider, time.monotonic())
+        self.app = web.Application()
+        self.app.router.add_get('/coingecko/simple/price', self.coingecko)
+        self.app.router.add_get('/binance/ticker/price', self.binance)
+
+    async def _respond(self, provider: str, body) -> web.Response:
+        self.requests.append((provider, time.monotonic()))
+        await asyncio.sleep(self.latency[provider])
+        if self.fail[provider]:
+            return web.json_response({'error': 'down'}, status=500)
+        return web.json_response(body)
+
+    async def coingecko(self, request: web.Request) -> web.Response:
+        return await self._respond('coingecko', {'bitcoin': {'usd': 60000.0}, 'ethereum': {'usd': 3000.0}})
+
+    async def binance(self, request: web.Request) -> web.Response:
+        return await self._respond('binance', [
+            {'symbol': 'BTCUSDT', 'price': '60001.00'}, {'symbol': 'ETHUSDT', 'price': '3001.00'},
+        ])
+
+    def called(self, provider: str) -> bool:
+        return any(name == provider for name, _ in self.requests)
+
+
+@pytest.fixture
+def providers(serve, monkeypatch):
+    mock = MockProviders()
+    server = serve(mock.app)
+    monkeypatch.setattr(async_price_monitor, 'COINGECKO_API_URL', f"{server.url}/coingecko")
+    monkeypatch.setattr(async_price_monitor, 'BINANCE_API_URL', f"{server.url}/binance")
+    return mock
+
+
+@pytest.fixture
+def cancelled(monkeypatch):
+    """Names of provider calls that were cancelled mid-request"""
+    names = []
+
+    def tracked(provider):
+        async def fetch(session, symbols):
+            try:
+                return await provider(session, symbols)
+            except asyncio.CancelledError:
+                names.append(provider.__name__)
+                raise
+        return fetch
+
+    monkeypatch.setattr(async_price_monitor, 'PROVIDERS',
+                        tuple(tracked(provider) for provider in async_price_monitor.PROVIDERS))
+    return names
+
+
+def hedged(hedge_delay: float):
+    async def run():
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=3)) as session:
+            start = time.monotonic()
+            quotes = await fetch_prices_hedged(session, SYMBOLS, hedge_delay)
+            return quotes, time.monotonic() - start
+    return asyncio.run(run())
+
+
+def test_fast_primary_is_not_hedged(providers):
+    quotes, _ = hedged(0.2)
+    assert quotes['BTC']['price'] == 60000.0
+    assert not providers.called('binance')
+
+
+def test_hedge_fires_after_delay(providers, cancelled):
+    providers.latency['coingecko'] = 1.0
+    quotes, elapsed = hedged(0.2)
+
+    assert quotes['BTC']['price'] == 60001.0
+    started = dict(providers.requests)
+    assert started['binance'] - started['coingecko'] >= 0.2
+    assert elapsed < 0.8
+    # The slow primary lost the race and was cancelled
+    assert cancelled == ['fetch_prices_coingecko_async']
+
+
+def test_first_success_wins_and_losers_are_cancelled(providers, cancelled):
+    providers.latency.update(coingecko=1.0, binance=0.05)
+    quotes, elapsed = hedged(0)   # Fire both at once
+
+    assert quotes['ETH']['price'] == 3001.0
+    assert providers.called('coingecko') and providers.called('binance')
+    assert elapsed < 0.5
+    assert cancelled == ['fetch_prices_coingecko_async']
+
+
+def test_failed_primary_falls_through_without_waiting(providers):
+    providers.fail['coingecko'] = True
+    quotes, elapsed = hedged(1.0)
+
+    assert quotes['BTC']['price'] == 60001.0
+    assert elapsed < 0.5
+
+
+def test_all_providers_failing_returns_no_quote(providers):
+    providers.fail.update(coingecko=True, binance=True)
+    quotes, _ = hedged(0.05)
+
+    assert quotes.get('BTC') is None and quotes.get('ETH') is None
+
+
+def test_fetcher_reuses_its_session(providers):
+    fetcher = AsyncPriceFetcher(SYMBOLS, hedge_delay=0.2)
+    try:
+        assert fetcher.fetch()['BTC']['price'] == 60000.0
+        session = fetcher._session
+        assert fetcher.fetch({'ETH': SYMBOLS['ETH']})['ETH']['price'] == 3000.0
+        assert fetcher._session is session
+    finally:
+        fetcher.close()
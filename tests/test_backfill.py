@@ -0,0 +1,153 @@
+"""
+Startup backfill against a local stand-in for the Binance klines endpoint
+"""
+from datetime import datetime
+
+import pytest
+from aiohttp import web
+
+import backfill
+import price_monitor
+from backfill import backfill_state
+from indicators import IndicatorEngine
+from price_monitor import fetch_klines
+from state_manager import HISTORY_WINDOW_SECONDS, add_price_to_history, default_state
+from tick_archive import NS_PER_SECOND, TickArchive
+
+
+NOW = 1_704_110_400.0   # 2024-01-01 12:00 UTC, on a minute boundary
+MINUTE = 60.0
+
+
+def close_price(close_time: float) -> float:
+    return 60000.0 + (close_time - NOW) / MINUTE
+
+
+class MockKlines:
+    """1m klines for any range: close = 60000 + minutes relative to NOW"""
+
+    def __init__(self):
+        self.requests = []
+        self.app = web.Application()
+        self.app.router.add_get('/binance/klines', self.klines)
+
+    async def klines(self, request: web.Request) -> web.Response:
+        query = request.query
+        self.requests.append(dict(query))
+        step = 60_000
+        first = -(-int(query['startTime']) // step) * step
+        candles = []
+        for open_ms in range(first, int(query['endTime']) + 1, step)[:int(query['limit'])]:
+            close = close_price((open_ms + step) / 1000)
+            # [open time, open, high, low, close, volume, close time (inclusive), ...]
+            candles.append([open_ms, str(close), str(close), str(close), str(close), '1', open_ms + step - 1])
+        return web.json_response(candles)
+
+
+@pytest.fixture
+def klines(serve, monkeypatch):
+    mock = MockKlines()
+    monkeypatch.setattr(price_monitor, 'BINANCE_API_URL', f"{serve(mock.app).url}/binance")
+    return mock
+
+
+@pytest.fixture
+def btc(tmp_path):
+    state = default_state()
+    state.indicators = IndicatorEngine({'1h': 3600.0})
+    state.archive = TickArchive('BTC', root=str(tmp_path))
+    yield state
+    state.archive.close()
+
+
+def feed(state, ticks) -> None:
+    for ts, price in ticks:
+        add_price_to_history(price, datetime.fromtimestamp(ts), state)
+
+
+def test_klines_are_parsed_as_closes(klines):
+    ticks = fetch_klines('BTCUSDT', NOW - 5 * MINUTE, NOW + 30, '1m', 10)
+
+    # Close times are the candle's end; the candle still open at NOW + 30 is left out
+    assert ticks == [(NOW - m * MINUTE, close_price(NOW - m * MINUTE)) for m in (4, 3, 2, 1, 0)]
+    [query] = klines.requests
+    assert (query['symbol'], query['interval'], query['limit']) == ('BTCUSDT', '1m', '10')
+    assert int(query['startTime']) == (NOW - 5 * MINUTE) * 1000
+
+
+def test_gap_since_the_newest_tick_is_requested(klines, btc):
+    feed(btc, [(NOW - 10 * MINUTE, 1.0)])
+
+    assert backfill_state(btc, 'BTCUSDT', now=NOW) == 10
+    [query] = klines.requests
+    # One candle early, so the candle closing right after the newest tick is included
+    assert int(query['startTime']) == (NOW - 11 * MINUTE) * 1000
+    assert int(query['limit']) == 12
+    assert btc.window.latest() == (NOW, close_price(NOW))
+
+
+def test_empty_window_backfills_the_whole_history_window(klines, btc):
+    assert backfill_state(btc, 'BTCUSDT', now=NOW) == 361
+    [query] = klines.requests
+    assert int(query['startTime']) == (NOW - HISTORY_WINDOW_SECONDS - MINUTE) * 1000
+    assert btc.window.oldest()[0] == NOW - HISTORY_WINDOW_SECONDS
+
+
+def test_long_gap_is_paged_up_to_now(klines, btc, monkeypatch):
+    # A 24h window needs 1,442 one-minute candles: more than one request returns
+    monkeypatch.setattr(backfill, 'HISTORY_WINDOW_SECONDS', 86400)
+
+    assert backfill_state(btc, 'BTCUSDT', now=NOW) == 1441
+    assert [int(query['limit']) for query in klines.requests] == [1000, 442]
+    # The second page starts where the first one's last candle closed
+    assert int(klines.requests[1]['startTime']) == (NOW - 86400 + 999 * MINUTE) * 1000
+    assert btc.window.latest() == (NOW, close_price(NOW))
+
+
+def test_small_gap_is_left_to_the_next_poll(klines, btc):
+    feed(btc, [(NOW - 90, 1.0)])
+    assert backfill_state(btc, 'BTCUSDT', now=NOW) == 0
+    assert klines.requests == []
+
+
+def test_candle_closing_at_the_newest_tick_is_not_added_twice(klines, btc):
+    # The saved window ends exactly on a candle close
+    feed(btc, [(NOW - 5 * MINUTE, 123.0)])
+
+    assert backfill_state(btc, 'BTCUSDT', now=NOW) == 5
+    timestamps = [ts for ts, _ in btc.window]
+    assert timestamps == [NOW - m * MINUTE for m in (5, 4, 3, 2, 1, 0)]
+    assert list(btc.window)[0] == (NOW - 5 * MINUTE, 123.0)
+
+
+def test_backfill_after_full_reset_keeps_the_archive_ordered(klines, btc):
+    live = [(NOW - 30 + i, 61000.0 + i) for i in range(10)]
+    feed(btc, live)
+    # RESET_STATE_FULL clears the window and indicators, but not the archive
+    btc.window.clear()
+    btc.indicators.clear()
+
+    assert backfill_state(btc, 'BTCUSDT', now=NOW) == 361
+    assert len(btc.window) == 361
+    assert btc.indicators.latest() == (NOW, close_price(NOW))
+
+    # Only the backfilled close after the archive's last tick was archived
+    ts, _ = btc.archive.query()
+    assert (ts[1:] > ts[:-1]).all()
+    assert (ts / NS_PER_SECOND).tolist() == [t for t, _ in live] + [NOW]
+    assert list(btc.archive.iter_ticks()) == live + [(NOW, close_price(NOW))]
+
+
+def test_backfill_behind_the_archive_and_indicators(klines, btc):
+    # A crash lost journal records that the archive and indicators already had
+    feed(btc, [(NOW - 20 * MINUTE, 1.0), (NOW - 2 * MINUTE + 5, 2.0)])
+    restored = default_state()
+    restored.window.append(NOW - 20 * MINUTE, 1.0)
+    restored.indicators = btc.indicators
+    restored.archive = btc.archive
+
+    assert backfill_state(restored, 'BTCUSDT', now=NOW) == 20
+    ts, _ = restored.archive.query()
+    assert (ts / NS_PER_SECOND).tolist() == [NOW - 20 * MINUTE, NOW - 2 * MINUTE + 5, NOW - MINUTE, NOW]
+    assert restored.indicators.latest() == (NOW, close_price(NOW))
+    assert len(restored.indicators) == 4
@@ -0,0 +1,75 @@
+"""
+The vectorized backtest against a tick-by-tick replay of the live logic
+"""
+import numpy as np
+import pytest
+
+from backtest import iter_binary_chunks, run_backtest, run_backtest_chunks, tick_chunks
+from detection_engine import check_entry_signal, check_exit_signal
+from rolling_window import RollingWindow
+
+
+def replay(ticks, entry_spike_pct, take_profit_pct, stop_loss_pct, window_seconds):
+    """What the live loop does, one tick at a time"""
+    window = RollingWindow(window_seconds)
+    entry = None
+    trades = []
+    for ts, price in ticks:
+        window.append(ts, price)
+        if entry is not None:
+            exit_signal = check_exit_signal(price, entry[1], take_profit_pct, stop_loss_pct)
+            if exit_signal:
+                trades.append((entry[0], entry[1], ts, price, exit_signal))
+                entry = None
+        elif check_entry_signal(price, window, entry_spike_pct)[0]:
+            entry = (ts, price)
+    return trades, None if entry is None else entry[1]
+
+
+def random_walk(seed: int, n: int, volatility: float):
+    rng = np.random.default_rng(seed)
+    # Irregular spacing, with repeated timestamps
+    ts = 1.7e9 + np.cumsum(rng.choice([0.0, 1.0, 2.5, 60.0], n))
+    prices = 60000 * np.exp(np.cumsum(rng.normal(0, volatility, n)))
+    return list(zip(ts.tolist(), prices.tolist()))
+
+
+@pytest.mark.parametrize('seed,volatility,params', [
+    (1, 1e-3, (0.1, 2.5, 2.5, 21600)),
+    (2, 5e-3, (3.0, 1.0, 2.5, 3600)),
+    (3, 1e-4, (0.05, 0.1, 0.1, 30)),
+    (4, 2e-3, (1.0, 2.5, 1.0, 600)),
+])
+def test_matches_tick_by_tick_replay(seed, volatility, params):
+    ticks = random_walk(seed, 20000, volatility)
+    expected, open_entry = replay(ticks, *params)
+
+    # Chunk boundaries must not matter
+    for size in (7, 997, 65536):
+        report = run_backtest_chunks(tick_chunks(ticks, size), *params)
+        trades = [(t['entry_time'], t['entry_price'], t['exit_time'], t['exit_price'], t['exit_type'])
+                  for t in report['trade_list']]
+        assert trades == expected
+        assert report['ticks'] == len(ticks)
+        assert report['open_entry_price'] == open_entry
+        assert report['wins'] == sum(trade[4] == 'TP' for trade in expected)
+
+
+def test_exit_tick_does_not_reenter():
+    # Tick 2 takes profit while 13% above the window low; the next entry is tick 3
+    ticks = [(0, 100.0), (1, 120.0), (2, 113.0), (3, 113.5), (4, 120.0)]
+    report = run_backtest(ticks, entry_spike_pct=5, take_profit_pct=5, stop_loss_pct=5, window_seconds=60)
+    assert [(t['entry_time'], t['exit_time'], t['exit_type']) for t in report['trade_list']] == [
+        (1, 2, 'TP'), (3, 4, 'SL')
+    ]
+
+
+def test_binary_chunks_skip_torn_record(tmp_path):
+    path = tmp_path / 'ticks.bin'
+    records = np.array([[1.0, 100.0], [2.0, 101.0], [3.0, 102.0]], dtype='<f8')
+    path.write_bytes(records.tobytes() + records[0].tobytes()[:11])
+
+    chunks = list(iter_binary_chunks(str(path)))
+    assert len(chunks) == 1
+    assert chunks[0][0].tolist() == [1.0, 2.0, 3.0]
+    assert chunks[0][1].tolist() == [100.0, 101.0, 102.0]
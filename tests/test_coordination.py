@@ -0,0 +1,370 @@
+"""
+Leases, takeover and symbol sharding over FileStore and a RedisStore talking to an in-process RESP server
+"""
+import asyncio
+import fnmatch
+import threading
+
+import pytest
+
+from conftest import free_port
+from coordination import Coordinator, FileStore, RedisStore, _rendezvous
+from rolling_window import RollingWindow
+from symbol_state import SymbolState
+
+
+TTL = 15.0
+SYMBOLS = ['BTC', 'ETH', 'SOL', 'BNB', 'XRP', 'DOGE', 'ADA', 'AVAX', 'LINK', 'DOT', 'LTC', 'ATOM']
+
+
+class Clock:
+    def __init__(self, now: float = 1_700_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class RespServer:
+    """
+    In-process stand-in for a Redis server: SET (NX/PX), GET, MGET, DEL,
+    PEXPIRE, SCAN and WATCH/MULTI/EXEC, with expiry on an injected clock.
+    There is no KEYS: the store must not block a real server with it.
+    """
+
+    def __init__(self, clock: Clock):
+        self.clock = clock
+        self.port = free_port()
+        self.data = {}
+        self.expires = {}
+        self.versions = {}
+        self.scans = 0
+        self.loop = asyncio.new_event_loop()
+        self._server = None
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"redis://127.0.0.1:{self.port}/0"
+
+    def start(self) -> "RespServer":
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self.loop).result(5)
+        return self
+
+    async def _start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, '127.0.0.1', self.port)
+
+    def stop(self) -> None:
+        """Stop listening and drop every connection"""
+        async def close():
+            self._server.close()
+            for task in asyncio.all_tasks():
+                if task is not asyncio.current_task():
+                    task.cancel()
+        asyncio.run_coroutine_threadsafe(close(), self.loop).result(5)
+
+    def close(self) -> None:
+        self.stop()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(5)
+        self.loop.close()
+
+    def _alive(self, key: bytes) -> bool:
+        if key in self.expires and self.expires[key] <= self.clock():
+            del self.data[key], self.expires[key]
+            self._touch(key)
+        return key in self.data
+
+    def _touch(self, key: bytes) -> None:
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+    def _run(self, command: str, args):
+        if command in ('SELECT', 'AUTH'):
+            return 'OK'
+        if command == 'SET':
+            key, value = args[:2]
+            options = [arg.decode().upper() for arg in args[2:]]
+            if 'NX' in options and self._alive(key):
+                return None
+            self.data[key] = value
+            self.expires.pop(key, None)
+            if 'PX' in options:
+                self.expires[key] = self.clock() + int(options[options.index('PX') + 1]) / 1000
+            self._touch(key)
+            return 'OK'
+        if command == 'GET':
+            return self.data[args[0]] if self._alive(args[0]) else None
+        if command == 'MGET':
+            return [self.data[key] if self._alive(key) else None for key in args]
+        if command == 'DEL':
+            deleted = [key for key in args if self._alive(key)]
+            for key in deleted:
+                del self.data[key]
+                self.expires.pop(key, None)
+                self._touch(key)
+            return len(deleted)
+        if command == 'PEXPIRE':
+            if not self._alive(args[0]):
+                return 0
+            self.expires[args[0]] = self.clock() + int(args[1]) / 1000
+            self._touch(args[0])
+            return 1
+        if command == 'SCAN':
+            # Cursor = position in the sorted keyspace; pages are kept short
+            # (3 keys) so listing leases always takes several calls
+            options = {args[i].decode().upper(): args[i + 1] for i in range(1, len(args), 2)}
+            keys = sorted(self.data)
+            start = int(args[0])
+            page = keys[start:start + 3]
+            cursor = start + 3 if start + 3 < len(keys) else 0
+            self.scans += 1
+            pattern = options.get('MATCH', b'*').decode()
+            return [str(cursor).encode(), [
+                key for key in page if self._alive(key) and fnmatch.fnmatchcase(key.decode(), pattern)
+            ]]
+        raise ValueError(f"unknown command '{command}'")
+
+    @classmethod
+    def _encode(cls, value) -> bytes:
+        if value is None:
+            return b'$-1\r\n'
+        if isinstance(value, int):
+            return b':%d\r\n' % value
+        if isinstance(value, str):
+            return b'+%s\r\n' % value.encode()
+        if isinstance(value, list):
+            return b'*%d\r\n' % len(value) + b''.join(cls._encode(item) for item in value)
+        return b'$%d\r\n%s\r\n' % (len(value), value)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        watched = {}
+        queued = None
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                args = []
+                for _ in range(int(line[1:-2])):
+                    length = int((await reader.readline())[1:-2])
+                    args.append((await reader.readexactly(length + 2))[:-2])
+                command, args = args[0].decode().upper(), args[1:]
+                if command == 'WATCH':
+                    for key in args:
+                        self._alive(key)
+                        watched[key] = self.versions.get(key, 0)
+                    reply = self._encode('OK')
+                elif command == 'UNWATCH':
+                    watched = {}
+                    reply = self._encode('OK')
+                elif command == 'MULTI':
+                    queued = []
+                    reply = self._encode('OK')
+                elif command == 'EXEC':
+                    for key in watched:
+                        self._alive(key)
+                    if any(self.versions.get(key, 0) != version for key, version in watched.items()):
+                        reply = b'*-1\r\n'   # Aborted: a watched key changed
+                    else:
+                        reply = self._encode([self._run(*queued_command) for queued_command in queued])
+                    watched, queued = {}, None
+                elif queued is not None:
+                    queued.append((command, args))
+                    reply = self._encode('QUEUED')
+                else:
+                    try:
+                        reply = self._encode(self._run(command, args))
+                    except ValueError as e:
+                        reply = b'-ERR %s\r\n' % str(e).encode()
+                writer.write(reply)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        writer.close()
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def redis(clock):
+    server = RespServer(clock).start()
+    yield server
+    server.close()
+
+
+@pytest.fixture(params=['file', 'redis'])
+def store_factory(request, tmp_path, clock):
+    """Builds stores that share one backend, as separate worker processes would"""
+    if request.param == 'file':
+        return lambda: FileStore(str(tmp_path / 'coordination'), clock=clock)
+    server = request.getfixturevalue('redis')
+    return lambda: RedisStore(server.url, prefix='test:')
+
+
+def test_owners_pages_through_scan(redis):
+    store = RedisStore(redis.url, prefix='test:')
+    store.set('feed:BTC', '{}')
+    for i in range(10):
+        store.acquire(f"symbol:S{i}", f"w{i % 3}", TTL)
+
+    assert store.owners('symbol:') == {f"symbol:S{i}": f"w{i % 3}" for i in range(10)}
+    assert redis.scans > 1
+
+
+def coordinator(store_factory, worker_id: str, clock: Clock, **kwargs) -> Coordinator:
+    kwargs.setdefault('symbols', SYMBOLS)
+    return Coordinator(store_factory(), worker_id=worker_id, ttl=TTL, clock=clock, **kwargs)
+
+
+def test_lease_acquire_renew_and_refuse(store_factory, clock):
+    a, b = store_factory(), store_factory()
+    assert a.acquire('leader', 'a', TTL)
+    assert not b.acquire('leader', 'b', TTL)
+
+    # Renewing pushes the expiry out: b still cannot take it one TTL after the first acquire
+    clock.now += TTL - 1
+    assert a.acquire('leader', 'a', TTL)
+    clock.now += 2
+    assert not b.acquire('leader', 'b', TTL)
+    assert b.owners('lead') == {'leader': 'a'}
+
+
+def test_expired_lease_is_taken_over(store_factory, clock):
+    a, b = store_factory(), store_factory()
+    a.acquire('leader', 'a', TTL)
+
+    clock.now += TTL
+    assert a.owners('') == {}
+    assert b.acquire('leader', 'b', TTL)
+    # The old owner's renewal must not steal it back
+    assert not a.acquire('leader', 'a', TTL)
+    assert a.owners('') == {'leader': 'b'}
+
+
+def test_only_the_owner_releases(store_factory):
+    a, b = store_factory(), store_factory()
+    a.acquire('leader', 'a', TTL)
+    b.release('leader', 'b')
+    assert b.owners('') == {'leader': 'a'}
+
+    a.release('leader', 'a')
+    assert b.acquire('leader', 'b', TTL)
+
+
+def test_values_are_shared(store_factory):
+    a, b = store_factory(), store_factory()
+    assert b.get('feed:BTC') is None
+    a.set('feed:BTC', '{"ticks": []}')
+    assert b.get('feed:BTC') == '{"ticks": []}'
+
+
+def test_standby_takes_over_a_stopped_leader(store_factory, clock):
+    a = coordinator(store_factory, 'a', clock)
+    b = coordinator(store_factory, 'b', clock)
+    a.refresh()
+    b.refresh()
+    assert a.owned() == set(SYMBOLS) and b.owned() == set()
+
+    a.stop()   # Releases at once
+    b.refresh()
+    assert b.owned() == set(SYMBOLS)
+
+
+def test_standby_takes_over_a_crashed_leader_after_the_ttl(store_factory, clock):
+    a = coordinator(store_factory, 'a', clock)
+    b = coordinator(store_factory, 'b', clock)
+    a.refresh()
+
+    clock.now += TTL - 1
+    b.refresh()
+    assert b.owned() == set()
+    clock.now += 1
+    b.refresh()
+    assert b.owned() == set(SYMBOLS)
+    a.refresh()
+    assert a.owned() == set()
+
+
+def test_stalled_main_loop_gives_up_its_leases(store_factory, clock):
+    a = coordinator(store_factory, 'a', clock, stall_after=3 * TTL)
+    b = coordinator(store_factory, 'b', clock)
+    a.refresh()
+
+    clock.now += 3 * TTL + 1   # Renewals keep running, but the loop never beats
+    a.refresh()
+    assert a.owned() == set()
+    b.refresh()
+    assert b.owned() == set(SYMBOLS)
+
+
+def test_unreachable_store_drops_ownership_before_leases_expire(redis, clock):
+    a = Coordinator(RedisStore(redis.url), SYMBOLS, worker_id='a', ttl=TTL, clock=clock)
+    a.refresh()
+    redis.stop()
+
+    clock.now += TTL / 3
+    a.refresh()
+    assert a.owned() == set(SYMBOLS)   # The lease taken a third of a TTL ago still holds
+    clock.now += TTL / 3
+    a.refresh()
+    assert a.owned() == set()
+
+
+def settle(workers, rounds: int = 3) -> None:
+    for _ in range(rounds):
+        for worker in workers:
+            worker.refresh()
+
+
+def test_rendezvous_moves_only_the_departed_members_symbols():
+    symbols = [f"SYM{i}" for i in range(500)]
+    before = {symbol: _rendezvous(symbol, ['a', 'b', 'c']) for symbol in symbols}
+    assert set(before.values()) == {'a', 'b', 'c'}
+
+    after = {symbol: _rendezvous(symbol, ['a', 'b']) for symbol in symbols}
+    assert all(after[s] == before[s] for s in symbols if before[s] != 'c')
+
+    joined = {symbol: _rendezvous(symbol, ['a', 'b', 'c', 'd']) for symbol in symbols}
+    assert all(joined[s] in (before[s], 'd') for s in symbols)
+    # Order of the member list does not matter
+    assert all(_rendezvous(s, ['c', 'a', 'b']) == before[s] for s in symbols)
+
+
+def test_sharded_workers_split_symbols_and_rebalance(store_factory, clock):
+    workers = [coordinator(store_factory, name, clock, shard=True) for name in ('a', 'b', 'c')]
+    settle(workers)
+
+    owned = {worker.worker_id: worker.owned() for worker in workers}
+    assert set().union(*owned.values()) == set(SYMBOLS)
+    assert sum(len(symbols) for symbols in owned.values()) == len(SYMBOLS)
+    assert all(owned.values())
+    for worker in workers:
+        assert owned[worker.worker_id] == {s for s in SYMBOLS if _rendezvous(s, ['a', 'b', 'c']) == worker.worker_id}
+
+    # c leaves: only its symbols move, and every symbol still has exactly one owner
+    workers[2].stop()
+    settle(workers[:2])
+    for worker in workers[:2]:
+        assert worker.owned() >= owned[worker.worker_id]
+    assert workers[0].owned() | workers[1].owned() == set(SYMBOLS)
+    assert not workers[0].owned() & workers[1].owned()
+
+
+def test_standby_follows_the_owners_feed(store_factory, clock):
+    a = coordinator(store_factory, 'a', clock, symbols=['BTC'])
+    b = coordinator(store_factory, 'b', clock, symbols=['BTC'])
+    owner = SymbolState('BTC', RollingWindow(3600))
+    for i in range(5):
+        owner.window.append(clock.now + i, 60000.0 + i)
+    owner.position.open(60004.0, '2024-01-01T00:00:00')
+
+    a.publish('BTC', owner)
+    standby = SymbolState('BTC', RollingWindow(3600))
+    assert b.follow('BTC', standby) == 5
+    assert b.follow('BTC', standby) == 0
+    assert list(standby.window) == list(owner.window)
+    assert standby.position.is_open and standby.position.entry_price == 60004.0
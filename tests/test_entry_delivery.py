@@ -0,0 +1,123 @@
+"""
+Positions open at signal time with a background notifier, and are withdrawn if the entry alert fails
+"""
+import pytest
+
+import main
+from notifier import Notifier
+from state_manager import default_state
+from trade_ledger import TradeLedger
+
+
+class HeldChannel:
+    """Channel that holds alerts (as a digest would) until the test settles them"""
+
+    name = 'held'
+
+    def __init__(self, accept: bool = True):
+        self.accept = accept
+        self.queued = []
+        self.results = []
+
+    def start(self):
+        pass
+
+    def stop(self, timeout: float = 30):
+        pass
+
+    def submit(self, alert, alert_id) -> bool:
+        if self.accept:
+            self.queued.append((alert, alert_id))
+        return self.accept
+
+    def settle(self, sent: bool) -> None:
+        self.results.extend({'context': alert_id, 'sent': sent} for _, alert_id in self.queued)
+        self.queued = []
+
+    def poll_results(self):
+        results, self.results = self.results, []
+        return results
+
+
+@pytest.fixture
+def eth(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    state = default_state('ETH')
+    state.ledger = TradeLedger(str(tmp_path / 'trades.jsonl'))
+    return state
+
+
+def signal(state, notifier, price: float = 3300.0) -> None:
+    main.handle_entry_signal('ETH', price, 3000.0, 10.0, state, {}, '[test] ETH', notifier)
+
+
+def test_position_opens_when_the_alert_is_queued(eth):
+    channel = HeldChannel()
+    signal(eth, Notifier([channel]))
+
+    # Still held by the channel, but the position and its entry time are already set
+    assert channel.queued
+    assert eth.position.is_open and eth.position.entry_price == 3300.0
+    assert eth.position.entry_timestamp is not None
+    [trade] = eth.ledger.open_positions('ETH')
+    assert trade.entry_time == eth.position.entry_timestamp
+
+
+def test_delivery_keeps_the_position(eth):
+    channel = HeldChannel()
+    notifier = Notifier([channel])
+    signal(eth, notifier)
+    opened_at = eth.position.entry_timestamp
+
+    channel.settle(sent=True)
+    main.handle_delivery_reports(notifier, {'ETH': eth})
+    assert eth.position.is_open and eth.position.entry_timestamp == opened_at
+
+
+def test_failed_delivery_withdraws_the_position(eth):
+    channel = HeldChannel()
+    notifier = Notifier([channel])
+    signal(eth, notifier)
+
+    channel.settle(sent=False)
+    main.handle_delivery_reports(notifier, {'ETH': eth})
+    assert not eth.position.is_open
+    assert eth.ledger.open_positions('ETH') == []
+    [close] = [event for event in eth.ledger.history('ETH') if event['event'] == 'close']
+    assert close['exit_type'] == 'UNDELIVERED' and close['price'] is None
+    assert eth.ledger.stats.trades == 0   # Left out of the statistics
+
+
+def test_late_failure_does_not_touch_a_newer_position(eth):
+    channel = HeldChannel()
+    notifier = Notifier([channel])
+    signal(eth, notifier)
+    first = channel.queued
+    channel.queued = []
+    # The first position exits and a second one opens before the first alert fails
+    main.close_position(eth, 3100.0, 'TP')
+    signal(eth, notifier, price=3400.0)
+
+    channel.queued = first
+    channel.settle(sent=False)
+    main.handle_delivery_reports(notifier, {'ETH': eth})
+    assert eth.position.is_open and eth.position.entry_price == 3400.0
+
+
+@pytest.mark.parametrize('accept,message', [
+    (True, 'exit alert queued'),
+    (False, 'exit alert could not be queued'),
+])
+def test_exit_log_follows_the_notifier(eth, caplog, accept, message):
+    eth.position.open(3300.0, '2024-01-01T00:00:00')
+    with caplog.at_level('INFO'):
+        main.handle_exit_signal('ETH', 'TP', 3135.0, eth, {}, '[test] ETH', Notifier([HeldChannel(accept)]))
+
+    assert not eth.position.is_open   # Closed either way
+    assert message in caplog.text
+
+
+def test_rejected_alert_opens_nothing(eth):
+    signal(eth, Notifier([HeldChannel(accept=False)]))
+    assert not eth.position.is_open
+    assert eth.ledger.open_positions('ETH') == []
@@ -0,0 +1,190 @@
+"""
+Notifier fan-out against local webhook, Slack, Telegram and SMTP stand-ins
+"""
+import asyncio
+import time
+
+import pytest
+from aiohttp import web
+
+import notifier as notifier_module
+from alert_dispatcher import AlertDispatcher
+from conftest import wait_for
+from notifier import (
+    EmailChannel, Notifier, SlackChannel, TelegramChannel, WebhookChannel,
+    build_notifier, entry_event, exit_event
+)
+
+
+TOKEN = '123:abc'
+
+
+class MockHooks:
+    """
+    Webhook, Slack and Telegram endpoints on one server. Each records the
+    JSON it receives and answers from a script of statuses, then 200.
+    """
+
+    def __init__(self):
+        self.received = {'webhook': [], 'slack': [], 'telegram': []}
+        self.statuses = {name: [] for name in self.received}
+        self.latency = {name: 0.0 for name in self.received}
+        self.telegram_ok = True
+        self.app = web.Application()
+        self.app.router.add_post('/webhook', self.webhook)
+        self.app.router.add_post('/slack', self.slack)
+        self.app.router.add_post(f"/bot{TOKEN}/sendMessage", self.telegram)
+
+    async def _receive(self, name: str, request: web.Request) -> int:
+        self.received[name].append(await request.json())
+        await asyncio.sleep(self.latency[name])
+        return self.statuses[name].pop(0) if self.statuses[name] else 200
+
+    async def webhook(self, request: web.Request) -> web.Response:
+        return web.json_response({}, status=await self._receive('webhook', request))
+
+    async def slack(self, request: web.Request) -> web.Response:
+        return web.Response(text='ok', status=await self._receive('slack', request))
+
+    async def telegram(self, request: web.Request) -> web.Response:
+        status = await self._receive('telegram', request)
+        return web.json_response({'ok': self.telegram_ok}, status=status)
+
+
+@pytest.fixture
+def hooks(serve):
+    mock = MockHooks()
+    mock.url = serve(mock.app).url
+    return mock
+
+
+@pytest.fixture
+def running():
+    """Start a Notifier over the given channels; stopped at teardown"""
+    notifiers = []
+
+    def start(channels) -> Notifier:
+        notifier = Notifier(channels)
+        notifier.start()
+        notifiers.append(notifier)
+        return notifier
+
+    yield start
+    for notifier in notifiers:
+        notifier.stop(5)
+
+
+def http_channels(hooks, **kwargs):
+    return [
+        WebhookChannel(f"{hooks.url}/webhook", **kwargs),
+        SlackChannel(f"{hooks.url}/slack", **kwargs),
+        TelegramChannel(TOKEN, '42', api_url=hooks.url, **kwargs),
+    ]
+
+
+def exit_alert():
+    return exit_event('BTC', 'TP', 60000.0, 58500.0, 2.5)
+
+
+def collect(notifier: Notifier, count: int, timeout: float = 5):
+    """Poll until count reports have come back"""
+    reports = []
+    wait_for(lambda: reports.extend(notifier.poll_results()) or len(reports) >= count, timeout)
+    return reports
+
+
+def test_alert_reaches_every_channel(hooks, smtp, running):
+    email = EmailChannel(AlertDispatcher('alerts@example.com', 'secret', digest_seconds=0), ['a@example.com'])
+    notifier = running(http_channels(hooks) + [email])
+
+    assert notifier.notify(exit_alert(), context={'n': 1})
+    [report] = collect(notifier, 1)
+    assert report['sent'] and report['context'] == {'n': 1}
+
+    wait_for(lambda: all(hooks.received.values()) and smtp.mailbox.messages)
+    webhook = hooks.received['webhook'][0]
+    assert (webhook['event'], webhook['symbol'], webhook['critical']) == ('exit', 'BTC', True)
+    assert (webhook['exit_type'], webhook['pnl_pct']) == ('TP', 2.5)
+    assert hooks.received['slack'][0] == {'text': webhook['text']}
+    assert hooks.received['telegram'][0] == {'chat_id': '42', 'text': webhook['text']}
+    assert smtp.mailbox.subjects() == [webhook['subject']]
+    # One report per alert, however many channels delivered it
+    time.sleep(0.2)
+    assert notifier.poll_results() == []
+
+
+def test_slow_channel_does_not_hold_up_the_others(hooks, running):
+    hooks.latency['slack'] = 1.5
+    notifier = running(http_channels(hooks))
+
+    start = time.monotonic()
+    notifier.notify(entry_event('ETH', 3300.0, 3000.0, 10.0, 3300.0, 3217.5, 3382.5), context='entry')
+    [report] = collect(notifier, 1)
+    assert time.monotonic() - start < 1.0
+    assert report['sent'] and report['channel'] in ('webhook', 'telegram')
+
+
+def test_failed_attempts_are_retried(hooks, running):
+    hooks.statuses['webhook'] = [500, 503]
+    notifier = running([WebhookChannel(f"{hooks.url}/webhook", max_retries=3)])
+
+    notifier.notify(exit_alert(), context='exit')
+    [report] = collect(notifier, 1)
+    assert report == {'context': 'exit', 'sent': True, 'channel': 'webhook'}
+    assert len(hooks.received['webhook']) == 3
+
+
+def test_timeout_counts_as_a_failed_attempt(hooks, running):
+    hooks.latency['slack'] = 1.0
+    notifier = running([SlackChannel(f"{hooks.url}/slack", timeout=0.2, max_retries=1)])
+
+    notifier.notify(exit_alert(), context='exit')
+    [report] = collect(notifier, 1)
+    assert report == {'context': 'exit', 'sent': False, 'channel': None}
+
+
+def test_telegram_needs_ok_in_the_reply(hooks, running):
+    hooks.telegram_ok = False
+    notifier = running([TelegramChannel(TOKEN, '42', api_url=hooks.url, max_retries=2)])
+
+    notifier.notify(exit_alert(), context='exit')
+    [report] = collect(notifier, 1)
+    assert not report['sent']
+    assert len(hooks.received['telegram']) == 2
+
+
+def test_failure_is_reported_once_every_channel_gave_up(hooks, running):
+    hooks.statuses.update(webhook=[500], slack=[500])
+    hooks.latency['slack'] = 0.5
+    notifier = running([
+        WebhookChannel(f"{hooks.url}/webhook", max_retries=1),
+        SlackChannel(f"{hooks.url}/slack", max_retries=1),
+    ])
+
+    notifier.notify(exit_alert(), context='exit')
+    time.sleep(0.2)
+    assert notifier.poll_results() == []   # Slack has not answered yet
+    [report] = collect(notifier, 1)
+    assert report == {'context': 'exit', 'sent': False, 'channel': None}
+
+
+def test_stop_delivers_what_is_queued(hooks):
+    notifier = Notifier([WebhookChannel(f"{hooks.url}/webhook")])
+    notifier.start()
+    for i in range(5):
+        notifier.notify(exit_alert(), context=i)
+    notifier.stop(5)
+
+    assert len(hooks.received['webhook']) == 5
+    assert sorted(report['context'] for report in notifier.poll_results()) == [0, 1, 2, 3, 4]
+
+
+def test_build_notifier_uses_the_configured_channels(monkeypatch):
+    monkeypatch.setattr(notifier_module, 'ALERT_WEBHOOK_URLS', 'http://a/hook, http://b/hook')
+    monkeypatch.setattr(notifier_module, 'SLACK_WEBHOOK_URL', '')
+    monkeypatch.setattr(notifier_module, 'TELEGRAM_BOT_TOKEN', TOKEN)
+    monkeypatch.setattr(notifier_module, 'TELEGRAM_CHAT_ID', '42')
+
+    notifier = build_notifier({'gmail_user': 'a@example.com', 'gmail_app_password': 'x', 'recipients': []})
+    assert [channel.name for channel in notifier.channels] == ['email', 'webhook', 'webhook', 'telegram']
+    assert notifier.channels[2].url == 'http://b/hook'
@@ -0,0 +1,140 @@
+"""
+PriceStream against a local stand-in for the Binance combined stream
+"""
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+from aiohttp import web
+
+from main import new_quotes
+from price_stream import PriceStream, parse_stream_message
+from state_manager import default_state
+
+
+SYMBOLS = {'BTC': ('bitcoin', 'BTCUSDT'), 'ETH': ('ethereum', 'ETHUSDT')}
+
+
+def trade(pair: str, price: float) -> str:
+    return json.dumps({'stream': f"{pair.lower()}@trade", 'data': {'e': 'trade', 's': pair, 'p': str(price)}})
+
+
+class MockStream:
+    """
+    Combined-stream endpoint. Each connection sends the next script entry:
+    a list of messages, then either closes (reconnect) or goes quiet.
+    """
+
+    def __init__(self, scripts):
+        self.scripts = list(scripts)
+        self.connections = 0
+        self.paths = []
+        self.app = web.Application()
+        self.app.router.add_get('/stream', self.handle)
+
+    async def handle(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.connections += 1
+        self.paths.append(request.path_qs)
+        messages, then = self.scripts.pop(0) if self.scripts else ([], 'quiet')
+        for message in messages:
+            await ws.send_str(message)
+        if then == 'quiet':
+            while not ws.closed:
+                await asyncio.sleep(0.05)
+        await ws.close()
+        return ws
+
+
+@pytest.fixture
+def stream_for(serve):
+    streams = []
+
+    def start(mock: MockStream) -> PriceStream:
+        server = serve(mock.app)
+        stream = PriceStream(SYMBOLS, base_url=server.url.replace('http', 'ws'))
+        stream.start()
+        streams.append(stream)
+        return stream
+
+    yield start
+    for stream in streams:
+        stream.stop()
+
+
+def test_parse_trade_and_book_ticker():
+    pairs = {'BTCUSDT': 'BTC'}
+    symbol, quote = parse_stream_message(json.loads(trade('BTCUSDT', 60000.5)), pairs)
+    assert (symbol, quote['price']) == ('BTC', 60000.5)
+    _, quote = parse_stream_message({'data': {'s': 'BTCUSDT', 'b': '100', 'a': '102'}}, pairs)
+    assert quote['price'] == 101.0
+    assert parse_stream_message({'data': {'s': 'DOGEUSDT', 'p': '1'}}, pairs) is None
+    assert parse_stream_message({'result': None, 'id': 1}, pairs) is None
+
+
+def test_ticks_flow_in_order(stream_for):
+    mock = MockStream([([trade('BTCUSDT', 60000), trade('ETHUSDT', 3000), trade('BTCUSDT', 60010)], 'quiet')])
+    stream = stream_for(mock)
+
+    ticks = [stream.get(timeout=3) for _ in range(3)]
+    assert [(symbol, quote['price']) for symbol, quote in ticks] == [
+        ('BTC', 60000.0), ('ETH', 3000.0), ('BTC', 60010.0)
+    ]
+    assert mock.paths == ['/stream?streams=btcusdt@trade/ethusdt@trade']
+
+
+def test_reconnects_after_server_closes(stream_for):
+    mock = MockStream([
+        ([trade('BTCUSDT', 60000)], 'close'),
+        ([trade('BTCUSDT', 60100)], 'quiet'),
+    ])
+    stream = stream_for(mock)
+
+    assert stream.get(timeout=3)[1]['price'] == 60000.0
+    # The first reconnect waits one second
+    assert stream.get(timeout=4)[1]['price'] == 60100.0
+    assert mock.connections == 2
+    assert stream.reconnects == 1
+    assert stream.connected.is_set()
+
+
+def test_quiet_stream_reports_staleness(stream_for):
+    stream = stream_for(MockStream([([trade('BTCUSDT', 60000)], 'quiet')]))
+
+    assert stream.get(timeout=3) is not None
+    # Still connected, but nothing arrives: the main loop falls back to REST on None
+    assert stream.get(timeout=0.3) is None
+    assert stream.connected.is_set()
+
+
+def test_unreachable_server_keeps_retrying():
+    stream = PriceStream(SYMBOLS, base_url='ws://127.0.0.1:9')   # Nothing listens there
+    stream.start()
+    try:
+        assert stream.get(timeout=0.5) is None
+        assert not stream.connected.is_set()
+    finally:
+        stream.stop()
+
+
+def test_slow_consumer_drops_oldest_ticks():
+    stream = PriceStream(SYMBOLS, max_queue=2)
+    for price in (1.0, 2.0, 3.0):
+        stream._publish(('BTC', {'price': price}))
+    assert stream.dropped == 1
+    assert [stream.get(timeout=0)[1]['price'] for _ in range(2)] == [2.0, 3.0]
+
+
+def test_ticks_behind_the_window_are_not_new():
+    states = {'BTC': default_state('BTC'), 'ETH': default_state('ETH')}
+    states['BTC'].window.append(1000.0, 60000.0)
+
+    # Stamped after the wall clock stepped back, or the same tick again
+    behind = {'price': 59000.0, 'timestamp': datetime.fromtimestamp(990.0)}
+    again = {'price': 60000.0, 'timestamp': datetime.fromtimestamp(1000.0)}
+    ahead = {'price': 61000.0, 'timestamp': datetime.fromtimestamp(1001.0)}
+    assert new_quotes({'BTC': behind}, states) == {}
+    assert new_quotes({'BTC': again}, states) == {}
+    assert new_quotes({'BTC': ahead, 'ETH': behind}, states) == {'BTC': ahead, 'ETH': behind}
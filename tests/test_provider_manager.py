@@ -0,0 +1,221 @@
+"""
+ProviderManager routing against local stand-ins for all four provider APIs
+"""
+import asyncio
+
+import pytest
+from aiohttp import web
+
+import price_monitor
+import rate_limit
+from price_monitor import KNOWN_SYMBOLS, fetch_prices_coinbase, kraken_pair
+from provider_manager import CircuitBreaker, ProviderHealth, ProviderManager
+from rate_limit import RateBudget
+
+
+BTC = {'BTC': KNOWN_SYMBOLS['BTC']}
+BTC_ETH = {'BTC': KNOWN_SYMBOLS['BTC'], 'ETH': KNOWN_SYMBOLS['ETH']}
+PROVIDERS = ('coingecko', 'binance', 'kraken', 'coinbase')
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class MockExchanges:
+    """The four provider APIs on one server, each with its own prices, latency and failure switch"""
+
+    def __init__(self):
+        self.prices = {name: {'BTC': 60000.0, 'ETH': 3000.0} for name in PROVIDERS}
+        self.latency = {name: 0.0 for name in PROVIDERS}
+        self.fail = {name: False for name in PROVIDERS}
+        self.requests = []
+        self.app = web.Application()
+        self.app.router.add_get('/coingecko/simple/price', self.coingecko)
+        self.app.router.add_get('/binance/ticker/price', self.binance)
+        self.app.router.add_get('/kraken/Ticker', self.kraken)
+        self.app.router.add_get('/coinbase/products/{product}/ticker', self.coinbase)
+
+    async def _respond(self, name: str, body) -> web.Response:
+        self.requests.append(name)
+        await asyncio.sleep(self.latency[name])
+        if self.fail[name]:
+            return web.json_response({'error': 'down'}, status=500)
+        return web.json_response(body)
+
+    async def coingecko(self, request: web.Request) -> web.Response:
+        ids = {coingecko_id: symbol for symbol, (coingecko_id, _) in KNOWN_SYMBOLS.items()}
+        return await self._respond('coingecko', {
+            coingecko_id: {'usd': self.prices['coingecko'][ids[coingecko_id]]}
+            for coingecko_id in request.query['ids'].split(',')
+        })
+
+    async def binance(self, request: web.Request) -> web.Response:
+        return await self._respond('binance', [
+            {'symbol': KNOWN_SYMBOLS[symbol][1], 'price': str(price)}
+            for symbol, price in self.prices['binance'].items()
+        ])
+
+    async def kraken(self, request: web.Request) -> web.Response:
+        return await self._respond('kraken', {'error': [], 'result': {
+            kraken_pair(symbol): {'c': [str(price), '1']}
+            for symbol, price in self.prices['kraken'].items()
+        }})
+
+    async def coinbase(self, request: web.Request) -> web.Response:
+        symbol = request.match_info['product'].split('-')[0]
+        return await self._respond('coinbase', {'price': str(self.prices['coinbase'][symbol])})
+
+    def count(self, name: str) -> int:
+        return self.requests.count(name)
+
+
+@pytest.fixture
+def exchanges(serve, monkeypatch):
+    mock = MockExchanges()
+    server = serve(mock.app)
+    for name in PROVIDERS:
+        monkeypatch.setattr(price_monitor, f"{name.upper()}_API_URL", f"{server.url}/{name}")
+    return mock
+
+
+@pytest.fixture
+def manager_for():
+    managers = []
+
+    def build(**kwargs) -> ProviderManager:
+        kwargs.setdefault('symbols', BTC)
+        kwargs.setdefault('breaker_cooldown', 60)
+        manager = ProviderManager(**kwargs)
+        managers.append(manager)
+        return manager
+
+    yield build
+    for manager in managers:
+        manager.close()
+
+
+def test_breaker_opens_cools_down_and_retries_once():
+    clock = Clock()
+    breaker = CircuitBreaker(failures=3, cooldown=60, clock=clock)
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record(False)
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+
+    clock.now = 60
+    assert breaker.allow() and breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.record(False)   # The trial fails: open again straight away
+    assert not breaker.allow()
+
+    clock.now = 120
+    assert breaker.allow()
+    breaker.record(True)
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.failures == 0
+
+
+def test_failing_provider_is_taken_out_of_rotation(exchanges, manager_for):
+    clock = Clock()
+    exchanges.fail['coingecko'] = True
+    # Quote from every provider each tick, so the failing one keeps being asked
+    manager = manager_for(cross_check=4, breaker_failures=3, clock=clock)
+
+    for _ in range(3):
+        assert manager.fetch()['BTC']['price'] == 60000.0
+    assert manager.status()['coingecko']['state'] == CircuitBreaker.OPEN
+    assert 'coingecko' not in manager.ranked()
+
+    manager.fetch()
+    assert exchanges.count('coingecko') == 3   # Skipped while open
+
+    # After the cooldown it gets a single trial request, which closes the breaker
+    clock.now = 60
+    exchanges.fail['coingecko'] = False
+    assert manager.ranked()[-1] == 'coingecko'   # Back in rotation, but its score is still poor
+    manager.fetch()
+    assert exchanges.count('coingecko') == 4
+    assert manager.status()['coingecko']['state'] == CircuitBreaker.CLOSED
+
+
+def test_fastest_provider_moves_to_the_front(exchanges, manager_for):
+    exchanges.latency.update(coingecko=0.2, binance=0.0)
+    manager = manager_for(cross_check=2)
+    assert manager.ranked() == ['coingecko', 'binance', 'kraken', 'coinbase']
+
+    manager.fetch()
+    # Measured providers beat the 0.5s prior; the faster one leads
+    assert manager.ranked() == ['binance', 'coingecko', 'kraken', 'coinbase']
+    status = manager.status()
+    assert status['binance']['latency'] < status['coingecko']['latency']
+
+
+def test_moving_averages_and_score():
+    health = ProviderHealth('x', CircuitBreaker(failures=100))
+    assert health.score() == 0.5                 # Unmeasured: the prior latency
+    health.record(True, 0.1)
+    health.record(True, 0.6)
+    assert health.latency == pytest.approx(0.2)  # 0.1 + 0.2 * (0.6 - 0.1)
+    health.record(False, 5.0)                    # Failed requests do not count toward latency
+    assert health.latency == pytest.approx(0.2)
+    assert health.success_rate == pytest.approx(0.8)
+    assert health.score() == pytest.approx(0.25)
+
+
+def test_failing_fast_provider_loses_the_lead(exchanges, manager_for):
+    exchanges.latency.update(coingecko=0.1, binance=0.03)
+    manager = manager_for(cross_check=2, breaker_failures=100)
+    manager.fetch()
+    assert manager.ranked()[0] == 'binance'
+
+    exchanges.fail['binance'] = True
+    for _ in range(5):
+        manager.fetch()
+    assert manager.status()['binance']['success_rate'] < 1
+    # Kraken answered in its place and is now the best measured provider
+    assert manager.ranked()[0] == 'kraken'
+
+
+def test_outlier_is_rejected_by_the_tie_breaker(exchanges, manager_for):
+    exchanges.prices['binance']['BTC'] = 66000.0   # 10% off
+    manager = manager_for(cross_check=2, outlier_pct=1.0)
+
+    quote = manager.fetch()['BTC']
+    assert quote['price'] == 60000.0
+    assert exchanges.count('kraken') == 1          # Asked to break the tie
+    assert manager.health['binance'].breaker.failures == 1
+    assert manager.health['coingecko'].breaker.failures == 0
+
+
+def test_no_majority_gives_no_quote(exchanges, manager_for):
+    exchanges.prices['binance']['BTC'] = 66000.0
+    exchanges.prices['kraken']['BTC'] = 54000.0
+    exchanges.prices['coinbase']['BTC'] = 70000.0
+    manager = manager_for(cross_check=2)
+
+    assert manager.fetch() == {}
+
+
+def test_multi_symbol_fetch_is_one_call_per_provider(exchanges, manager_for):
+    exchanges.fail.update(coingecko=True, binance=True, kraken=True)
+    manager = manager_for(symbols=BTC_ETH, cross_check=1)
+
+    assert 'coinbase' not in manager.ranked()
+    assert manager.fetch() == {}
+    assert exchanges.count('coinbase') == 0
+    assert all(exchanges.count(name) == 1 for name in ('coingecko', 'binance', 'kraken'))
+    # A single-symbol fetch may still use it
+    assert manager.fetch(BTC)['BTC']['price'] == 60000.0
+    assert exchanges.count('coinbase') == 1
+
+
+def test_coinbase_charges_its_budget_per_request(exchanges, monkeypatch):
+    monkeypatch.setattr(rate_limit, 'RATE_BUDGETS', {'coinbase': RateBudget(1)})
+
+    assert fetch_prices_coinbase(BTC_ETH) == {}    # Two requests, one token
+    assert exchanges.count('coinbase') == 0
+    assert fetch_prices_coinbase(BTC)['BTC']['price'] == 60000.0
+    assert not rate_limit.has_budget('coinbase')
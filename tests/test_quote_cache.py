@@ -0,0 +1,155 @@
+"""
+QuoteCache TTL, coalescing, the opt-in shared file, and the offline state check
+"""
+import os
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+import check_state
+import quote_cache
+from quote_cache import QuoteCache
+from state_manager import add_price_to_history, default_state, save_state
+
+
+BTC = {'BTC': ('bitcoin', 'BTCUSDT')}
+
+
+class Clock:
+    def __init__(self, now: float = 1_700_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class Provider:
+    """Counts fetches; optionally slow or failing"""
+
+    def __init__(self, price: float = 60000.0, delay: float = 0.0, clock=time.time):
+        self.price = price
+        self.delay = delay
+        self.fail = False
+        self.calls = 0
+        self.clock = clock
+
+    def __call__(self, symbols):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            return {}
+        stamp = datetime.fromtimestamp(self.clock())
+        return {symbol: {'price': self.price, 'timestamp': stamp} for symbol in symbols}
+
+
+def test_shared_file_is_off_by_default(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cache = QuoteCache(fetch=Provider())
+    assert cache.path is None
+    cache.get(BTC)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_quotes_are_served_until_the_ttl_expires():
+    clock = Clock()
+    provider = Provider(clock=clock)
+    cache = QuoteCache(fetch=provider, ttl=5, path=None, clock=clock)
+
+    cache.get(BTC)
+    clock.now += 4
+    assert cache.get(BTC)['BTC']['price'] == 60000.0
+    assert provider.calls == 1
+    clock.now += 1
+    cache.get(BTC)
+    assert provider.calls == 2
+
+
+def test_failed_fetch_serves_stale_quote_up_to_max_staleness():
+    clock = Clock()
+    provider = Provider(clock=clock)
+    cache = QuoteCache(fetch=provider, ttl=5, max_staleness=60, path=None, clock=clock)
+    cache.get(BTC)
+    provider.fail = True
+
+    clock.now += 30
+    assert cache.get(BTC)['BTC']['stale'] is True
+    clock.now += 31
+    assert cache.get(BTC) == {}
+
+
+def test_concurrent_callers_share_one_fetch():
+    provider = Provider(delay=0.2)
+    cache = QuoteCache(fetch=provider, ttl=5, path=None)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get(BTC))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert provider.calls == 1
+    assert len(results) == 5 and all(result['BTC']['price'] == 60000.0 for result in results)
+
+
+def test_shared_file_serves_another_process(tmp_path):
+    path = str(tmp_path / 'quotes.json')
+    writer = Provider()
+    QuoteCache(fetch=writer, path=path).get(BTC)
+
+    reader = Provider(price=1.0)
+    assert QuoteCache(fetch=reader, path=path).get(BTC)['BTC']['price'] == 60000.0
+    assert reader.calls == 0
+
+
+def test_peek_never_fetches(tmp_path):
+    clock = Clock()
+    path = str(tmp_path / 'quotes.json')
+    QuoteCache(fetch=Provider(clock=clock), ttl=5, path=path, clock=clock).get(BTC)
+
+    provider = Provider()
+    clock.now += 10
+    quotes = QuoteCache(fetch=provider, ttl=5, path=path, clock=clock).peek(BTC)
+    assert quotes['BTC']['price'] == 60000.0 and quotes['BTC']['stale'] is True
+    assert QuoteCache(fetch=provider, path=None).peek(BTC) == {}
+    assert provider.calls == 0
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    """Fail the test if anything reaches the providers"""
+    def no_network(*args, **kwargs):
+        raise AssertionError("check_state fetched a quote")
+
+    monkeypatch.setattr(quote_cache, 'fetch_prices', no_network)
+    monkeypatch.setattr(check_state, 'load_state', lambda read_only=False: default_state())
+
+
+def test_check_state_is_offline_by_default(offline, capsys):
+    check_state.main()
+    assert 'Position CLOSED' in capsys.readouterr().out
+
+
+def test_check_state_fetches_only_when_asked(offline):
+    assert check_state.parse_args(['--quote']).quote
+    with pytest.raises(AssertionError, match="fetched a quote"):
+        check_state.main(fetch_quote=True)
+
+
+def test_check_state_leaves_a_torn_journal_alone(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(quote_cache, 'fetch_prices', lambda *args, **kwargs: {})
+    state = default_state()
+    save_state(state)   # Snapshot, then journaled ticks
+    for i in range(3):
+        add_price_to_history(60000.0 + i, datetime.fromtimestamp(1_700_000_000 + i), state)
+    save_state(state)
+    state.journal.close()
+    with open('state.journal', 'ab') as f:
+        f.write(b'\x00' * 5)   # Torn record from a crash mid-append
+    size = os.path.getsize('state.journal')
+
+    check_state.main()
+    assert 'Entries: 3' in capsys.readouterr().out
+    assert os.path.getsize('state.journal') == size
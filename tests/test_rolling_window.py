@@ -0,0 +1,92 @@
+"""
+RollingWindow expiry, late ticks and clear()
+"""
+import random
+
+import pytest
+
+from rolling_window import RollingWindow
+
+
+def test_tick_older_than_window_is_ignored():
+    window = RollingWindow(100)
+    window.append(1000, 5.0)
+    window.append(800, 4.0)   # Already outside the window that ends at 1000
+
+    assert list(window) == [(1000.0, 5.0)]
+    assert (window.min(), window.max()) == (5.0, 5.0)
+    assert window.appended == 1
+
+
+def brute_force(ticks, window_seconds):
+    """Window contents, min and max recomputed from every in-order tick"""
+    kept = []
+    for ts, price in ticks:
+        if not kept or ts >= kept[-1][0]:
+            kept.append((float(ts), price))
+    live = [tick for tick in kept if tick[0] >= kept[-1][0] - window_seconds]
+    prices = [price for _, price in live]
+    return live, min(prices), max(prices)
+
+
+@pytest.mark.parametrize('prices', [(5.0, 4.0, 6.0), (5.0, 6.0, 4.5)])
+def test_late_tick_is_dropped(prices):
+    ticks = list(zip((1000, 950, 1060), prices))
+    window = RollingWindow(100)
+    for ts, price in ticks:
+        window.append(ts, price)
+
+    # The 950 tick would have expired at 1060 anyway; it must not linger in min/max either
+    live, low, high = brute_force(ticks, 100)
+    assert list(window) == live
+    assert (window.min(), window.max()) == (low, high)
+    assert window.appended == 2
+
+
+def test_out_of_order_stream_matches_brute_force():
+    rng = random.Random(7)
+    ticks = []
+    window = RollingWindow(100)
+    for i in range(2000):
+        # Mostly forward, with occasional steps back in time and repeated timestamps
+        ts = i * 5 + rng.choice([0, 0, 0, -40, -120, -5])
+        ticks.append((ts, rng.uniform(1, 100)))
+        window.append(*ticks[-1])
+        live, low, high = brute_force(ticks, 100)
+        assert (window.min(), window.max()) == (low, high)
+    assert list(window) == live
+
+
+def test_expiry_drops_old_extremes():
+    window = RollingWindow(100)
+    for ts, price in [(0, 3.0), (50, 9.0), (120, 6.0), (200, 7.0)]:
+        window.append(ts, price)
+
+    # Ticks before 100 have expired
+    assert list(window) == [(120.0, 6.0), (200.0, 7.0)]
+    assert (window.min(), window.max()) == (6.0, 7.0)
+
+
+def test_clear_resets_the_cutoff():
+    window = RollingWindow(100)
+    window.append(1000, 5.0)
+    window.clear()
+
+    # After a reset, older ticks (e.g. a backfill) are accepted again
+    window.append(800, 4.0)
+    window.append(850, 4.5)
+    assert list(window) == [(800.0, 4.0), (850.0, 4.5)]
+    assert window.min() == 4.0
+    assert window.generation == 1
+
+
+def test_from_ticks_round_trip_expires_old_ticks():
+    window = RollingWindow(100)
+    for ts in range(0, 300, 10):
+        window.append(ts, float(ts))
+    restored = RollingWindow.from_ticks(window.to_ticks(), 100)
+
+    assert list(restored) == list(window)
+    assert (restored.min(), restored.max()) == (190.0, 290.0)
+    restored.append(150, 1.0)   # Behind the restored cutoff
+    assert restored.min() == 190.0
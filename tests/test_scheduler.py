@@ -0,0 +1,107 @@
+"""
+TickScheduler grid alignment and overrun policies on a simulated clock
+"""
+import pytest
+
+from scheduler import PhaseTimer, TickScheduler
+
+
+class FakeClock:
+    """Monotonic clock that only moves when slept on or when work is simulated"""
+
+    def __init__(self, now: float = 0.0):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    def work(self, seconds: float) -> None:
+        self.now += seconds
+
+
+def scheduler(clock: FakeClock, policy: str = 'skip', max_catchup: int = 5) -> TickScheduler:
+    return TickScheduler(interval=10, policy=policy, max_catchup=max_catchup, clock=clock, sleep=clock.sleep)
+
+
+def test_ticks_stay_on_the_grid():
+    clock = FakeClock(1000.0)
+    ticks = scheduler(clock)
+
+    starts = []
+    for work in (3.0, 7.5, 0.5, 9.75):
+        assert ticks.wait() == 0.0
+        starts.append(clock.now)
+        clock.work(work)
+
+    # Work time never shifts later ticks
+    assert starts == [1010.0, 1020.0, 1030.0, 1040.0]
+    assert clock.sleeps == [10.0, 7.0, 2.5, 9.5]
+    assert ticks.overruns == 0 and ticks.skipped == 0
+
+
+def test_skip_runs_once_and_drops_missed_slots():
+    clock = FakeClock()
+    ticks = scheduler(clock)
+    ticks.wait()              # Tick at 10
+    clock.work(25.0)          # Runs past the slots at 20 and 30
+
+    assert ticks.wait() == 5.0   # Runs at once, 5s after the slot at 30
+    assert ticks.overruns == 1
+    assert ticks.skipped == 1
+    assert clock.sleeps == [10.0]
+
+    ticks.wait()
+    assert clock.now == 40.0     # Back on the original grid
+    assert ticks.last_lag == 0.0
+
+
+def test_catchup_runs_missed_slots_back_to_back():
+    clock = FakeClock()
+    ticks = scheduler(clock, policy='catchup')
+    ticks.wait()
+    clock.work(25.0)
+
+    assert ticks.wait() == 15.0   # Slot 20
+    assert ticks.wait() == 5.0    # Slot 30
+    assert clock.sleeps == [10.0]
+    assert ticks.skipped == 0
+
+    ticks.wait()
+    assert clock.now == 40.0
+
+
+def test_catchup_gives_up_past_max_catchup():
+    clock = FakeClock()
+    ticks = scheduler(clock, policy='catchup', max_catchup=2)
+    ticks.wait()
+    clock.work(45.0)              # Four slots behind
+
+    assert ticks.wait() == 5.0
+    assert ticks.skipped == 3
+    ticks.wait()
+    assert clock.now == 60.0
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        TickScheduler(policy='burst')
+
+
+def test_phase_timer_totals_and_maxima():
+    clock = FakeClock()
+    timer = PhaseTimer(clock=clock)
+    for fetch in (1.0, 3.0):
+        with timer.phase('fetch'):
+            clock.work(fetch)
+        with timer.phase('detect'):
+            clock.work(0.5)
+        assert timer.finish_tick() == {'fetch': fetch, 'detect': 0.5}
+
+    assert timer.totals == {'fetch': 4.0, 'detect': 1.0}
+    assert timer.maxima == {'fetch': 3.0, 'detect': 0.5}
+    assert timer.summary() == 'fetch avg 2000.0ms max 3000.0ms, detect avg 500.0ms max 500.0ms'
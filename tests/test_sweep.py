@@ -0,0 +1,58 @@
+"""
+Parameter sweeps over memory-mapped tick files
+"""
+import numpy as np
+
+from backtest import run_backtest
+from sweep import build_grid, load_tick_file, parse_values, run_sweep
+
+
+def write_ticks(path, n: int = 5000, torn: bytes = b''):
+    rng = np.random.default_rng(7)
+    records = np.empty((n, 2))
+    records[:, 0] = 1.7e9 + np.arange(n) * 60.0
+    records[:, 1] = 60000 * np.exp(np.cumsum(rng.normal(0, 3e-3, n)))
+    path.write_bytes(records.astype('<f8').tobytes() + torn)
+    return records
+
+
+def test_torn_trailing_record_is_ignored(tmp_path):
+    path = tmp_path / 'ticks.bin'
+    records = write_ticks(path, torn=b'\x01' * 13)
+
+    ticks = load_tick_file(str(path))
+    assert ticks.shape == records.shape
+    assert np.array_equal(ticks, records)
+
+
+def test_empty_and_partial_files(tmp_path):
+    path = tmp_path / 'ticks.bin'
+    path.write_bytes(b'')
+    assert load_tick_file(str(path)).shape == (0, 2)
+    path.write_bytes(b'\x00' * 9)
+    assert load_tick_file(str(path)).shape == (0, 2)
+
+
+def test_sweep_matches_single_backtests(tmp_path):
+    path = tmp_path / 'ticks.bin'
+    records = write_ticks(path, torn=b'\x00' * 8)
+    grid = build_grid({
+        'entry_spike_pct': '1,3', 'take_profit_pct': '1,2.5', 'stop_loss_pct': '2.5', 'window_hours': '6',
+    })
+
+    results = run_sweep(str(path), grid, workers=2)
+
+    assert len(results) == 4
+    ticks = list(map(tuple, records.tolist()))
+    for params, result in zip(grid, results):
+        report = run_backtest(ticks, params['entry_spike_pct'], params['take_profit_pct'],
+                              params['stop_loss_pct'], params['window_hours'] * 3600)
+        assert result['trades'] == report['trades']
+        assert result['pnl_pct'] == report['pnl_pct']
+
+
+def test_parse_values():
+    assert parse_values('1,2.5') == [1.0, 2.5]
+    assert parse_values('1:2:0.5') == [1.0, 1.5, 2.0]
+    assert len(build_grid({'a': '1:3:1', 'b': '1,2'})) == 6
+    assert len(build_grid({'a': '1:3', 'b': '1:2'}, samples=10)) == 10
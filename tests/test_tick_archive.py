@@ -0,0 +1,73 @@
+"""
+TickArchive ordering, range queries and streaming reads
+"""
+import numpy as np
+
+from tick_archive import NS_PER_SECOND, TickArchive
+
+
+DAY = 86400
+START = 1_704_067_200.0   # 2024-01-01 00:00 UTC
+
+
+def test_out_of_order_ticks_are_dropped(tmp_path):
+    archive = TickArchive('BTC', root=str(tmp_path))
+    accepted = []
+    # Ordered ticks mixed with stale ones, across a day boundary
+    for ts, price in [
+        (START + 10, 1.0), (START + 20, 2.0), (START + 15, 99.0), (START + 20, 99.0),
+        (START + DAY - 1, 3.0), (START + DAY + 5, 4.0), (START + DAY - 2, 99.0),
+        (START + 30, 99.0), (START + DAY + 6, 5.0),
+    ]:
+        if archive.append(ts, price):
+            accepted.append((ts, price))
+    archive.close()
+
+    assert [price for _, price in accepted] == [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert archive.partitions() == ['2024-01-01', '2024-01-02']
+    for partition in archive.partitions():
+        ts, _ = archive.read_partition(partition)
+        assert np.all(np.diff(ts) > 0)
+
+    assert list(archive.iter_ticks()) == accepted
+    ts, prices = archive.query(START + 15, START + DAY + 6)
+    assert (ts / NS_PER_SECOND).tolist() == [START + 20, START + DAY - 1, START + DAY + 5]
+    assert prices.tolist() == [2.0, 3.0, 4.0]
+    ts, prices = archive.query(start=START + DAY)
+    assert prices.tolist() == [4.0, 5.0]
+    assert [price for _, price in archive.iter_ticks(START + 11, START + DAY)] == [2.0, 3.0]
+
+
+def test_reopened_archive_remembers_its_last_tick(tmp_path):
+    archive = TickArchive('ETH', root=str(tmp_path))
+    archive.append(START + 100, 1.0)
+    archive.append(START + 200, 2.0)
+    archive.close()
+
+    reopened = TickArchive('ETH', root=str(tmp_path))
+    assert reopened.last_timestamp() == START + 200
+    assert not reopened.append(START + 150, 99.0)
+    assert reopened.append(START + 300, 3.0)
+    reopened.close()
+    assert reopened.query()[1].tolist() == [1.0, 2.0, 3.0]
+
+
+def test_empty_archive(tmp_path):
+    archive = TickArchive('SOL', root=str(tmp_path))
+    assert archive.last_timestamp() is None
+    assert archive.query()[0].size == 0
+    assert list(archive.iter_ticks()) == []
+    assert archive.stats() == {'partitions': 0, 'ticks': 0, 'first': None, 'last': None}
+
+
+def test_chunks_cover_the_range(tmp_path, monkeypatch):
+    import tick_archive
+    monkeypatch.setattr(tick_archive, 'CHUNK_TICKS', 7)
+    archive = TickArchive('BTC', root=str(tmp_path))
+    for i in range(50):
+        archive.append(START + i, float(i))
+    archive.close()
+
+    chunks = list(archive.iter_chunks(START + 3, START + 40))
+    assert [len(prices) for _, prices in chunks] == [7, 7, 7, 7, 7, 2]
+    assert np.concatenate([prices for _, prices in chunks]).tolist() == [float(i) for i in range(3, 40)]
@@ -0,0 +1,104 @@
+"""
+Positions close exactly the ledger trade they opened
+"""
+from types import SimpleNamespace
+
+import pytest
+
+import cli
+from state_header import read_position
+from state_manager import (
+    close_position, close_state, default_state, ledger_trade, load_state, open_position, save_state
+)
+from symbol_state import Position
+from trade_ledger import TradeLedger
+
+
+@pytest.fixture
+def ledger(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return TradeLedger('trades.jsonl')
+
+
+def with_ledger(symbol, ledger):
+    state = default_state(symbol)
+    state.ledger = ledger
+    return state
+
+
+def test_single_and_multi_symbol_btc_keep_their_own_trades(ledger):
+    single = with_ledger(None, ledger)
+    multi = with_ledger('BTC', ledger)
+    open_position(60000.0, single)
+    open_position(61000.0, multi)
+    assert single.position.trade_id != multi.position.trade_id
+    assert len(ledger.open_positions('BTC')) == 2
+
+    assert close_position(single, 57000.0, 'TP') == pytest.approx(5.0)
+    [trade] = ledger.open_positions('BTC')
+    assert trade.position_id == multi.position.trade_id
+    assert multi.position.is_open
+
+    close_position(multi, 61000.0, 'SL')
+    assert ledger.open_positions('BTC') == []
+    assert ledger.stats.trades == 2
+
+
+def test_other_strategies_are_left_open(ledger):
+    other = ledger.open('ETH', 3000.0, '2024-01-01T00:00:00', strategy='grid')
+    eth = with_ledger('ETH', ledger)
+    open_position(3300.0, eth)
+
+    close_position(eth, 3135.0, 'TP')
+    assert [trade.position_id for trade in ledger.open_positions('ETH')] == [other.position_id]
+
+
+def test_trade_id_is_saved_with_the_position(ledger):
+    eth = with_ledger('ETH', ledger)
+    open_position(3300.0, eth)
+    save_state(eth)
+    close_state(eth)
+
+    assert read_position('ETH').trade_id == eth.position.trade_id
+    restored = load_state('ETH')
+    assert restored.position == eth.position
+    close_state(restored)
+
+
+def test_position_saved_without_a_trade_id_matches_by_entry_time(ledger):
+    older = ledger.open('BTC', 59000.0, '2024-01-01T00:00:00')
+    mine = ledger.open('BTC', 60000.0, '2024-01-02T00:00:00')
+    position = Position.from_header({'position_open': True, 'entry_price': 60000.0,
+                                     'entry_timestamp': '2024-01-02T00:00:00'})
+
+    assert position.trade_id is None
+    assert ledger_trade(ledger, 'BTC', position).position_id == mine.position_id
+    state = with_ledger(None, ledger)
+    state.position = position
+    close_position(state, 57000.0, 'TP')
+    assert [trade.position_id for trade in ledger.open_positions('BTC')] == [older.position_id]
+
+
+def test_position_missing_from_the_ledger_is_recorded_before_closing(ledger):
+    state = with_ledger('SOL', ledger)
+    state.position.open(150.0, '2024-01-01T00:00:00', 'SOL-elsewhere')
+
+    assert close_position(state, 147.0, 'TP') == pytest.approx(2.0)
+    assert ledger.open_positions('SOL') == []
+    assert [event['event'] for event in ledger.history('SOL')] == ['open', 'close']
+
+
+def test_cli_reset_closes_only_the_reset_position(ledger):
+    single = with_ledger(None, ledger)
+    multi = with_ledger('BTC', ledger)
+    open_position(60000.0, single)
+    open_position(61000.0, multi)
+    for state in (single, multi):
+        save_state(state)
+        close_state(state)
+
+    cli.cmd_reset(SimpleNamespace(symbol='BTC', full=False, yes=True))
+    assert not read_position('BTC').is_open
+    assert read_position(None).is_open
+    [trade] = TradeLedger('trades.jsonl').open_positions('BTC')
+    assert trade.position_id == single.position.trade_id
@@ -0,0 +1,206 @@
+"""
+Tick Archive - Columnar on-disk history of every observed tick, partitioned by day
+
+Layout:
+    <root>/<SYMBOL>/<YYYY-MM-DD>/ts.i8     int64 epoch nanoseconds (UTC)
+    <root>/<SYMBOL>/<YYYY-MM-DD>/price.f8  float64 price
+
+Both columns are append-only and in time order, so a partition's ts column
+is its own index: range queries binary-search it and return memmap slices.
+append() keeps that order by dropping any tick that is not newer than the
+last one archived.
+"""
+import os
+import struct
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+
+ARCHIVE_DIR = os.getenv('TICK_ARCHIVE_DIR', 'archive')
+ARCHIVE_ENABLED = os.getenv('TICK_ARCHIVE', 'true').lower() == 'true'
+
+TS_FILE = 'ts.i8'
+PRICE_FILE = 'price.f8'
+NS_PER_SECOND = 1_000_000_000
+# Ticks per chunk of iter_chunks (and converted to Python floats at a time by iter_ticks)
+CHUNK_TICKS = 1 << 16
+
+_TS = struct.Struct('<q')
+_PRICE = struct.Struct('<d')
+
+
+def _partition_name(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime('%Y-%m-%d')
+
+
+class TickArchive:
+    """Append-only columnar tick store for one symbol"""
+
+    def __init__(self, symbol: str = 'BTC', root: str = ARCHIVE_DIR):
+        self.symbol = symbol
+        self.path = os.path.join(root, symbol)
+        self._partition: Optional[str] = None
+        self._ts_file = None
+        self._price_file = None
+        # Epoch ns of the newest archived tick; read from disk on first use
+        self._last_ns: Optional[int] = None
+
+    def last_timestamp(self) -> Optional[float]:
+        """Epoch seconds of the newest archived tick, or None if the archive is empty"""
+        last_ns = self._newest_ns()
+        return None if last_ns is None else last_ns / NS_PER_SECOND
+
+    def _newest_ns(self) -> Optional[int]:
+        if self._last_ns is None:
+            for partition in reversed(self.partitions()):
+                ts, _ = self.read_partition(partition)
+                if len(ts):
+                    self._last_ns = int(ts[-1])
+                    break
+        return self._last_ns
+
+    def append(self, timestamp: float, price: float) -> bool:
+        """
+        Append one tick (epoch seconds, price)
+
+        Returns:
+            False if the tick was dropped because it is not newer than the
+            last archived tick (e.g. a backfilled or replayed one)
+        """
+        ns = int(timestamp * NS_PER_SECOND)
+        last_ns = self._newest_ns()
+        if last_ns is not None and ns <= last_ns:
+            return False
+        partition = _partition_name(timestamp)
+        if partition != self._partition:
+            self._open_partition(partition)
+        self._ts_file.write(_TS.pack(ns))
+        self._price_file.write(_PRICE.pack(price))
+        self._ts_file.flush()
+        self._price_file.flush()
+        self._last_ns = ns
+        return True
+
+    def _open_partition(self, partition: str) -> None:
+        self.close()
+        directory = os.path.join(self.path, partition)
+        os.makedirs(directory, exist_ok=True)
+        ts_path = os.path.join(directory, TS_FILE)
+        price_path = os.path.join(directory, PRICE_FILE)
+        # Realign the columns if a crash left one of them longer
+        if os.path.exists(ts_path) and os.path.exists(price_path):
+            count = min(os.path.getsize(ts_path) // 8, os.path.getsize(price_path) // 8)
+            for path in (ts_path, price_path):
+                if os.path.getsize(path) != count * 8:
+                    os.truncate(path, count * 8)
+        self._ts_file = open(ts_path, 'ab')
+        self._price_file = open(price_path, 'ab')
+        self._partition = partition
+
+    def close(self) -> None:
+        """Close the open partition files"""
+        for f in (self._ts_file, self._price_file):
+            if f is not None:
+                f.close()
+        self._ts_file = self._price_file = None
+        self._partition = None
+
+    def partitions(self) -> List[str]:
+        """Partition names (YYYY-MM-DD), oldest first"""
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(
+            name for name in os.listdir(self.path)
+            if os.path.exists(os.path.join(self.path, name, TS_FILE))
+        )
+
+    def read_partition(self, partition: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Zero-copy (timestamps_ns, prices) memmaps of one partition
+
+        A trailing tick whose columns were only partly written is left out.
+        """
+        directory = os.path.join(self.path, partition)
+        ts_path = os.path.join(directory, TS_FILE)
+        price_path = os.path.join(directory, PRICE_FILE)
+        count = min(os.path.getsize(ts_path) // 8, os.path.getsize(price_path) // 8)
+        if count == 0:
+            return np.empty(0, dtype='<i8'), np.empty(0, dtype='<f8')
+        ts = np.memmap(ts_path, dtype='<i8', mode='r', shape=(count,))
+        prices = np.memmap(price_path, dtype='<f8', mode='r', shape=(count,))
+        return ts, prices
+
+    def _ranges(
+        self,
+        start: Optional[float],
+        end: Optional[float]
+    ) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """Per-partition (timestamps_ns, prices) views within [start, end)"""
+        start_ns = None if start is None else int(start * NS_PER_SECOND)
+        end_ns = None if end is None else int(end * NS_PER_SECOND)
+        first = None if start is None else _partition_name(start)
+        last = None if end is None else _partition_name(end)
+
+        for partition in self.partitions():
+            # Day partitions outside the range are skipped without opening them
+            if (first and partition < first) or (last and partition > last):
+                continue
+            ts, prices = self.read_partition(partition)
+            lo = 0 if start_ns is None else int(np.searchsorted(ts, start_ns, 'left'))
+            hi = len(ts) if end_ns is None else int(np.searchsorted(ts, end_ns, 'left'))
+            if hi > lo:
+                yield ts[lo:hi], prices[lo:hi]
+
+    def query(
+        self,
+        start: Optional[float] = None,
+        end: Optional[float] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Ticks with start <= timestamp < end (epoch seconds; None is unbounded)
+
+        Returns:
+            (timestamps_ns, prices). Results inside one partition are memmap
+            views; ranges spanning several partitions are concatenated.
+        """
+        parts = list(self._ranges(start, end))
+        if not parts:
+            return np.empty(0, dtype='<i8'), np.empty(0, dtype='<f8')
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate([ts for ts, _ in parts]), np.concatenate([p for _, p in parts])
+
+    def iter_chunks(
+        self,
+        start: Optional[float] = None,
+        end: Optional[float] = None
+    ) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """Stream the range as (epoch seconds, prices) arrays of up to CHUNK_TICKS ticks"""
+        for ts, prices in self._ranges(start, end):
+            for chunk in range(0, len(ts), CHUNK_TICKS):
+                yield ts[chunk:chunk + CHUNK_TICKS] / NS_PER_SECOND, prices[chunk:chunk + CHUNK_TICKS]
+
+    def iter_ticks(
+        self,
+        start: Optional[float] = None,
+        end: Optional[float] = None
+    ) -> Iterator[Tuple[float, float]]:
+        """Stream (epoch seconds, price) pairs without materializing the range"""
+        for seconds, prices in self.iter_chunks(start, end):
+            yield from zip(seconds.tolist(), prices.tolist())
+
+    def stats(self) -> dict:
+        """Partition count, tick count and first/last timestamps (epoch seconds)"""
+        partitions = self.partitions()
+        total = 0
+        first = last = None
+        for partition in partitions:
+            ts, _ = self.read_partition(partition)
+            if len(ts):
+                total += len(ts)
+                if first is None:
+                    first = int(ts[0]) / NS_PER_SECOND
+                last = int(ts[-1]) / NS_PER_SECOND
+        return {'partitions': len(partitions), 'ticks': total, 'first': first, 'last': last}
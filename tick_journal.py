@@ -0,0 +1,111 @@
+"""
+Tick Journal - Append-only binary log of price ticks between state snapshots
+"""
+import os
+import struct
+from typing import Iterator, Tuple
+
+
+# One record per tick: epoch seconds and price, both little-endian float64
+RECORD = struct.Struct('<dd')
+
+
+def fsync_dir(path: str) -> None:
+    """fsync the directory holding path, making a rename in it durable"""
+    if not hasattr(os, 'O_DIRECTORY'):
+        return   # Not available (or needed) on Windows
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_atomic(path: str, data: bytes, durable: bool = True) -> None:
+    """
+    Write a file via temp file + rename so readers never see a partial file
+    
+    Args:
+        path: Destination file
+        data: Complete new contents
+        durable: fsync the data and the rename, so the new file survives a
+            power loss; otherwise a crash may leave the old file (never a
+            partial one)
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        if durable:
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    if durable:
+        fsync_dir(path)
+
+
+class TickJournal:
+    """
+    Fixed-width binary tick journal.
+
+    Each save appends only the ticks added since the previous save, so the
+    per-tick write cost is constant. The journal is truncated whenever a
+    compacted snapshot is written.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.records = 0          # Records in the journal since the last snapshot
+        self.synced = 0           # RollingWindow.appended at the last save
+        self.generation = 0       # RollingWindow.generation at the last save
+        self.header = None  # Position as of the last snapshot (set by state_manager)
+        self.fsynced_at = 0.0     # time.monotonic() of the last fsync
+        self._file = None
+
+    def replay(self, truncate: bool = True) -> Iterator[Tuple[float, float]]:
+        """
+        Yield (timestamp, price) records, dropping a torn trailing record
+
+        Args:
+            truncate: Also cut the torn record off the file; readers that
+                must not write (e.g. check_state.py) pass False
+        """
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        usable = len(data) - len(data) % RECORD.size
+        if truncate and usable != len(data):
+            # A crash mid-append left a partial record; cut it off so
+            # later appends stay aligned
+            with open(self.path, 'r+b') as f:
+                f.truncate(usable)
+        for timestamp, price in RECORD.iter_unpack(memoryview(data)[:usable]):
+            yield timestamp, price
+
+    def append(self, timestamp: float, price: float) -> None:
+        """Append one tick record"""
+        if self._file is None:
+            self._file = open(self.path, 'ab')
+        self._file.write(RECORD.pack(timestamp, price))
+        self.records += 1
+
+    def flush(self, durable: bool = False) -> None:
+        """Hand appended records to the OS; with durable, also fsync them to disk"""
+        if self._file is None:
+            return
+        self._file.flush()
+        if durable:
+            os.fsync(self._file.fileno())
+
+    def reset(self) -> None:
+        """Truncate the journal after a snapshot has been written"""
+        self.close()
+        with open(self.path, 'wb'):
+            pass
+        self.records = 0
+
+    def close(self) -> None:
+        """Close the underlying file handle"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
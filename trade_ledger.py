@@ -0,0 +1,285 @@
+"""
+Trade Ledger - Append-only record of every position opened and closed
+
+state.json only knows the current position, so a trade is gone once it
+closes. The ledger keeps them all. trades.jsonl gets one JSON line per
+event (open, or a full or partial close), and the ledger is rebuilt from
+it by replaying those events. The open positions are indexed per symbol
+in memory, and the win rate, cumulative P/L and drawdown are updated as
+each close is recorded, so neither needs a scan of the history.
+
+A checkpoint (<ledger>.index) holds that index, the statistics and the
+log offset they cover, so a process opening the ledger (cli.py status)
+only replays the lines appended since.
+"""
+import json
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not on Windows
+    fcntl = None
+
+from tick_journal import write_atomic
+
+
+# Ledger file; empty disables the ledger
+TRADE_LEDGER_FILE = os.getenv('TRADE_LEDGER_FILE', 'trades.jsonl')
+# Strategy name of the positions the monitor opens
+DEFAULT_STRATEGY = 'spike-short'
+
+
+def short_pnl_pct(entry_price: float, exit_price: float) -> float:
+    """Return of a short position, in percent (positive when the price fell)"""
+    return (entry_price - exit_price) / entry_price * 100
+
+
+class TradeStats:
+    """
+    Running statistics over closed trades.
+
+    Every close, full or partial, counts as one trade; its P/L is weighted
+    by the size it closed. Drawdown is measured on the cumulative P/L curve.
+    """
+
+    __slots__ = ('trades', 'wins', 'losses', 'pnl_pct', 'peak', 'max_drawdown', 'best', 'worst')
+
+    def __init__(self):
+        self.trades = 0
+        self.wins = 0
+        self.losses = 0
+        self.pnl_pct = 0.0
+        self.peak = 0.0
+        self.max_drawdown = 0.0
+        self.best: Optional[float] = None
+        self.worst: Optional[float] = None
+
+    def record(self, pnl_pct: float, size: float = 1.0) -> None:
+        self.trades += 1
+        if pnl_pct > 0:
+            self.wins += 1
+        elif pnl_pct < 0:
+            self.losses += 1
+        self.pnl_pct += pnl_pct * size
+        self.peak = max(self.peak, self.pnl_pct)
+        self.max_drawdown = max(self.max_drawdown, self.peak - self.pnl_pct)
+        self.best = pnl_pct if self.best is None else max(self.best, pnl_pct)
+        self.worst = pnl_pct if self.worst is None else min(self.worst, pnl_pct)
+
+    @property
+    def win_rate(self) -> Optional[float]:
+        """Winning share of the trades, in percent"""
+        return self.wins / self.trades * 100 if self.trades else None
+
+    def to_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "TradeStats":
+        stats = cls()
+        for name in cls.__slots__:
+            setattr(stats, name, data[name])
+        return stats
+
+
+class OpenTrade:
+    """A position that is still (at least partly) open"""
+
+    __slots__ = ('position_id', 'symbol', 'strategy', 'entry_price', 'entry_time', 'size')
+
+    def __init__(self, position_id: str, symbol: str, strategy: str,
+                 entry_price: float, entry_time: str, size: float):
+        self.position_id = position_id
+        self.symbol = symbol
+        self.strategy = strategy
+        self.entry_price = entry_price
+        self.entry_time = entry_time   # ISO-8601, like Position.entry_timestamp
+        self.size = size               # Size still open
+
+    def __repr__(self) -> str:
+        return f"OpenTrade({self.position_id}: {self.size:g} {self.symbol} short at {self.entry_price})"
+
+    def to_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class TradeLedger:
+    """
+    Trade history of every symbol, with its open positions indexed.
+
+    Several positions per symbol (e.g. one per strategy) can be open at
+    once, and each can be closed in parts. Writers lock the log while
+    appending and first catch up on lines other processes appended, so
+    workers sharing the file keep one consistent history.
+    """
+
+    def __init__(self, path: str = TRADE_LEDGER_FILE):
+        self.path = path
+        self.index_path = path + '.index'
+        # symbol -> position id -> OpenTrade
+        self._open: Dict[str, Dict[str, OpenTrade]] = {}
+        self.stats = TradeStats()
+        self.by_symbol: Dict[str, TradeStats] = {}
+        self._offset = 0           # Log bytes already applied
+        self._load_checkpoint()
+        self._catch_up()
+
+    def _load_checkpoint(self) -> None:
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path) as f:
+                data = json.load(f)
+            if data['offset'] > os.path.getsize(self.path):
+                return   # The log was replaced; rebuild it from the start
+            stats = TradeStats.from_dict(data['stats'])
+            by_symbol = {symbol: TradeStats.from_dict(s) for symbol, s in data['by_symbol'].items()}
+            trades = [OpenTrade(**trade) for trade in data['open']]
+        except (IOError, KeyError, TypeError, ValueError) as e:
+            print(f"Error reading trade ledger checkpoint: {e}. Replaying the ledger.")
+            return
+        self.stats, self.by_symbol, self._offset = stats, by_symbol, data['offset']
+        for trade in trades:
+            self._open.setdefault(trade.symbol, {})[trade.position_id] = trade
+
+    def _write_checkpoint(self) -> None:
+        data = {
+            'offset': self._offset,
+            'stats': self.stats.to_dict(),
+            'by_symbol': {symbol: stats.to_dict() for symbol, stats in self.by_symbol.items()},
+            'open': [trade.to_dict() for trade in self.open_positions()],
+        }
+        # Only a shortcut: the log is the record, so no need to wait for the disk
+        write_atomic(self.index_path, json.dumps(data).encode(), durable=False)
+
+    def _catch_up(self) -> None:
+        """Apply the events appended since the last read"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset)
+            data = f.read()
+        # A line without its newline is still being written
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            if line.strip():
+                try:
+                    self._apply(json.loads(line))
+                except (KeyError, TypeError, ValueError) as e:
+                    print(f"Skipping bad trade ledger entry: {e}")
+        self._offset += end
+
+    def _apply(self, event: Dict) -> None:
+        symbol = event['symbol']
+        if event['event'] == 'open':
+            self._open.setdefault(symbol, {})[event['id']] = OpenTrade(
+                event['id'], symbol, event['strategy'], event['price'], event['time'], event['size']
+            )
+            return
+        trades = self._open.get(symbol, {})
+        trade = trades.get(event['id'])
+        if trade is None:
+            return
+        trade.size -= event['size']
+        if trade.size <= 1e-9:
+            del trades[event['id']]
+        if event['pnl_pct'] is not None:
+            self.stats.record(event['pnl_pct'], event['size'])
+            self.by_symbol.setdefault(symbol, TradeStats()).record(event['pnl_pct'], event['size'])
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Exclusive lock on the log, so appends from several processes never interleave"""
+        with open(self.path, 'ab') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _append(self, event: Dict) -> None:
+        line = (json.dumps(event) + '\n').encode()
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        self._apply(event)
+        self._offset += len(line)
+
+    def open(self, symbol: str, entry_price: float, entry_time: str, size: float = 1.0,
+             strategy: str = DEFAULT_STRATEGY) -> OpenTrade:
+        """
+        Record a new short position
+
+        Returns:
+            The OpenTrade, whose position_id identifies it in later closes
+        """
+        with self._locked():
+            self._catch_up()
+            position_id = f"{symbol}-{time.time_ns() // 1000}"
+            self._append({
+                'event': 'open', 'id': position_id, 'symbol': symbol, 'strategy': strategy,
+                'time': entry_time, 'price': entry_price, 'size': size,
+            })
+            self._write_checkpoint()
+        return self._open[symbol][position_id]
+
+    def close(self, trade: OpenTrade, exit_price: Optional[float], exit_time: str,
+              exit_type: str, size: Optional[float] = None) -> Optional[float]:
+        """
+        Record a full or partial close of an open position
+
+        Args:
+            trade: Position to close, from open() or open_positions()
+            exit_price: Exit price; None for a manual close without a
+                price (recorded, but left out of the statistics)
+            exit_time: ISO-8601 exit time
+            exit_type: "TP", "SL", "RESET", ...
+            size: Size to close (default: all that is still open)
+
+        Returns:
+            The short return of the closed part in percent, or None
+            without an exit price
+        """
+        with self._locked():
+            self._catch_up()
+            current = self._open.get(trade.symbol, {}).get(trade.position_id)
+            if current is None:
+                return None   # Already closed, e.g. by another worker
+            size = current.size if size is None else min(size, current.size)
+            pnl_pct = short_pnl_pct(current.entry_price, exit_price) if exit_price is not None else None
+            self._append({
+                'event': 'close', 'id': current.position_id, 'symbol': current.symbol,
+                'time': exit_time, 'price': exit_price, 'size': size,
+                'exit_type': exit_type, 'entry_price': current.entry_price, 'pnl_pct': pnl_pct,
+            })
+            self._write_checkpoint()
+        return pnl_pct
+
+    def open_positions(self, symbol: Optional[str] = None) -> List[OpenTrade]:
+        """Open positions of one symbol (a dict lookup) or of every symbol"""
+        if symbol is not None:
+            return list(self._open.get(symbol, {}).values())
+        return [trade for trades in self._open.values() for trade in trades.values()]
+
+    def history(self, symbol: Optional[str] = None) -> Iterator[Dict]:
+        """Every recorded event in order, optionally of one symbol (reads the whole log)"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    return
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                if symbol is None or event.get('symbol') == symbol:
+                    yield event